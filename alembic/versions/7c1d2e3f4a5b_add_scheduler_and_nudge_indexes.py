@@ -0,0 +1,56 @@
+"""add scheduler and nudge indexes
+
+Revision ID: 7c1d2e3f4a5b
+Revises: afa0a945d23c
+Create Date: 2026-10-18 09:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d2e3f4a5b'
+down_revision: Union[str, Sequence[str], None] = 'afa0a945d23c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Built concurrently so the scheduler keeps running on large tables.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_reminders_pending_send_at', 'reminders', ['send_at'],
+            postgresql_where=sa.text("state = 'pending'"), sqlite_where=sa.text("state = 'pending'"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_reminders_user_id_state', 'reminders', ['user_id', 'state'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_pomodoro_sessions_active_expires_at', 'pomodoro_sessions', ['expires_at'],
+            postgresql_where=sa.text("state = 'active'"), sqlite_where=sa.text("state = 'active'"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_pomodoro_sessions_user_id_state_start_time', 'pomodoro_sessions', ['user_id', 'state', 'start_time'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_pomodoro_sessions_user_id_state_end_time', 'pomodoro_sessions', ['user_id', 'state', 'end_time'],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_pomodoro_sessions_user_id_state_end_time', 'pomodoro_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_pomodoro_sessions_user_id_state_start_time', 'pomodoro_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_pomodoro_sessions_active_expires_at', 'pomodoro_sessions', postgresql_concurrently=True)
+        op.drop_index('ix_reminders_user_id_state', 'reminders', postgresql_concurrently=True)
+        op.drop_index('ix_reminders_pending_send_at', 'reminders', postgresql_concurrently=True)
@@ -0,0 +1,45 @@
+"""add event outbox table
+
+Revision ID: 9a4b6c8d0e2f
+Revises: 7c1d2e3f4a5b
+Create Date: 2026-10-18 11:02:17.554190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4b6c8d0e2f'
+down_revision: Union[str, Sequence[str], None] = '7c1d2e3f4a5b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'event_outbox',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('claimed_by', sa.String(), nullable=True),
+        sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('processed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('dead_lettered_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_event_outbox_unprocessed_created_at', 'event_outbox', ['created_at'],
+        postgresql_where=sa.text("processed_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_event_outbox_unprocessed_created_at', 'event_outbox')
+    op.drop_table('event_outbox')
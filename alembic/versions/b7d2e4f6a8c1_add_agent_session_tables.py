@@ -0,0 +1,51 @@
+"""add agent session tables
+
+Revision ID: b7d2e4f6a8c1
+Revises: 9a4b6c8d0e2f
+Create Date: 2026-10-18 16:40:05.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4f6a8c1'
+down_revision: Union[str, Sequence[str], None] = '9a4b6c8d0e2f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'agent_sessions',
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('session_id')
+    )
+    op.create_table(
+        'agent_session_agents',
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('session_id', 'agent_id')
+    )
+    op.create_table(
+        'agent_session_messages',
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('agent_id', sa.String(), nullable=False),
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('session_id', 'agent_id', 'message_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('agent_session_messages')
+    op.drop_table('agent_session_agents')
+    op.drop_table('agent_sessions')
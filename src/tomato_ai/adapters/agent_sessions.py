@@ -0,0 +1,436 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from strands.session.session_repository import SessionRepository
+from strands.types.exceptions import SessionException
+from strands.types.session import Session, SessionAgent, SessionMessage
+
+from tomato_ai.adapters import orm
+from tomato_ai.adapters.concurrency import KeyedLock
+from tomato_ai.adapters.database import unit_of_work
+from tomato_ai.config import settings
+
+logger = logging.getLogger(__name__)
+
+AgentKey = Tuple[str, str]
+MessageKey = Tuple[str, str, int]
+
+
+def _insert(db_session: AsyncSession, model):
+    dialect = db_session.get_bind().dialect.name
+    return (postgresql if dialect == "postgresql" else sqlite).insert(model)
+
+
+async def _upsert(db_session: AsyncSession, model, keys: List[str], rows: List[Dict[str, Any]]):
+    if not rows:
+        return
+    insert = _insert(db_session, model)
+    await db_session.execute(
+        insert.on_conflict_do_update(index_elements=keys, set_={"data": insert.excluded.data}), rows
+    )
+
+
+async def _read(db_session: AsyncSession, session_id: str):
+    session = await db_session.get(orm.AgentSession, session_id)
+    agents = (await db_session.scalars(
+        select(orm.AgentSessionAgent).where(orm.AgentSessionAgent.session_id == session_id)
+    )).all()
+    messages = (await db_session.scalars(
+        select(orm.AgentSessionMessage).where(orm.AgentSessionMessage.session_id == session_id)
+    )).all()
+    return session, agents, messages
+
+
+class AgentSessionStore(SessionRepository):
+    """
+    strands session repository kept in the database behind an in-memory
+    write-behind cache.
+
+    strands reads and writes its session synchronously on every message, so a
+    chat's session is loaded into memory with `load` before its agent is built
+    and writes only touch memory. `run` flushes the dirty rows in one
+    transaction every `interval` seconds, or as soon as `batch_size` rows are
+    waiting. Sessions no agent retains are dropped from memory once flushed.
+
+    A session must have a single writer at a time. Each flush bumps the
+    session's version and only succeeds against the version that was loaded,
+    so when another process (the web app and the outbox worker, or two
+    replicas) wrote the session in the meantime, the local changes are dropped
+    and the session is reloaded instead of overwriting the other writer's
+    history. The reload bumps the session's generation, and agents holding a
+    `view` of an older generation can no longer write to it.
+    """
+
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.flushes = 0
+        self.flushed_rows = 0
+        self._sessions: Dict[str, dict] = {}
+        self._agents: Dict[AgentKey, dict] = {}
+        self._messages: Dict[AgentKey, Dict[int, dict]] = {}
+        self._dirty_sessions: Set[str] = set()
+        self._dirty_agents: Set[AgentKey] = set()
+        self._dirty_messages: Set[MessageKey] = set()
+        self._deleted_through: Dict[AgentKey, int] = {}
+        self._loaded: Set[str] = set()
+        self._versions: Dict[str, int | None] = {}
+        self._generations: Dict[str, int] = {}
+        self._retained: Dict[str, int] = {}
+        self._loads = KeyedLock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: asyncio.Event | None = None
+
+    def pending(self) -> int:
+        return (
+            len(self._dirty_sessions) + len(self._dirty_agents) + len(self._dirty_messages)
+            + len(self._deleted_through)
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "loaded": len(self._loaded),
+            "pending": self.pending(),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+        }
+
+    async def load(self, session_id: str):
+        """
+        Reads a session with all of its agents and messages into memory, unless it is there already.
+        """
+        async with self._loads.hold(session_id):
+            if session_id in self._loaded:
+                return
+            async with unit_of_work() as db_session:
+                rows = await _read(db_session, session_id)
+            self._fill(session_id, *rows)
+            self._loaded.add(session_id)
+
+    def _fill(self, session_id: str, session, agents, messages):
+        self._forget(session_id)
+        self._versions[session_id] = session.version if session is not None else None
+        if session is not None:
+            self._sessions[session_id] = session.data
+        for agent in agents:
+            self._agents[(session_id, agent.agent_id)] = agent.data
+            self._messages.setdefault((session_id, agent.agent_id), {})
+        for message in messages:
+            self._messages.setdefault((session_id, message.agent_id), {})[message.message_id] = message.data
+
+    def _forget(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        self._versions.pop(session_id, None)
+        for key in [key for key in self._agents if key[0] == session_id]:
+            del self._agents[key]
+        for key in [key for key in self._messages if key[0] == session_id]:
+            del self._messages[key]
+
+    def generation(self, session_id: str) -> int:
+        """
+        Returns how often the session was reloaded after a conflicting write.
+        """
+        return self._generations.get(session_id, 0)
+
+    def view(self, session_id: str) -> "AgentSessionView":
+        """
+        Returns the repository an agent of the session writes through.
+        """
+        return AgentSessionView(self, session_id)
+
+    def retain(self, session_id: str):
+        """
+        Keeps a loaded session in memory until it is released as often as it was retained.
+        """
+        self._retained[session_id] = self._retained.get(session_id, 0) + 1
+
+    def release(self, session_id: str):
+        self._retained[session_id] -= 1
+        if self._retained[session_id] == 0:
+            del self._retained[session_id]
+
+    def _require_loaded(self, session_id: str):
+        if session_id not in self._loaded:
+            raise SessionException(f"Session {session_id} has not been loaded")
+
+    def _dirtied(self):
+        if self._wakeup is not None and self.pending() >= self.batch_size:
+            self._wakeup.set()
+
+    def create_session(self, session: Session, **kwargs: Any) -> Session:
+        self._require_loaded(session.session_id)
+        if session.session_id in self._sessions:
+            raise SessionException(f"Session {session.session_id} already exists")
+        self._sessions[session.session_id] = session.to_dict()
+        self._dirty_sessions.add(session.session_id)
+        self._dirtied()
+        return session
+
+    def read_session(self, session_id: str, **kwargs: Any) -> Session | None:
+        self._require_loaded(session_id)
+        data = self._sessions.get(session_id)
+        return Session.from_dict(data) if data is not None else None
+
+    def create_agent(self, session_id: str, session_agent: SessionAgent, **kwargs: Any) -> None:
+        self._require_loaded(session_id)
+        key = (session_id, session_agent.agent_id)
+        self._agents[key] = session_agent.to_dict()
+        self._messages.setdefault(key, {})
+        self._dirty_agents.add(key)
+        self._dirtied()
+
+    def read_agent(self, session_id: str, agent_id: str, **kwargs: Any) -> SessionAgent | None:
+        self._require_loaded(session_id)
+        data = self._agents.get((session_id, agent_id))
+        return SessionAgent.from_dict(data) if data is not None else None
+
+    def update_agent(self, session_id: str, session_agent: SessionAgent, **kwargs: Any) -> None:
+        previous = self.read_agent(session_id, session_agent.agent_id)
+        if previous is None:
+            raise SessionException(f"Agent {session_agent.agent_id} in session {session_id} does not exist")
+        session_agent.created_at = previous.created_at
+        key = (session_id, session_agent.agent_id)
+        self._agents[key] = session_agent.to_dict()
+        self._dirty_agents.add(key)
+        self._dirtied()
+
+    def create_message(self, session_id: str, agent_id: str, session_message: SessionMessage, **kwargs: Any) -> None:
+        self._require_loaded(session_id)
+        self._messages.setdefault((session_id, agent_id), {})[session_message.message_id] = session_message.to_dict()
+        self._dirty_messages.add((session_id, agent_id, session_message.message_id))
+        self._dirtied()
+
+    def read_message(self, session_id: str, agent_id: str, message_id: int, **kwargs: Any) -> SessionMessage | None:
+        self._require_loaded(session_id)
+        data = self._messages.get((session_id, agent_id), {}).get(message_id)
+        return SessionMessage.from_dict(data) if data is not None else None
+
+    def update_message(self, session_id: str, agent_id: str, session_message: SessionMessage, **kwargs: Any) -> None:
+        previous = self.read_message(session_id, agent_id, session_message.message_id)
+        if previous is None:
+            raise SessionException(f"Message {session_message.message_id} does not exist")
+        session_message.created_at = previous.created_at
+        self.create_message(session_id, agent_id, session_message)
+
+    def list_messages(
+        self, session_id: str, agent_id: str, limit: int | None = None, offset: int = 0, **kwargs: Any
+    ) -> List[SessionMessage]:
+        self._require_loaded(session_id)
+        messages = self._messages.get((session_id, agent_id))
+        if messages is None:
+            raise SessionException(f"Agent {agent_id} in session {session_id} does not exist")
+        message_ids = sorted(messages)[offset:]
+        if limit is not None:
+            message_ids = message_ids[:limit]
+        return [SessionMessage.from_dict(messages[message_id]) for message_id in message_ids]
+
+    def delete_oldest_messages(self, session_id: str, agent_id: str, count: int):
+        """
+        Deletes the agent's `count` oldest messages.
+        """
+        self._require_loaded(session_id)
+        key = (session_id, agent_id)
+        messages = self._messages.get(key, {})
+        deleted = sorted(messages)[:count]
+        if not deleted:
+            return
+        for message_id in deleted:
+            del messages[message_id]
+            self._dirty_messages.discard((session_id, agent_id, message_id))
+        self._deleted_through[key] = max(self._deleted_through.get(key, -1), deleted[-1])
+        self._dirtied()
+
+    async def flush(self):
+        """
+        Writes every dirty row in one transaction, then drops the sessions nothing retains.
+
+        Sessions another process wrote since they were loaded are reloaded
+        instead of written.
+        """
+        async with self._flush_lock:
+            sessions, agents, messages, deletions = (
+                self._dirty_sessions, self._dirty_agents, self._dirty_messages, self._deleted_through
+            )
+            self._dirty_sessions, self._dirty_agents, self._dirty_messages, self._deleted_through = (
+                set(), set(), set(), {}
+            )
+            changed = sessions | {s for s, _ in agents} | {s for s, _, _ in messages} | {s for s, _ in deletions}
+            if changed:
+                try:
+                    async with unit_of_work() as db_session:
+                        conflicts = {
+                            session_id for session_id in changed
+                            if not await self._bump_version(db_session, session_id, session_id in sessions)
+                        }
+                        agent_rows = [
+                            {"session_id": s, "agent_id": a, "data": self._agents[(s, a)]}
+                            for s, a in agents if s not in conflicts
+                        ]
+                        message_rows = [
+                            {"session_id": s, "agent_id": a, "message_id": m, "data": self._messages[(s, a)][m]}
+                            for s, a, m in messages if s not in conflicts
+                        ]
+                        await _upsert(db_session, orm.AgentSessionAgent, ["session_id", "agent_id"], agent_rows)
+                        await _upsert(
+                            db_session, orm.AgentSessionMessage, ["session_id", "agent_id", "message_id"], message_rows
+                        )
+                        for (session_id, agent_id), through in deletions.items():
+                            if session_id in conflicts:
+                                continue
+                            await db_session.execute(delete(orm.AgentSessionMessage).where(
+                                orm.AgentSessionMessage.session_id == session_id,
+                                orm.AgentSessionMessage.agent_id == agent_id,
+                                orm.AgentSessionMessage.message_id <= through,
+                            ))
+                        reloaded = {session_id: await _read(db_session, session_id) for session_id in conflicts}
+                        written = (
+                            len(sessions - conflicts) + len(agent_rows) + len(message_rows)
+                            + sum(1 for session_id, _ in deletions if session_id not in conflicts)
+                        )
+                except BaseException:
+                    self._dirty_sessions |= sessions
+                    self._dirty_agents |= agents
+                    self._dirty_messages |= {m for m in messages if m[2] in self._messages.get(m[:2], {})}
+                    for key, through in deletions.items():
+                        self._deleted_through[key] = max(self._deleted_through.get(key, -1), through)
+                    raise
+                for session_id in changed - conflicts:
+                    self._versions[session_id] = (self._versions[session_id] or 0) + 1
+                for session_id, rows in reloaded.items():
+                    logger.warning(f"Agent session {session_id} was written elsewhere, reloading it")
+                    self._reload(session_id, *rows)
+                self.flushes += 1
+                self.flushed_rows += written
+            self._drop_unretained()
+
+    async def _bump_version(self, db_session: AsyncSession, session_id: str, write_data: bool) -> bool:
+        """
+        Moves the session row on from the version that was loaded, or creates it.
+        Returns False when another writer moved it first.
+        """
+        version = self._versions[session_id]
+        if version is None:
+            result = await db_session.execute(
+                _insert(db_session, orm.AgentSession).values(session_id=session_id, data=self._sessions[session_id], version=1)
+                .on_conflict_do_nothing(index_elements=["session_id"])
+            )
+        else:
+            values = {"version": version + 1}
+            if write_data:
+                values["data"] = self._sessions[session_id]
+            result = await db_session.execute(
+                update(orm.AgentSession)
+                .where(orm.AgentSession.session_id == session_id, orm.AgentSession.version == version)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        return result.rowcount == 1
+
+    def _reload(self, session_id: str, session, agents, messages):
+        self._fill(session_id, session, agents, messages)
+        self._generations[session_id] = self.generation(session_id) + 1
+        self._dirty_sessions.discard(session_id)
+        self._dirty_agents = {key for key in self._dirty_agents if key[0] != session_id}
+        self._dirty_messages = {key for key in self._dirty_messages if key[0] != session_id}
+        for key in [key for key in self._deleted_through if key[0] == session_id]:
+            del self._deleted_through[key]
+
+    def _drop_unretained(self):
+        dirty = (
+            self._dirty_sessions
+            | {s for s, _ in self._dirty_agents}
+            | {s for s, _, _ in self._dirty_messages}
+            | {s for s, _ in self._deleted_through}
+        )
+        for session_id in self._loaded - dirty - set(self._retained):
+            self._loaded.discard(session_id)
+            self._generations.pop(session_id, None)
+            self._forget(session_id)
+
+    async def run(self):
+        """
+        Flushes every `interval` seconds, or early once `batch_size` rows are dirty, until cancelled.
+        """
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.interval)
+                except TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    await self.flush()
+                except Exception:
+                    logger.exception("Failed to flush agent sessions")
+        finally:
+            self._wakeup = None
+
+
+class AgentSessionView(SessionRepository):
+    """
+    One agent's access to a session in the store. Once the store reloads the
+    session after a conflicting write, the view's writes are dropped, so an
+    agent built on the old history can't write it back.
+    """
+
+    def __init__(self, store: AgentSessionStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+        self.generation = store.generation(session_id)
+
+    @property
+    def stale(self) -> bool:
+        return self.store.generation(self.session_id) != self.generation
+
+    def _writable(self) -> bool:
+        if self.stale:
+            logger.debug(f"Dropping a write to agent session {self.session_id}, it was reloaded")
+            return False
+        return True
+
+    def create_session(self, session: Session, **kwargs: Any) -> Session:
+        if self._writable():
+            self.store.create_session(session, **kwargs)
+        return session
+
+    def read_session(self, session_id: str, **kwargs: Any) -> Session | None:
+        return self.store.read_session(session_id, **kwargs)
+
+    def create_agent(self, session_id: str, session_agent: SessionAgent, **kwargs: Any) -> None:
+        if self._writable():
+            self.store.create_agent(session_id, session_agent, **kwargs)
+
+    def read_agent(self, session_id: str, agent_id: str, **kwargs: Any) -> SessionAgent | None:
+        return self.store.read_agent(session_id, agent_id, **kwargs)
+
+    def update_agent(self, session_id: str, session_agent: SessionAgent, **kwargs: Any) -> None:
+        if self._writable():
+            self.store.update_agent(session_id, session_agent, **kwargs)
+
+    def create_message(self, session_id: str, agent_id: str, session_message: SessionMessage, **kwargs: Any) -> None:
+        if self._writable():
+            self.store.create_message(session_id, agent_id, session_message, **kwargs)
+
+    def read_message(self, session_id: str, agent_id: str, message_id: int, **kwargs: Any) -> SessionMessage | None:
+        return self.store.read_message(session_id, agent_id, message_id, **kwargs)
+
+    def update_message(self, session_id: str, agent_id: str, session_message: SessionMessage, **kwargs: Any) -> None:
+        if self._writable():
+            self.store.update_message(session_id, agent_id, session_message, **kwargs)
+
+    def list_messages(
+        self, session_id: str, agent_id: str, limit: int | None = None, offset: int = 0, **kwargs: Any
+    ) -> List[SessionMessage]:
+        return self.store.list_messages(session_id, agent_id, limit, offset, **kwargs)
+
+    def delete_oldest_messages(self, session_id: str, agent_id: str, count: int):
+        if self._writable():
+            self.store.delete_oldest_messages(session_id, agent_id, count)
+
+
+agent_sessions = AgentSessionStore(settings.AGENT_SESSION_FLUSH_BATCH_SIZE, settings.AGENT_SESSION_FLUSH_SECONDS)
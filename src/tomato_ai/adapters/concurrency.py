@@ -0,0 +1,141 @@
+import asyncio
+import functools
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Hashable
+
+from telegram import Update
+
+from tomato_ai.config import settings
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+current_lane: ContextVar[str] = ContextVar("current_lane", default=BACKGROUND)
+
+
+@dataclass
+class _Entry:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    holders: int = 0
+
+
+class KeyedLock:
+    """
+    Runs work for the same key strictly in arrival order while work for
+    different keys runs in parallel.
+
+    Each key gets a FIFO asyncio lock that is evicted as soon as nothing holds
+    or waits on it, so the table only grows with the number of busy keys. The
+    order only holds within one process.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, _Entry] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+        entry.holders += 1
+        try:
+            async with entry.lock:
+                yield
+        finally:
+            entry.holders -= 1
+            if entry.holders == 0:
+                del self._entries[key]
+
+
+# Per process: work for a chat in the outbox worker is not ordered against the web
+# process. A database lock would have to be held across the LLM and Telegram calls.
+chat_locks = KeyedLock()
+
+
+def ordered_per_chat(handler: Callable) -> Callable:
+    """
+    Serializes a telegram update handler per chat within this process.
+    """
+
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context, *args, **kwargs):
+        chat = update.effective_chat
+        if chat is None:
+            return await handler(update, context, *args, **kwargs)
+        async with chat_locks.hold(chat.id):
+            return await handler(update, context, *args, **kwargs)
+
+    return wrapper
+
+
+class PriorityLanes:
+    """
+    Limits concurrent work per lane and in total, and hands freed slots to
+    lanes in priority order, so waiting interactive work is always served
+    before waiting background work.
+
+    `limits` maps each lane to its own limit, highest priority first.
+    """
+
+    def __init__(self, limits: Dict[str, int], total: int):
+        self.limits = limits
+        self.total = total
+        self._running = {lane: 0 for lane in limits}
+        self._waiting: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in limits}
+
+    def running(self, lane: str) -> int:
+        return self._running[lane]
+
+    def waiting(self, lane: str) -> int:
+        return len(self._waiting[lane])
+
+    def _has_room(self, lane: str) -> bool:
+        return self._running[lane] < self.limits[lane] and sum(self._running.values()) < self.total
+
+    def _wake(self):
+        for lane, waiters in self._waiting.items():
+            while waiters and self._has_room(lane):
+                self._running[lane] += 1
+                waiters.popleft().set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, lane: str | None = None):
+        """
+        Waits for a slot in the lane, the caller's current lane by default.
+        """
+        lane = lane or current_lane.get()
+        if not self._waiting[lane] and self._has_room(lane):
+            self._running[lane] += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiting[lane].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._running[lane] -= 1
+                    self._wake()
+                else:
+                    self._waiting[lane].remove(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._running[lane] -= 1
+            self._wake()
+
+
+llm_lanes = PriorityLanes(
+    {INTERACTIVE: settings.LLM_INTERACTIVE_CONCURRENCY, BACKGROUND: settings.LLM_BACKGROUND_CONCURRENCY},
+    total=settings.LLM_MAX_CONCURRENCY,
+)
+telegram_lanes = PriorityLanes(
+    {INTERACTIVE: settings.TELEGRAM_INTERACTIVE_CONCURRENCY, BACKGROUND: settings.TELEGRAM_BACKGROUND_CONCURRENCY},
+    total=settings.TELEGRAM_MAX_CONCURRENCY,
+)
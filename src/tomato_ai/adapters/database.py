@@ -1,13 +1,137 @@
-from sqlalchemy import create_engine
+import threading
+from contextlib import asynccontextmanager
+from typing import Callable
+
+from sqlalchemy import Engine, create_engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from tomato_ai.config import settings
 
-def get_engine():
-    return create_engine(settings.database_url)
+_engine: Engine | None = None
+_session_factory: sessionmaker | None = None
+_async_engine: AsyncEngine | None = None
+_async_session_factory: async_sessionmaker[AsyncSession] | None = None
+_lock = threading.RLock()
+
+
+def _engine_options(url: str) -> dict:
+    """
+    Returns the connection pool options for the given database url.
+    """
+    options = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        options["pool_size"] = settings.DB_POOL_SIZE
+        options["max_overflow"] = settings.DB_MAX_OVERFLOW
+    return options
+
+
+def get_engine() -> Engine:
+    """
+    Returns the process-wide engine, creating it on first use.
+    """
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
+    return _engine
+
+
+def get_session_factory() -> sessionmaker:
+    """
+    Returns the process-wide session factory bound to the shared engine.
+    """
+    global _session_factory
+    if _session_factory is None:
+        with _lock:
+            if _session_factory is None:
+                _session_factory = sessionmaker(
+                    autocommit=False, autoflush=False, expire_on_commit=False, bind=get_engine()
+                )
+    return _session_factory
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Returns the process-wide asyncio engine, creating it on first use.
+    """
+    global _async_engine
+    if _async_engine is None:
+        with _lock:
+            if _async_engine is None:
+                _async_engine = create_async_engine(
+                    settings.async_database_url, **_engine_options(settings.async_database_url)
+                )
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker[AsyncSession]:
+    """
+    Returns the process-wide asyncio session factory bound to the shared asyncio engine.
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        with _lock:
+            if _async_session_factory is None:
+                _async_session_factory = async_sessionmaker(
+                    autoflush=False, expire_on_commit=False, bind=get_async_engine()
+                )
+    return _async_session_factory
+
+
+async def dispose_engines():
+    """
+    Closes all pooled connections and forgets the shared engines.
+    """
+    global _engine, _session_factory, _async_engine, _async_session_factory
+    with _lock:
+        engine, async_engine = _engine, _async_engine
+        _engine = None
+        _session_factory = None
+        _async_engine = None
+        _async_session_factory = None
+    if engine is not None:
+        engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
+
 
 def get_session():
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    SessionLocal = get_session_factory()
     with SessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_async_session():
+    AsyncSessionLocal = get_async_session_factory()
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@asynccontextmanager
+async def unit_of_work():
+    """
+    Opens one asyncio session for an event or job, commits all of its writes
+    once on success, rolls back on error and always returns the connection to
+    the pool.
+    """
+    session = get_async_session_factory()()
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]):
+    """
+    Runs `callback` once the session's current transaction has committed.
+    """
+    event.listen(session.sync_session, "after_commit", lambda _: callback(), once=True)
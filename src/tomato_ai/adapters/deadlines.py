@@ -0,0 +1,128 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_EXPIRY = "session_expiry"
+REMINDER = "reminder"
+
+
+class DeadlineScheduler:
+    """
+    Keeps a heap of upcoming deadlines and runs the callback registered for a
+    deadline's kind at the instant it is due.
+
+    Deadlines are only wake-up hints: the callbacks re-check the database, so
+    stale entries (e.g. for a session that was paused) fire harmlessly and
+    deadlines that share an instant are coalesced into one callback run.
+    Processes that never start the timer loop, like the outbox worker, drop
+    their deadlines and leave them to NOTIFY and the reconciliation sweep.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._counter = itertools.count()
+        self._callbacks: Dict[str, Callable[[], Awaitable]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._rerun: Set[str] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def register(self, kind: str, callback: Callable[[], Awaitable]):
+        """
+        Registers the callback that runs when a deadline of the given kind is due.
+        """
+        self._callbacks[kind] = callback
+
+    def schedule(self, kind: str, when: datetime):
+        """
+        Adds a deadline, waking the timer loop if it is earlier than the next one.
+        Does nothing while the timer loop is not running.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        self._loop.call_soon_threadsafe(self._push, kind, when)
+
+    def next_deadline(self) -> datetime | None:
+        """
+        Returns the earliest known deadline, if any.
+        """
+        return self._heap[0][0] if self._heap else None
+
+    async def start(self):
+        """
+        Starts the timer loop on the running event loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the timer loop and waits for in-flight callbacks.
+        """
+        self._rerun.clear()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await asyncio.gather(*self._running.values(), return_exceptions=True)
+        self._heap.clear()
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+
+    def _push(self, kind: str, when: datetime):
+        is_earliest = not self._heap or when < self._heap[0][0]
+        heapq.heappush(self._heap, (when, next(self._counter), kind))
+        if is_earliest and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            due: Set[str] = set()
+            while self._heap and self._heap[0][0] <= now:
+                due.add(heapq.heappop(self._heap)[2])
+            for kind in due:
+                self._fire(kind)
+
+            self._wakeup.clear()
+            timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    def _fire(self, kind: str):
+        if kind not in self._callbacks:
+            return
+        if kind in self._running:
+            # The running callback may have queried before this deadline passed.
+            self._rerun.add(kind)
+            return
+        task = asyncio.create_task(self._callbacks[kind]())
+        self._running[kind] = task
+        task.add_done_callback(lambda finished: self._on_done(kind, finished))
+
+    def _on_done(self, kind: str, task: asyncio.Task):
+        del self._running[kind]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Deadline callback for {kind} failed", exc_info=task.exception())
+        if kind in self._rerun:
+            self._rerun.discard(kind)
+            self._fire(kind)
+
+
+_scheduler = DeadlineScheduler()
+register = _scheduler.register
+schedule = _scheduler.schedule
+next_deadline = _scheduler.next_deadline
+start = _scheduler.start
+stop = _scheduler.stop
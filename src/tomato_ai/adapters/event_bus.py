@@ -1,24 +1,312 @@
+import asyncio
 import inspect
+import logging
+import random
 from collections import defaultdict
-from typing import Callable, Dict, List, Type
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Sequence, Set, Tuple, Type
+
+from tomato_ai.adapters.resilience import CircuitBreaker, CircuitOpenError
+from tomato_ai.config import settings
 from tomato_ai.domain import events
 
-HANDLERS = defaultdict(list)  # type: Dict[Type[events.Event], List[Callable]]
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class HandlerPolicy:
+    """
+    How long a handler may run and how it recovers when it fails.
+
+    A failed or timed out attempt is retried up to `retries` times after a
+    jittered exponential backoff. Once the attempts are exhausted, or while the
+    circuit breaker is open, the fallback handles the event instead.
+    """
+    timeout: float | None = None
+    retries: int = 0
+    backoff: float = 0.5
+    circuit_breaker: CircuitBreaker | None = None
+    fallback: Callable | None = None
+
+
+@dataclass(frozen=True)
+class Subscription:
+    """
+    A handler registered for an event type, with the handlers it must run after
+    and the policy it runs under.
+    """
+    handler: Callable
+    after: Tuple[Callable, ...] = ()
+    policy: HandlerPolicy | None = None
+
+
+class Coalescer:
+    """
+    Buffers events that share a key for a short window and hands the handler a
+    single merged view of them.
+
+    The first event of a key starts the window in a background task, and every
+    publish of the window waits for the merged handler and raises its failure,
+    so the outbox only marks the events processed once the handler succeeded.
+    The buffer is per process: events of one key that reach two processes, or
+    two outbox batches, are handled once in each.
+    """
+
+    def __init__(
+        self,
+        handler: Callable,
+        key: Callable[[events.Event], Hashable],
+        merge: Callable[[Sequence[events.Event]], Any],
+        window: float,
+        policy: HandlerPolicy | None = None,
+    ):
+        self.handler = handler
+        self.key = key
+        self.merge = merge
+        self.window = window
+        self.policy = policy
+        self.__name__ = f"coalesced {handler.__name__}"
+        self._pending: Dict[Hashable, Tuple[List[events.Event], asyncio.Future]] = {}
+        inspect.markcoroutinefunction(self)
+
+    async def __call__(self, event: events.Event):
+        key = self.key(event)
+        if key in self._pending:
+            batch, flushed = self._pending[key]
+            batch.append(event)
+        else:
+            flushed = asyncio.get_running_loop().create_future()
+            self._pending[key] = ([event], flushed)
+            task = asyncio.create_task(self._flush(key, flushed))
+            _coalescing_tasks.add(task)
+            task.add_done_callback(_coalescing_tasks.discard)
+        await asyncio.shield(flushed)
+
+    async def _flush(self, key: Hashable, flushed: asyncio.Future):
+        try:
+            await asyncio.sleep(self.window)
+            batch, _ = self._pending.pop(key)
+            await _invoke(self.handler, self.policy, self.merge(batch))
+        except asyncio.CancelledError:
+            self._pending.pop(key, None)
+            flushed.set_exception(RuntimeError(f"{self.__name__} was cancelled before it ran for {key}"))
+            raise
+        except Exception as e:
+            flushed.set_exception(e)
+        else:
+            flushed.set_result(None)
+
+
+class EventQueueFull(Exception):
+    """
+    Raised when the background event queue is full and the overflow policy is "reject".
+    """
+
+
+HANDLERS = defaultdict(list)  # type: Dict[Type[events.Event], List[Subscription]]
+
+_executor: ThreadPoolExecutor | None = None
+_queue: asyncio.Queue | None = None
+_workers: List[asyncio.Task] = []
+_coalescing_tasks: Set[asyncio.Task] = set()
 
 
-def register(event_type: Type[events.Event], handler: Callable):
+def register(
+    event_type: Type[events.Event],
+    handler: Callable,
+    after: Iterable[Callable] = (),
+    policy: HandlerPolicy | None = None,
+):
     """
     Registers a handler for a given event type.
+
+    Handlers of an event run concurrently; `after` names handlers of the same
+    event type that must finish before this one starts.
+    """
+    HANDLERS[event_type].append(Subscription(handler=handler, after=tuple(after), policy=policy))
+
+
+def register_coalesced(
+    event_types: Iterable[Type[events.Event]],
+    handler: Callable,
+    key: Callable[[events.Event], Hashable],
+    merge: Callable[[Sequence[events.Event]], Any],
+    window: float | None = None,
+    policy: HandlerPolicy | None = None,
+):
+    """
+    Registers an async handler that consumes a merged view of the given event
+    types: events with the same key published within the window are merged
+    into one call.
+    """
+    coalescer = Coalescer(
+        handler, key, merge, settings.EVENT_COALESCE_WINDOW_SECONDS if window is None else window, policy
+    )
+    for event_type in event_types:
+        register(event_type, coalescer)
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Returns the bounded thread pool that runs sync handlers off the event loop.
     """
-    HANDLERS[event_type].append(handler)
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.EVENT_BUS_MAX_WORKERS, thread_name_prefix="event-bus")
+    return _executor
+
+
+def shutdown():
+    """
+    Waits for running sync handlers and releases the thread pool.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def _call(handler: Callable, event: Any):
+    if inspect.iscoroutinefunction(handler):
+        await handler(event)
+    else:
+        await asyncio.get_running_loop().run_in_executor(get_executor(), handler, event)
+
+
+async def _invoke(handler: Callable, policy: HandlerPolicy | None, event: Any):
+    """
+    Calls a handler under its policy. A timed out sync handler keeps its
+    executor thread until it returns, but no longer holds up the event.
+    """
+    if policy is None:
+        await _call(handler, event)
+        return
+
+    breaker = policy.circuit_breaker
+    error: Exception | None = None
+    for attempt in range(policy.retries + 1):
+        if breaker is not None and not breaker.allow():
+            error = CircuitOpenError(f"Circuit {breaker.name} is open, skipped {handler.__name__}")
+            break
+        trial = breaker is not None and breaker.state == "half_open"
+        try:
+            await asyncio.wait_for(_call(handler, event), policy.timeout)
+        except asyncio.CancelledError:
+            if trial:
+                breaker.release_trial()
+            raise
+        except Exception as e:
+            error = e
+            if breaker is not None:
+                breaker.record_failure()
+            logger.warning(f"Handler {handler.__name__} failed on attempt {attempt + 1} for {event}: {e!r}")
+            if isinstance(e, CircuitOpenError):
+                # A dependency's own breaker is open, so retrying now can't succeed.
+                break
+            if attempt < policy.retries:
+                await asyncio.sleep(random.uniform(0, policy.backoff * 2 ** attempt))
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            return
+
+    if policy.fallback is None:
+        raise error
+    logger.warning(f"Handler {handler.__name__} falling back to {policy.fallback.__name__} for {event}")
+    await _call(policy.fallback, event)
+
+
+async def _run(subscription: Subscription, event: events.Event, tasks: Dict[Callable, asyncio.Task], errors: list):
+    for dependency in subscription.after:
+        if dependency in tasks:
+            await tasks[dependency]
+    try:
+        await _invoke(subscription.handler, subscription.policy, event)
+    except Exception as e:
+        logger.exception(f"Handler {subscription.handler.__name__} failed for {event}")
+        errors.append(e)
 
 
 async def publish(event: events.Event):
     """
     Publishes an event to all registered handlers.
+
+    Async handlers run concurrently in a task group and sync handlers run on
+    the bounded executor. A failing handler does not stop the others; once all
+    of them have finished, their failures are raised together as an
+    ExceptionGroup.
     """
-    for handler in HANDLERS[type(event)]:
-        if inspect.iscoroutinefunction(handler):
-            await handler(event)
-        else:
-            handler(event)
+    tasks: Dict[Callable, asyncio.Task] = {}
+    errors: list = []
+    async with asyncio.TaskGroup() as group:
+        for subscription in HANDLERS[type(event)]:
+            tasks[subscription.handler] = group.create_task(_run(subscription, event, tasks, errors))
+    if errors:
+        raise ExceptionGroup(f"{len(errors)} handler(s) failed for {event}", errors)
+
+
+def has_room(count: int = 1) -> bool:
+    """
+    Returns whether `count` more events can be queued without hitting the overflow policy.
+    """
+    return _queue is None or _queue.maxsize <= 0 or _queue.maxsize - _queue.qsize() >= count
+
+
+async def enqueue(event: events.Event, overflow: str | None = None):
+    """
+    Hands an event to the background workers without waiting for its handlers.
+
+    When the queue is full the event is rejected with EventQueueFull or, with the
+    "spill" overflow policy, published inline. `overflow` overrides the
+    configured policy. Without running workers the event is published inline as well.
+    """
+    if _queue is None:
+        await publish(event)
+        return
+    try:
+        _queue.put_nowait(event)
+    except asyncio.QueueFull:
+        if (overflow or settings.EVENT_QUEUE_OVERFLOW) == "reject":
+            raise EventQueueFull(f"Event queue is full, rejected {event}")
+        logger.warning(f"Event queue is full, publishing {event} inline")
+        await publish(event)
+
+
+async def _work():
+    while True:
+        event = await _queue.get()
+        try:
+            await publish(event)
+        except Exception:
+            logger.exception(f"Background handling of {event} failed")
+        finally:
+            _queue.task_done()
+
+
+def start_workers(count: int | None = None, maxsize: int | None = None):
+    """
+    Creates the bounded event queue and its worker tasks on the running event loop.
+    """
+    global _queue
+    _queue = asyncio.Queue(maxsize=maxsize or settings.EVENT_QUEUE_SIZE)
+    _workers.extend(asyncio.create_task(_work()) for _ in range(count or settings.EVENT_QUEUE_WORKERS))
+
+
+async def drain(timeout: float | None = None):
+    """
+    Waits for the queued events and coalescing windows to be handled, then
+    stops the workers.
+    """
+    global _queue
+    if _queue is not None:
+        try:
+            await asyncio.wait_for(_queue.join(), timeout or settings.EVENT_QUEUE_DRAIN_TIMEOUT_SECONDS)
+        except TimeoutError:
+            logger.error(f"Event queue drain timed out, dropping {_queue.qsize()} queued event(s)")
+    await asyncio.gather(*_coalescing_tasks, return_exceptions=True)
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+import httpx
+from strands.models.ollama import OllamaModel
+
+from tomato_ai.config import settings
+
+
+class PooledOllamaModel(OllamaModel):
+    """
+    Ollama model that keeps its connections alive across requests and caps
+    how many of its requests are in flight.
+
+    strands opens a new ollama client per request; every one of them is handed
+    the same pooled transport, so requests reuse warm keep-alive connections
+    instead of repeating the TCP and TLS handshakes. Requests over the
+    in-flight limit queue in arrival order.
+    """
+
+    def __init__(self, host: str, model_id: str, max_in_flight: int, headers: Dict[str, Any] | None = None):
+        self.transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+        )
+        super().__init__(
+            host,
+            ollama_client_args={"headers": headers or {}, "transport": self.transport},
+            model_id=model_id,
+        )
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "requests": self.requests,
+            "avg_wait_seconds": self.total_wait / self.requests if self.requests else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
+
+    @asynccontextmanager
+    async def _slot(self):
+        queued_at = time.monotonic()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        wait = time.monotonic() - queued_at
+        self.requests += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def stream(self, *args, **kwargs):
+        async with self._slot():
+            async for event in super().stream(*args, **kwargs):
+                yield event
+
+    async def structured_output(self, *args, **kwargs):
+        async with self._slot():
+            async for event in super().structured_output(*args, **kwargs):
+                yield event
+
+    async def aclose(self):
+        """
+        Closes the pooled connections.
+        """
+        await self.transport.aclose()
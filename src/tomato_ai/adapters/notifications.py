@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import Callable
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from tomato_ai.adapters.database import get_async_engine
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_CHANNEL = "tomato_ai_reminders"
+
+
+def is_postgres(db_session: AsyncSession) -> bool:
+    """
+    Returns whether the session talks to Postgres, the only backend with LISTEN/NOTIFY.
+    """
+    return db_session.bind is not None and db_session.bind.dialect.name == "postgresql"
+
+
+async def notify(db_session: AsyncSession, channel: str, payload: str):
+    """
+    Queues a NOTIFY in the session's transaction; Postgres delivers it on commit.
+    Other backends rely on in-process wake-ups, so this is a no-op for them.
+    """
+    if is_postgres(db_session):
+        await db_session.execute(select(func.pg_notify(channel, payload)))
+
+
+class Listener:
+    """
+    Holds a dedicated asyncpg connection that LISTENs on a channel and hands
+    every payload to a callback.
+
+    When the connection is lost, e.g. because the database restarted or
+    failed over, the listener logs it and reconnects with a backoff of up to
+    RECONNECT_MAX_SECONDS. Notifications sent while it was disconnected are
+    left to the periodic polling that backs the listener up.
+    """
+
+    RECONNECT_MAX_SECONDS = 60.0
+
+    def __init__(self, channel: str, callback: Callable[[str], None]):
+        self.channel = channel
+        self.callback = callback
+        self._connection: AsyncConnection | None = None
+        self._reconnecting: asyncio.Task | None = None
+        self._stopping = False
+
+    async def start(self):
+        engine = get_async_engine()
+        if engine.dialect.name != "postgresql":
+            return
+        self._stopping = False
+        await self._listen()
+
+    async def stop(self):
+        self._stopping = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            await asyncio.gather(self._reconnecting, return_exceptions=True)
+            self._reconnecting = None
+        if self._connection is None:
+            return
+        raw_connection = await self._connection.get_raw_connection()
+        await raw_connection.driver_connection.remove_listener(self.channel, self._on_notification)
+        await self._connection.close()
+        self._connection = None
+
+    async def _listen(self):
+        self._connection = await get_async_engine().connect()
+        raw_connection = await self._connection.get_raw_connection()
+        await raw_connection.driver_connection.add_listener(self.channel, self._on_notification)
+        raw_connection.driver_connection.add_termination_listener(self._on_terminated)
+        logger.info(f"Listening for notifications on {self.channel}")
+
+    def _on_terminated(self, connection):
+        if self._stopping or self._reconnecting is not None:
+            return
+        logger.warning(f"Lost the connection listening on {self.channel}, reconnecting")
+        self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                await connection.invalidate()
+            except Exception:
+                logger.debug(f"Failed to discard the lost connection listening on {self.channel}", exc_info=True)
+        delay = 1.0
+        try:
+            while True:
+                try:
+                    await self._listen()
+                    return
+                except Exception:
+                    logger.exception(f"Failed to listen on {self.channel} again, retrying in {delay:.0f}s")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+        finally:
+            self._reconnecting = None
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            self.callback(payload)
+        except Exception:
+            logger.exception(f"Failed to handle notification on {channel}: {payload}")
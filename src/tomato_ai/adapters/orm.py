@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
-from sqlalchemy import Column, DateTime, Interval, String, Uuid, Integer, Time
+from sqlalchemy import JSON, Column, DateTime, Index, Interval, String, Uuid, Integer, Time, text
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -23,6 +23,15 @@ class PomodoroSession(Base):
     user_id = Column(Uuid, nullable=False)
     task_id = Column(Uuid, nullable=True)
 
+    __table_args__ = (
+        Index(
+            "ix_pomodoro_sessions_active_expires_at", "expires_at",
+            postgresql_where=text("state = 'active'"), sqlite_where=text("state = 'active'"),
+        ),
+        Index("ix_pomodoro_sessions_user_id_state_start_time", "user_id", "state", "start_time"),
+        Index("ix_pomodoro_sessions_user_id_state_end_time", "user_id", "state", "end_time"),
+    )
+
 
 class Reminder(Base):
     __tablename__ = "reminders"
@@ -36,6 +45,14 @@ class Reminder(Base):
     state = Column(String, nullable=False, default="pending")
     escalation_count = Column(Integer, nullable=False, default=0)
 
+    __table_args__ = (
+        Index(
+            "ix_reminders_pending_send_at", "send_at",
+            postgresql_where=text("state = 'pending'"), sqlite_where=text("state = 'pending'"),
+        ),
+        Index("ix_reminders_user_id_state", "user_id", "state"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
@@ -51,5 +68,51 @@ class User(Base):
                         onupdate=lambda: datetime.now(timezone.utc))
 
 
+class OutboxEvent(Base):
+    __tablename__ = "event_outbox"
+
+    id = Column(Uuid, primary_key=True, default=uuid4)
+    event_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    claimed_by = Column(String, nullable=True)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+    dead_lettered_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_event_outbox_unprocessed_created_at", "created_at",
+            postgresql_where=text("processed_at IS NULL"), sqlite_where=text("processed_at IS NULL"),
+        ),
+    )
+
+
+class AgentSession(Base):
+    __tablename__ = "agent_sessions"
+
+    session_id = Column(String, primary_key=True)
+    data = Column(JSON, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+class AgentSessionAgent(Base):
+    __tablename__ = "agent_session_agents"
+
+    session_id = Column(String, primary_key=True)
+    agent_id = Column(String, primary_key=True)
+    data = Column(JSON, nullable=False)
+
+
+class AgentSessionMessage(Base):
+    __tablename__ = "agent_session_messages"
+
+    session_id = Column(String, primary_key=True)
+    agent_id = Column(String, primary_key=True)
+    message_id = Column(Integer, primary_key=True)
+    data = Column(JSON, nullable=False)
+
+
 def start_mappers():
     pass  # For now, we are using active record pattern
@@ -0,0 +1,231 @@
+import asyncio
+import dataclasses
+import logging
+import typing
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List
+from uuid import UUID
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tomato_ai.adapters import event_bus, notifications, orm
+from tomato_ai.adapters.database import unit_of_work
+from tomato_ai.config import settings
+from tomato_ai.domain import events
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CHANNEL = "tomato_ai_event_outbox"
+
+
+def serialize(event: events.Event) -> dict:
+    """
+    Converts an event into a JSON-compatible payload.
+    """
+    return {
+        name: str(value) if isinstance(value, UUID) else value
+        for name, value in dataclasses.asdict(event).items()
+    }
+
+
+def deserialize(event_type: str, payload: dict) -> events.Event:
+    """
+    Rebuilds an event from its type name and payload.
+    """
+    event_class = getattr(events, event_type)
+    hints = typing.get_type_hints(event_class)
+    return event_class(**{
+        name: UUID(value) if hints.get(name) is UUID and value is not None else value
+        for name, value in payload.items()
+    })
+
+
+async def stage(db_session: AsyncSession, pending_events: Iterable[events.Event]) -> List[events.Event]:
+    """
+    Writes events to the outbox in the session's transaction when the outbox is
+    enabled, and returns the events the caller still has to publish in-process
+    once it has committed.
+    """
+    pending_events = list(pending_events)
+    if not settings.EVENT_OUTBOX_ENABLED or not pending_events:
+        return pending_events
+    for event in pending_events:
+        db_session.add(orm.OutboxEvent(event_type=type(event).__name__, payload=serialize(event)))
+    await notifications.notify(db_session, OUTBOX_CHANNEL, "")
+    return []
+
+
+async def claim_batch(db_session: AsyncSession, worker_id: str, batch_size: int) -> List[orm.OutboxEvent]:
+    """
+    Leases a batch of unprocessed events to the worker with FOR UPDATE SKIP LOCKED.
+
+    Events whose lease has expired, because their worker crashed or their
+    handlers failed, are claimed again until they run out of attempts. Events
+    whose last lease expired without a result are dead-lettered first.
+    """
+    now = datetime.now(timezone.utc)
+    lease_expired = or_(orm.OutboxEvent.claimed_until.is_(None), orm.OutboxEvent.claimed_until < now)
+    exhausted = (
+        await db_session.scalars(
+            select(orm.OutboxEvent.id)
+            .where(
+                orm.OutboxEvent.processed_at.is_(None),
+                orm.OutboxEvent.dead_lettered_at.is_(None),
+                orm.OutboxEvent.attempts >= settings.OUTBOX_MAX_ATTEMPTS,
+                lease_expired,
+            )
+            .with_for_update(skip_locked=True)
+        )
+    ).all()
+    if exhausted:
+        logger.error(f"Dead-lettering {len(exhausted)} outbox events whose last attempt never finished: {exhausted}")
+        await dead_letter(db_session, exhausted)
+    claimed = (
+        await db_session.scalars(
+            select(orm.OutboxEvent)
+            .where(
+                orm.OutboxEvent.processed_at.is_(None),
+                orm.OutboxEvent.dead_lettered_at.is_(None),
+                orm.OutboxEvent.attempts < settings.OUTBOX_MAX_ATTEMPTS,
+                lease_expired,
+            )
+            .order_by(orm.OutboxEvent.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+    ).all()
+    if claimed:
+        await db_session.execute(
+            update(orm.OutboxEvent)
+            .where(orm.OutboxEvent.id.in_([row.id for row in claimed]))
+            .values(
+                claimed_by=worker_id,
+                claimed_until=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+                attempts=orm.OutboxEvent.attempts + 1,
+            )
+            .execution_options(synchronize_session=False)
+        )
+    await db_session.commit()
+    return claimed
+
+
+async def dead_letter(db_session: AsyncSession, event_ids: Iterable[UUID]):
+    """
+    Parks events that ran out of attempts so workers stop claiming them and
+    operators can find them with `dead_lettered_at IS NOT NULL`.
+    """
+    await db_session.execute(
+        update(orm.OutboxEvent)
+        .where(orm.OutboxEvent.id.in_(list(event_ids)))
+        .values(dead_lettered_at=datetime.now(timezone.utc), claimed_by=None, claimed_until=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def replay_dead_letters(event_ids: Iterable[UUID] | None = None) -> int:
+    """
+    Hands dead-lettered events back to the workers with a fresh set of attempts,
+    either the given ones or all of them. Returns the number of events replayed.
+    """
+    condition = orm.OutboxEvent.dead_lettered_at.is_not(None)
+    if event_ids is not None:
+        condition = condition & orm.OutboxEvent.id.in_(list(event_ids))
+    async with unit_of_work() as db_session:
+        result = await db_session.execute(
+            update(orm.OutboxEvent)
+            .where(condition)
+            .values(dead_lettered_at=None, attempts=0)
+            .execution_options(synchronize_session=False)
+        )
+        await notifications.notify(db_session, OUTBOX_CHANNEL, "")
+    logger.info(f"Replaying {result.rowcount} dead-lettered outbox events")
+    return result.rowcount
+
+
+async def renew_lease(worker_id: str, event_ids: Iterable[UUID]):
+    """
+    Extends the lease on events the worker is still delivering. Events another
+    worker has already re-claimed are left alone.
+    """
+    async with unit_of_work() as db_session:
+        await db_session.execute(
+            update(orm.OutboxEvent)
+            .where(
+                orm.OutboxEvent.id.in_(list(event_ids)),
+                orm.OutboxEvent.claimed_by == worker_id,
+                orm.OutboxEvent.processed_at.is_(None),
+            )
+            .values(claimed_until=datetime.now(timezone.utc) + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def _keep_leased(worker_id: str, in_flight: set):
+    while True:
+        await asyncio.sleep(settings.OUTBOX_LEASE_SECONDS / 3)
+        if not in_flight:
+            continue
+        try:
+            await renew_lease(worker_id, set(in_flight))
+        except Exception:
+            logger.exception(f"Failed to renew the lease on {len(in_flight)} outbox events")
+
+
+async def drain_once(worker_id: str, batch_size: int | None = None, concurrency: int | None = None) -> int:
+    """
+    Claims one batch of outbox events, publishes them concurrently and marks the
+    delivered ones processed. Returns the number of events claimed.
+
+    Events that fail on their last attempt are dead-lettered instead of being
+    left for a retry that never comes.
+
+    The lease on undelivered events is renewed every third of the lease while
+    the batch runs, so slow handlers don't let another worker claim them too.
+    """
+    async with unit_of_work() as db_session:
+        claimed = await claim_batch(db_session, worker_id, batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not claimed:
+        return 0
+
+    semaphore = asyncio.Semaphore(concurrency or settings.OUTBOX_CONCURRENCY)
+    in_flight = {row.id for row in claimed}
+    dead_lettered = []
+
+    async def deliver(row: orm.OutboxEvent) -> UUID | None:
+        async with semaphore:
+            try:
+                await event_bus.publish(deserialize(row.event_type, row.payload))
+            except Exception:
+                # claim_batch has already counted this attempt, but the loaded row predates it
+                attempt = row.attempts + 1
+                if attempt >= settings.OUTBOX_MAX_ATTEMPTS:
+                    logger.exception(
+                        f"Outbox event {row.id} ({row.event_type}) failed its last attempt, dead-lettering it"
+                    )
+                    dead_lettered.append(row.id)
+                else:
+                    logger.exception(f"Outbox event {row.id} ({row.event_type}) failed on attempt {attempt}")
+                return None
+            finally:
+                in_flight.discard(row.id)
+            return row.id
+
+    renewer = asyncio.create_task(_keep_leased(worker_id, in_flight))
+    try:
+        delivered = [row_id for row_id in await asyncio.gather(*(deliver(row) for row in claimed)) if row_id]
+    finally:
+        renewer.cancel()
+        await asyncio.gather(renewer, return_exceptions=True)
+    if delivered or dead_lettered:
+        async with unit_of_work() as db_session:
+            if delivered:
+                await db_session.execute(
+                    update(orm.OutboxEvent)
+                    .where(orm.OutboxEvent.id.in_(delivered))
+                    .values(processed_at=datetime.now(timezone.utc))
+                    .execution_options(synchronize_session=False)
+                )
+            if dead_lettered:
+                await dead_letter(db_session, dead_lettered)
+    return len(claimed)
@@ -1,4 +1,5 @@
 import telegram
+from tomato_ai.adapters.concurrency import telegram_lanes
 from tomato_ai.config import settings
 
 
@@ -10,7 +11,8 @@ class TelegramNotifier:
         self.bot = telegram.Bot(token=token)
 
     async def send_message(self, chat_id: str, message: str, reply_markup: InlineKeyboardMarkup | None = None):
-        await self.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup)
+        async with telegram_lanes.slot():
+            await self.bot.send_message(chat_id=chat_id, text=message, reply_markup=reply_markup)
 
 
 def get_telegram_notifier() -> TelegramNotifier | None:
@@ -1,25 +1,36 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+from tomato_ai.adapters.agent_sessions import AgentSessionStore, AgentSessionView, agent_sessions
+from tomato_ai.adapters.llm import PooledOllamaModel
 from tomato_ai.config import settings
 from strands import Agent
-from strands.models.ollama import OllamaModel
-
-turbo_120_ollama_model = OllamaModel(
-    ollama_client_args={
-        "headers": {
-            "Authorization": settings.OLLAMA_API_KEY,
-        },
-    },
-    host="https://ollama.com",
-    model_id="gpt-oss:120b",
+from strands.agent.conversation_manager import ConversationManager
+from strands.hooks import BeforeInvocationEvent, BeforeModelCallEvent, HookRegistry
+from strands.session.repository_session_manager import RepositorySessionManager
+from strands.session.session_manager import SessionManager
+from strands.types.content import Message
+
+logger = logging.getLogger(__name__)
+
+turbo_120_ollama_model = PooledOllamaModel(
+    host=settings.OLLAMA_HOST,
+    model_id=settings.OLLAMA_LARGE_MODEL_ID,
+    max_in_flight=settings.OLLAMA_MAX_IN_FLIGHT_PER_MODEL,
+    headers={"Authorization": settings.OLLAMA_API_KEY},
 )
 
-turbo_20_ollama_model = OllamaModel(
-    ollama_client_args={
-        "headers": {
-            "Authorization": settings.OLLAMA_API_KEY,
-        },
-    },
-    host="https://ollama.com",
-    model_id="gpt-oss:20b",
+turbo_20_ollama_model = PooledOllamaModel(
+    host=settings.OLLAMA_HOST,
+    model_id=settings.OLLAMA_SMALL_MODEL_ID,
+    max_in_flight=settings.OLLAMA_MAX_IN_FLIGHT_PER_MODEL,
+    headers={"Authorization": settings.OLLAMA_API_KEY},
 )
 
 agent = Agent(
@@ -27,9 +38,7 @@ agent = Agent(
     system_prompt=""
 )
 
-negotiation_agent = Agent(
-    model=turbo_120_ollama_model,
-    system_prompt="""
+NEGOTIATION_PROMPT = """
 You are a productivity coach who communicates only via Telegram. Your goal is to help the user stay focused and productive using the Pomodoro Technique.
 
 **Rules:**
@@ -94,4 +103,311 @@ Action:
   "text": "Just a friendly nudge to get back on track. Let's start the next Pomodoro session!"
 }
 """
-)
+
+
+def get_negotiation_agent() -> Agent:
+    """
+    Returns a fresh negotiation agent; agents reject concurrent calls, so each nudge gets its own.
+    """
+    return Agent(model=turbo_120_ollama_model, system_prompt=NEGOTIATION_PROMPT)
+
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+CHARS_PER_TOKEN = 4
+SNIPPET_CHARS = 160
+
+
+def _message_text(message: Message) -> str:
+    parts = []
+    for block in message.get("content", []):
+        if "text" in block:
+            parts.append(block["text"])
+        else:
+            parts.append(json.dumps(block, default=str))
+    return " ".join(parts)
+
+
+def estimate_tokens(messages: List[Message]) -> int:
+    """
+    Rough token count of `messages`, about four characters per token.
+    """
+    return sum(len(_message_text(message)) for message in messages) // CHARS_PER_TOKEN
+
+
+class BoundedConversationManager(ConversationManager):
+    """
+    Keeps an agent's history to the last `keep_turns` turns verbatim plus a
+    compact summary of everything older, and never lets it exceed
+    `max_tokens`.
+
+    The summary is extractive: a clipped line per rolled-off message, keeping
+    only the newest `summary_chars` characters. Building it needs no model
+    call, so it is cheap enough to run before every request. When the kept
+    turns alone are over the token cap, the oldest of them are dropped.
+    """
+
+    def __init__(self, keep_turns: int, max_tokens: int, summary_chars: int):
+        super().__init__()
+        self.keep_turns = keep_turns
+        self.max_tokens = max_tokens
+        self.summary_chars = summary_chars
+        self._summary_message: Message | None = None
+
+    def register_hooks(self, registry: HookRegistry, **kwargs: Any) -> None:
+        super().register_hooks(registry, **kwargs)
+        registry.add_callback(BeforeInvocationEvent, lambda event: self.apply_management(event.agent))
+        registry.add_callback(BeforeModelCallEvent, lambda event: self.apply_management(event.agent))
+
+    def restore_from_session(self, state: dict[str, Any]) -> list[Message] | None:
+        """
+        Restores the summary; state left by another conversation manager only carries its offset over.
+        """
+        self.removed_message_count = state.get("removed_message_count", 0)
+        if state.get("__name__") != self.__class__.__name__:
+            return None
+        self._summary_message = state.get("summary_message")
+        return [self._summary_message] if self._summary_message else None
+
+    def get_state(self) -> dict[str, Any]:
+        return {"summary_message": self._summary_message, **super().get_state()}
+
+    @property
+    def summary(self) -> str:
+        if self._summary_message is None:
+            return ""
+        return self._summary_message["content"][0]["text"].removeprefix(SUMMARY_HEADER).strip()
+
+    def _turns(self, agent: Agent) -> List[Message]:
+        messages = agent.messages
+        if self._summary_message is not None and messages and messages[0] is self._summary_message:
+            return messages[1:]
+        return messages
+
+    def _rebuild(self, agent: Agent, dropped: List[Message], kept: List[Message], summarize: bool):
+        if summarize:
+            lines = [self.summary] if self.summary else []
+            for message in dropped:
+                text = " ".join(_message_text(message).split())
+                if len(text) > SNIPPET_CHARS:
+                    text = text[: SNIPPET_CHARS - 3] + "..."
+                lines.append(f"{message['role'].capitalize()}: {text}")
+            summary = "\n".join(lines)[-self.summary_chars :]
+            self._summary_message = {"role": "user", "content": [{"text": f"{SUMMARY_HEADER}\n{summary}"}]}
+        self.removed_message_count += len(dropped)
+        agent.messages[:] = ([self._summary_message] if self._summary_message else []) + kept
+
+    def apply_management(self, agent: Agent, **kwargs: Any) -> None:
+        turns = self._turns(agent)
+        split = max(0, len(turns) - 2 * self.keep_turns)
+        while 0 < split < len(turns) and turns[split]["role"] != "user":
+            split -= 1
+        if split > 0:
+            self._rebuild(agent, turns[:split], turns[split:], summarize=True)
+
+        turns = self._turns(agent)
+        summary = [self._summary_message] if self._summary_message else []
+        split = 0
+        while split < len(turns) - 1 and estimate_tokens(summary + turns[split:]) > self.max_tokens:
+            split += 1
+        if split > 0:
+            self._rebuild(agent, turns[:split], turns[split:], summarize=False)
+
+    def reduce_context(self, agent: Agent, e: Exception | None = None, **kwargs: Any) -> None:
+        """
+        Halves the kept turns into the summary when the model still reports an overflow.
+        """
+        turns = self._turns(agent)
+        split = len(turns) // 2
+        if split == 0:
+            raise e or RuntimeError("Conversation cannot be reduced any further")
+        self._rebuild(agent, turns[:split], turns[split:], summarize=True)
+
+
+def bounded_conversation() -> BoundedConversationManager:
+    return BoundedConversationManager(
+        keep_turns=settings.AGENT_MEMORY_TURNS,
+        max_tokens=settings.AGENT_MEMORY_MAX_TOKENS,
+        summary_chars=settings.AGENT_MEMORY_SUMMARY_CHARS,
+    )
+
+
+class CompactingSessionManager(RepositorySessionManager):
+    """
+    Session manager that deletes the stored messages its agent's conversation
+    manager has dropped.
+
+    strands keeps every message and skips the dropped ones on load by
+    position, so they are deleted in batches of `compact_after`. The offset
+    is reset and saved before the messages go: an interrupted compaction
+    reloads a few extra messages rather than losing kept ones.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        session_repository: AgentSessionStore | AgentSessionView,
+        compact_after: int | None = None,
+        **kwargs: Any,
+    ):
+        super().__init__(session_id, session_repository, **kwargs)
+        self.compact_after = compact_after or settings.AGENT_SESSION_COMPACT_AFTER
+
+    def sync_agent(self, agent, **kwargs: Any) -> None:
+        conversation_manager = getattr(agent, "conversation_manager", None)
+        removed = getattr(conversation_manager, "removed_message_count", 0)
+        if removed < self.compact_after:
+            return super().sync_agent(agent, **kwargs)
+
+        conversation_manager.removed_message_count = 0
+        super().sync_agent(agent, **kwargs)
+        self.session_repository.delete_oldest_messages(self.session_id, agent.agent_id, removed)
+
+
+async def _call(call: Callable[..., Awaitable], *args):
+    return await call(*args)
+
+
+@dataclass
+class _CachedAgent:
+    agent: Agent
+    session_manager: SessionManager
+    last_used: float
+    generation: int = 0
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0
+    evicted: bool = False
+
+
+class AgentCache:
+    """
+    Bounded LRU cache of per-chat agents whose entries also expire after
+    `ttl` seconds without use.
+
+    An agent and its session are loaded once per active chat instead of once
+    per message. Calls on one agent are serialized because strands agents
+    reject concurrent invocations. An evicted agent is closed exactly once,
+    syncing its session to the store, when its last caller leaves. Agents
+    whose session the store reloaded after a conflicting write are replaced.
+    The cache belongs to the event loop that uses it.
+
+    Model calls go through `run` once the chat's agent is held, so a timeout or
+    circuit breaker it applies doesn't count the wait for the agent.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[str, SessionManager], Agent],
+        max_size: int,
+        ttl: float,
+        session_store: AgentSessionStore = agent_sessions,
+        run: Callable[..., Awaitable] | None = None,
+    ):
+        self.name = name
+        self.factory = factory
+        self.run = run or _call
+        self.session_store = session_store
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, _CachedAgent] = OrderedDict()
+        self._retiring: Dict[str, _CachedAgent] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key)
+        entry.evicted = True
+        self.evictions += 1
+        if entry.users:
+            self._retiring[key] = entry
+        else:
+            self._close(key, entry)
+
+    def _close(self, key: str, entry: _CachedAgent):
+        try:
+            entry.session_manager.sync_agent(entry.agent)
+            entry.agent.cleanup()
+        except Exception:
+            logger.exception(f"Failed to flush {self.name} agent for {key}")
+        finally:
+            self.session_store.release(key)
+
+    def _checkout(self, key: str) -> _CachedAgent:
+        now = time.monotonic()
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if now - oldest.last_used < self.ttl:
+                break
+            self._evict(oldest_key)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.generation != self.session_store.generation(key):
+            # The store reloaded the session after another process wrote it.
+            self._evict(key)
+            entry = self._retiring.get(key)
+            if entry is not None:
+                return entry
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            session_manager = CompactingSessionManager(key, self.session_store.view(key))
+            entry = _CachedAgent(
+                self.factory(key, session_manager), session_manager, now, self.session_store.generation(key)
+            )
+            self.session_store.retain(key)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_size:
+                self._evict(next(iter(self._entries)))
+        entry.last_used = now
+        return entry
+
+    @asynccontextmanager
+    async def lease(self, key: str) -> AsyncIterator[Agent]:
+        """
+        Holds the chat's agent for one call.
+
+        While an evicted agent of the chat still has callers, new callers queue
+        behind them, and once they get their turn check out a fresh agent from
+        the synced session.
+        """
+        while True:
+            entry = self._retiring.get(key)
+            if entry is None:
+                if key not in self._entries:
+                    await self.session_store.load(key)
+                entry = self._retiring.get(key) or self._checkout(key)
+            entry.users += 1
+            try:
+                async with entry.lock:
+                    if not entry.evicted:
+                        yield entry.agent
+                        return
+            finally:
+                entry.users -= 1
+                if entry.evicted and not entry.users:
+                    del self._retiring[key]
+                    self._close(key, entry)
+
+    async def invoke(self, key: str, prompt: str) -> str:
+        async with self.lease(key) as agent:
+            return str(await self.run(agent.invoke_async, prompt))
+
+    async def structured_output(self, key: str, output_model, prompt: str):
+        async with self.lease(key) as agent:
+            return await self.run(agent.structured_output_async, output_model, prompt)
+
+    def clear(self):
+        """
+        Evicts every agent, flushing their sessions.
+        """
+        while self._entries:
+            self._evict(next(iter(self._entries)))
@@ -1,7 +1,25 @@
 from tomato_ai.domain import events
 from tomato_ai.adapters import event_bus
+from tomato_ai.config import settings
 from tomato_ai import handlers
 
+
+def llm_policy(fallback) -> event_bus.HandlerPolicy:
+    """
+    Returns the policy for handlers that call the LLM.
+
+    The timeout and the ollama circuit breaker apply to the model call itself in
+    handlers.run_agent, so lock waits and database or Telegram calls don't trip
+    them; a model call that times out or is short-circuited still ends in the
+    fallback.
+    """
+    return event_bus.HandlerPolicy(
+        retries=settings.LLM_HANDLER_RETRIES,
+        backoff=settings.LLM_HANDLER_BACKOFF_SECONDS,
+        fallback=fallback,
+    )
+
+
 def bootstrap():
     """
     Initializes the application by registering event handlers.
@@ -11,9 +29,20 @@ def bootstrap():
     event_bus.register(events.SessionPaused, handlers.log_event)
     event_bus.register(events.SessionResumed, handlers.log_event)
     event_bus.register(events.SessionExpired, handlers.log_event)
-    event_bus.register(events.SessionCompleted, handlers.send_telegram_notification)
-    event_bus.register(events.SessionStarted, handlers.send_telegram_notification_on_start)
-    event_bus.register(events.SessionExpired, handlers.send_telegram_notification_on_expiration)
+    event_bus.register_coalesced(
+        (events.SessionCompleted, events.SessionExpired),
+        handlers.send_session_end_notification,
+        key=lambda event: event.session_id,
+        merge=events.SessionEnded.merge,
+        policy=llm_policy(handlers.send_session_end_fallback),
+    )
+    event_bus.register(
+        events.SessionStarted,
+        handlers.send_telegram_notification_on_start,
+        policy=llm_policy(handlers.send_session_start_fallback),
+    )
     event_bus.register(events.SessionCompleted, handlers.schedule_nudge_on_session_completed)
     event_bus.register(events.SessionStarted, handlers.cancel_reminder_on_session_started)
-    event_bus.register(events.NudgeUser, handlers.handle_nudge)
+    event_bus.register(
+        events.NudgeUser, handlers.handle_nudge, policy=llm_policy(handlers.handle_nudge_fallback)
+    )
@@ -1,5 +1,8 @@
 
+from typing import Literal
+
 from pydantic import PostgresDsn
+from sqlalchemy import make_url
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,18 +15,77 @@ class Settings(BaseSettings):
     DB_NAME: str = "tomato-ai"
     TEST_DATABASE_URL: str | None = None
 
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+
     TELEGRAM_BOT_TOKEN: str | None = None
     TELEGRAM_CHAT_ID: str | None = None
 
     OLLAMA_API_KEY: str | None = None
+    OLLAMA_HOST: str = "https://ollama.com"
+    OLLAMA_SMALL_MODEL_ID: str = "gpt-oss:20b"
+    OLLAMA_LARGE_MODEL_ID: str = "gpt-oss:120b"
+    OLLAMA_MAX_IN_FLIGHT_PER_MODEL: int = 4
+    OLLAMA_MAX_CONNECTIONS: int = 16
+    OLLAMA_MAX_KEEPALIVE_CONNECTIONS: int = 8
+    OLLAMA_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
 
     MAX_ESCALATIONS: int = 3
 
+    SESSION_EXPIRY_BATCH_SIZE: int = 500
+    REMINDER_CLAIM_BATCH_SIZE: int = 100
+    REMINDER_DISPATCH_CONCURRENCY: int = 10
+    REMINDER_TICK_BUDGET_SECONDS: float = 30.0
+    RECONCILIATION_INTERVAL_SECONDS: int = 60
+
+    EVENT_BUS_MAX_WORKERS: int = 4
+    EVENT_QUEUE_SIZE: int = 1000
+    EVENT_QUEUE_WORKERS: int = 4
+    EVENT_QUEUE_OVERFLOW: Literal["reject", "spill"] = "spill"
+    EVENT_QUEUE_DRAIN_TIMEOUT_SECONDS: float = 30.0
+    EVENT_COALESCE_WINDOW_SECONDS: float = 0.5
+    LLM_HANDLER_RETRIES: int = 1
+    LLM_HANDLER_BACKOFF_SECONDS: float = 1.0
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: float = 60.0
+    LLM_CALL_TIMEOUT_SECONDS: float = 45.0
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_INTERACTIVE_CONCURRENCY: int = 8
+    LLM_BACKGROUND_CONCURRENCY: int = 4
+    TELEGRAM_MAX_CONCURRENCY: int = 16
+    TELEGRAM_INTERACTIVE_CONCURRENCY: int = 16
+    TELEGRAM_BACKGROUND_CONCURRENCY: int = 8
+    AGENT_CACHE_SIZE: int = 256
+    AGENT_CACHE_TTL_SECONDS: float = 1800.0
+    AGENT_MEMORY_TURNS: int = 10
+    AGENT_MEMORY_MAX_TOKENS: int = 4000
+    AGENT_MEMORY_SUMMARY_CHARS: int = 2000
+    AGENT_SESSION_COMPACT_AFTER: int = 20
+    AGENT_SESSION_FLUSH_SECONDS: float = 2.0
+    AGENT_SESSION_FLUSH_BATCH_SIZE: int = 200
+    MESSAGE_POOL_SIZE: int = 10
+    MESSAGE_POOL_REFRESH_SECONDS: int = 6 * 60 * 60
+
+    EVENT_OUTBOX_ENABLED: bool = False
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_CONCURRENCY: int = 10
+    OUTBOX_LEASE_SECONDS: int = 300
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+
     @property
     def database_url(self) -> PostgresDsn:
         if self.TEST_DATABASE_URL:
             return self.TEST_DATABASE_URL
         return f"postgresql://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}/{self.DB_NAME}"
 
+    @property
+    def async_database_url(self) -> str:
+        url = str(self.database_url)
+        driver = "sqlite+aiosqlite" if make_url(url).get_backend_name() == "sqlite" else "postgresql+asyncpg"
+        return f"{driver}://{url.split('://', 1)[1]}"
+
 
 settings = Settings()
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Sequence
 from uuid import UUID
 
 
@@ -63,3 +64,26 @@ class SessionExpired(Event):
     """
     session_id: UUID
     user_id: UUID
+
+
+@dataclass(frozen=True)
+class SessionEnded(Event):
+    """
+    Merged view of the events raised when a session ends, for handlers that
+    want to react once per session rather than once per event.
+    """
+    session_id: UUID
+    user_id: UUID
+    session_type: str
+    expired: bool
+
+    @classmethod
+    def merge(cls, session_events: Sequence[Event]) -> "SessionEnded":
+        completed = next((e for e in session_events if isinstance(e, SessionCompleted)), None)
+        first = session_events[0]
+        return cls(
+            session_id=first.session_id,
+            user_id=first.user_id,
+            session_type=completed.session_type if completed else "work",
+            expired=any(isinstance(e, SessionExpired) for e in session_events),
+        )
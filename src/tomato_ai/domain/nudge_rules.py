@@ -0,0 +1,99 @@
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from typing import Callable, Dict, Sequence
+
+from tomato_ai.domain.agent_actions import AgentAction
+
+LLM = "llm"
+MORNING_WINDOW = timedelta(hours=2)
+
+
+@dataclass(frozen=True)
+class NudgeContext:
+    """
+    What the rules know about a user at the moment a nudge fires.
+    `now` is in the user's timezone.
+    """
+    now: datetime
+    work_start: time | None
+    work_end: time | None
+    sessions_today: int
+    desired_sessions: int | None
+    escalation_count: int
+
+
+NudgeRule = Callable[[NudgeContext], AgentAction | None]
+
+
+def _minutes_until_next_work_start(context: NudgeContext) -> int:
+    start = context.now.replace(
+        hour=context.work_start.hour, minute=context.work_start.minute, second=0, microsecond=0
+    )
+    if start <= context.now:
+        start += timedelta(days=1)
+    return max(1, int((start - context.now).total_seconds() // 60))
+
+
+def before_work(context: NudgeContext) -> AgentAction | None:
+    """
+    Nobody is nudged before their working day starts; try again when it does.
+    """
+    if context.work_start is None or context.now.time() >= context.work_start:
+        return None
+    return AgentAction(action="pomodoro_schedule_next", time=f"{_minutes_until_next_work_start(context)}m")
+
+
+def done_for_the_day(context: NudgeContext) -> AgentAction | None:
+    """
+    After work with the daily goal met, the next nudge waits for tomorrow's work start.
+    """
+    if context.work_end is None or context.work_start is None or context.desired_sessions is None:
+        return None
+    if context.now.time() < context.work_end or context.sessions_today < context.desired_sessions:
+        return None
+    return AgentAction(action="pomodoro_schedule_next", time=f"{_minutes_until_next_work_start(context)}m")
+
+
+def first_nudge_of_the_morning(context: NudgeContext) -> AgentAction | None:
+    """
+    The first nudge early in the working day is a plain invitation to start.
+    """
+    if context.work_start is None or context.sessions_today > 0 or context.escalation_count > 1:
+        return None
+    start = datetime.combine(context.now.date(), context.work_start, tzinfo=context.now.tzinfo)
+    if not start <= context.now < start + MORNING_WINDOW:
+        return None
+    return AgentAction(
+        action="telegram_message",
+        text="Good morning! Ready to start your first pomodoro of the day?",
+        buttons=["Start", "Not now"],
+    )
+
+
+DEFAULT_RULES: Sequence[NudgeRule] = (before_work, done_for_the_day, first_nudge_of_the_morning)
+
+
+class NudgeDecisionEngine:
+    """
+    Decides the obvious nudges with deterministic rules and leaves the
+    ambiguous ones to the negotiation agent.
+
+    Rules are tried in order and the first action wins. Every decision is
+    counted under the rule that made it, or under "llm" when none applied.
+    """
+
+    def __init__(self, rules: Sequence[NudgeRule] = DEFAULT_RULES):
+        self.rules = list(rules)
+        self.paths: Counter = Counter()
+
+    def decide(self, context: NudgeContext) -> AgentAction | None:
+        for rule in self.rules:
+            if (action := rule(context)) is not None:
+                self.paths[rule.__name__] += 1
+                return action
+        self.paths[LLM] += 1
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.paths)
@@ -1,12 +1,19 @@
 
+import asyncio
+import logging
 from datetime import datetime, timedelta, timezone
 from uuid import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from tomato_ai.adapters import event_bus, orm, telegram
-from tomato_ai.domain import events, models
+from tomato_ai.adapters import deadlines, event_bus, notifications, orm, outbox, telegram
+from tomato_ai.adapters.database import after_commit
+from tomato_ai.config import settings
+from tomato_ai.domain import events
 from tomato_ai.domain.models import PomodoroSession, WORK, SHORT_BREAK, LONG_BREAK
 
+logger = logging.getLogger(__name__)
+
 
 class SessionManager:
     """
@@ -41,40 +48,65 @@ class SessionNotifier:
     A domain service for notifying users about session events.
     """
 
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: AsyncSession, batch_size: int | None = None):
         self.db_session = db_session
+        self.batch_size = batch_size or settings.SESSION_EXPIRY_BATCH_SIZE
 
     async def check_and_notify_expired_sessions(self):
         """
-        Checks for expired sessions and notifies the user.
-        """
-        active_sessions = self.db_session.query(orm.PomodoroSession).filter_by(state="active").all()
-        for orm_session in active_sessions:
-            if orm_session.expires_at and orm_session.expires_at < datetime.now(timezone.utc):
-                domain_session = models.PomodoroSession(
-                    user_id=orm_session.user_id,
-                    session_id=orm_session.session_id,
-                    start_time=orm_session.start_time,
-                    end_time=orm_session.end_time,
-                    state=orm_session.state,
-                    duration=orm_session.duration,
-                    task_id=orm_session.task_id,
-                    expires_at=orm_session.expires_at,
-                    pause_start_time=orm_session.pause_start_time,
-                    total_paused_duration=orm_session.total_paused_duration,
+        Completes expired sessions and notifies the user.
+
+        Sessions are expired with one set-based UPDATE ... RETURNING per batch, so
+        the cost of a tick follows the number of expired sessions rather than the
+        number of running ones. Rows are claimed with FOR UPDATE SKIP LOCKED so
+        that several replicas split the work instead of blocking on each other,
+        and each batch is committed, together with its events when the outbox
+        is enabled, before its events are handed to the event queue. The
+        notifications run on the queue's workers, so a deadline callback only
+        waits for the claim.
+        """
+        while True:
+            now = datetime.now(timezone.utc)
+            expired_ids = (
+                select(orm.PomodoroSession.session_id)
+                .where(orm.PomodoroSession.state == "active", orm.PomodoroSession.expires_at < now)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            expired = (
+                await self.db_session.execute(
+                    update(orm.PomodoroSession)
+                    .where(orm.PomodoroSession.session_id.in_(expired_ids), orm.PomodoroSession.state == "active")
+                    .values(state="completed", end_time=now)
+                    .returning(
+                        orm.PomodoroSession.session_id,
+                        orm.PomodoroSession.user_id,
+                        orm.PomodoroSession.session_type,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            ).all()
+            expiry_events = []
+            for session_id, user_id, session_type in expired:
+                expiry_events.append(
+                    events.SessionCompleted(session_id=session_id, user_id=user_id, session_type=session_type)
                 )
-                domain_session.complete()
-                orm_session.state = domain_session.state
-                orm_session.end_time = domain_session.end_time
+                expiry_events.append(events.SessionExpired(session_id=session_id, user_id=user_id))
+            pending_events = await outbox.stage(self.db_session, expiry_events)
+            await self.db_session.commit()
 
-                for event in domain_session.events:
-                    await event_bus.publish(event)
+            # Handed off together, so a session's completion and expiry land in one coalescing window.
+            await asyncio.gather(*(self._enqueue(event) for event in pending_events))
 
-                await event_bus.publish(
-                    events.SessionExpired(session_id=domain_session.session_id, user_id=domain_session.user_id)
-                )
-                self.db_session.add(orm_session)
-        self.db_session.commit()
+            if len(expired) < self.batch_size:
+                break
+
+    async def _enqueue(self, event: events.Event):
+        try:
+            # The sessions are already committed, so a full queue publishes inline instead of dropping the event.
+            await event_bus.enqueue(event, overflow="spill")
+        except Exception:
+            logger.exception(f"Failed to publish {event}")
 
 
 class ReminderNotifier:
@@ -82,46 +114,143 @@ class ReminderNotifier:
     A domain service for notifying users about reminders.
     """
 
-    def __init__(self, db_session: Session):
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+        tick_budget: float | None = None,
+    ):
         self.db_session = db_session
+        self.batch_size = batch_size or settings.REMINDER_CLAIM_BATCH_SIZE
+        self.concurrency = concurrency or settings.REMINDER_DISPATCH_CONCURRENCY
+        self.tick_budget = settings.REMINDER_TICK_BUDGET_SECONDS if tick_budget is None else tick_budget
+        self._started = 0
 
     async def check_and_send_reminders(self):
         """
         Checks for pending reminders and sends a notification if the user does not have an active session.
+
+        Due reminders are claimed in batches and committed as triggered before
+        their nudges are handed to the event queue, so each reminder is
+        delivered by exactly one replica and a deadline callback doesn't wait
+        for the LLM or Telegram. Nudges of a batch are dispatched concurrently,
+        up to the configured limit, and a failing nudge does not affect the
+        others. When the queue is full they are published inline.
+
+        The tick's time budget is enforced during dispatch: once it is spent,
+        nudges that have not started are released back to pending, no further
+        batches are claimed and the next tick is scheduled right away. The first
+        `concurrency` nudges of a tick always start, so every tick makes progress.
+        """
+        loop = asyncio.get_running_loop()
+        budget_ends_at = loop.time() + self.tick_budget
+        semaphore = asyncio.Semaphore(self.concurrency)
+        self._started = 0
+        while True:
+            claimed, nudges = await self._claim_due_reminders()
+            started = await asyncio.gather(
+                *(self._dispatch(nudge, semaphore, budget_ends_at) for _, nudge in nudges)
+            )
+            unstarted = [reminder_id for (reminder_id, _), ok in zip(nudges, started) if not ok]
+            if unstarted:
+                await self._release(unstarted)
+            if loop.time() >= budget_ends_at and (unstarted or claimed >= self.batch_size):
+                logger.info("Reminder tick budget spent, rolling the remaining reminders over to the next tick")
+                deadlines.schedule(deadlines.REMINDER, datetime.now(timezone.utc))
+                break
+            if claimed < self.batch_size:
+                break
+
+    async def _dispatch(self, nudge: events.NudgeUser, semaphore: asyncio.Semaphore, budget_ends_at: float) -> bool:
+        """
+        Hands one nudge to the event queue, isolating its failures. Returns
+        False when the budget ran out before the nudge could start.
+        """
+        async with semaphore:
+            if asyncio.get_running_loop().time() >= budget_ends_at and self._started >= self.concurrency:
+                return False
+            self._started += 1
+            try:
+                await event_bus.enqueue(nudge, overflow="spill")
+            except Exception:
+                logger.exception(f"Failed to nudge user {nudge.user_id}")
+            return True
+
+    async def _release(self, reminder_ids: list[UUID]):
+        """
+        Puts claimed reminders whose nudges never started back to pending.
+        """
+        await self.db_session.execute(
+            update(orm.Reminder)
+            .where(orm.Reminder.id.in_(reminder_ids))
+            .values(state="pending", triggered_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db_session.commit()
+
+    async def _claim_due_reminders(self) -> tuple[int, list[tuple[UUID, events.NudgeUser]]]:
+        """
+        Claims a batch of due reminders with SELECT ... FOR UPDATE SKIP LOCKED.
+
+        Each row carries the user's active-session flag and last completed
+        session type, fetched in the same query, and the whole batch is marked
+        triggered with a single bulk update. Returns the number of claimed
+        reminders and the nudges left to publish in-process, paired with
+        their reminder ids.
         """
         now = datetime.now(timezone.utc)
-        pending_reminders = (
-            self.db_session.query(orm.Reminder)
-            .filter(orm.Reminder.state == "pending", orm.Reminder.send_at <= now)
-            .all()
+        has_active_session = (
+            select(orm.PomodoroSession.session_id)
+            .where(orm.PomodoroSession.user_id == orm.Reminder.user_id, orm.PomodoroSession.state == "active")
+            .exists()
         )
-        for reminder in pending_reminders:
-            active_session = (
-                self.db_session.query(orm.PomodoroSession)
-                .filter_by(user_id=reminder.user_id, state="active")
-                .first()
-            )
-            if not active_session:
-                last_session = (
-                    self.db_session.query(orm.PomodoroSession)
-                    .filter_by(user_id=reminder.user_id, state="completed")
-                    .order_by(orm.PomodoroSession.end_time.desc())
-                    .first()
-                )
-                session_type = last_session.session_type if last_session else "work"
-
-                await event_bus.publish(
-                    events.NudgeUser(
-                        user_id=reminder.user_id,
-                        chat_id=reminder.chat_id,
-                        escalation_count=reminder.escalation_count,
-                        session_type=session_type,
-                    )
+        last_session_type = (
+            select(orm.PomodoroSession.session_type)
+            .where(orm.PomodoroSession.user_id == orm.Reminder.user_id, orm.PomodoroSession.state == "completed")
+            .order_by(orm.PomodoroSession.end_time.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        claimed = (
+            await self.db_session.execute(
+                select(
+                    orm.Reminder.id,
+                    orm.Reminder.user_id,
+                    orm.Reminder.chat_id,
+                    orm.Reminder.escalation_count,
+                    has_active_session.label("has_active_session"),
+                    last_session_type.label("last_session_type"),
                 )
-            reminder.state = "triggered"
-            reminder.triggered_at = now
-            self.db_session.add(reminder)
-        self.db_session.commit()
+                .where(orm.Reminder.state == "pending", orm.Reminder.send_at <= now)
+                .order_by(orm.Reminder.send_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True, of=orm.Reminder)
+            )
+        ).all()
+        if claimed:
+            await self.db_session.execute(
+                update(orm.Reminder)
+                .where(orm.Reminder.id.in_([reminder.id for reminder in claimed]))
+                .values(state="triggered", triggered_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        nudges = [
+            (
+                reminder.id,
+                events.NudgeUser(
+                    user_id=reminder.user_id,
+                    chat_id=reminder.chat_id,
+                    escalation_count=reminder.escalation_count,
+                    session_type=reminder.last_session_type or "work",
+                ),
+            )
+            for reminder in claimed
+            if not reminder.has_active_session
+        ]
+        inline = await outbox.stage(self.db_session, [nudge for _, nudge in nudges])
+        await self.db_session.commit()
+        return len(claimed), nudges if inline else []
 
 
 from uuid import uuid4
@@ -129,12 +258,14 @@ from uuid import uuid4
 class ReminderService:
     """
     A domain service for scheduling and canceling reminders.
+
+    Changes are committed by the caller's unit of work.
     """
 
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: AsyncSession):
         self.db_session = db_session
 
-    def schedule_reminder(self, user_id: UUID, chat_id: int, send_at: datetime, escalation_count: int = 0):
+    async def schedule_reminder(self, user_id: UUID, chat_id: int, send_at: datetime, escalation_count: int = 0):
         """
         Schedules a reminder for the user.
         """
@@ -148,21 +279,22 @@ class ReminderService:
             escalation_count=escalation_count,
         )
         self.db_session.add(reminder)
-        self.db_session.commit()
+        # Armed on commit, so the timer can't fire before the reminder is visible to its claim.
+        after_commit(self.db_session, lambda: deadlines.schedule(deadlines.REMINDER, send_at))
+        # Wakes the dispatchers of other replicas once the reminder is committed.
+        await notifications.notify(self.db_session, notifications.REMINDERS_CHANNEL, send_at.isoformat())
 
-    def cancel_reminder(self, user_id: UUID):
+    async def cancel_reminder(self, user_id: UUID):
         """
         Cancels any pending reminders for the user.
         """
-        reminders = self.db_session.query(orm.Reminder).filter_by(user_id=user_id, state="pending").all()
+        reminders = await self.db_session.scalars(select(orm.Reminder).filter_by(user_id=user_id, state="pending"))
         for reminder in reminders:
             reminder.state = "cancelled"
             self.db_session.add(reminder)
-        self.db_session.commit()
 
-    def reset_escalation_counts(self):
+    async def reset_escalation_counts(self):
         """
         Resets the escalation count for all reminders.
         """
-        self.db_session.query(orm.Reminder).update({"escalation_count": 0})
-        self.db_session.commit()
+        await self.db_session.execute(update(orm.Reminder).values(escalation_count=0))
@@ -1,47 +1,99 @@
+import asyncio
 import os
+from datetime import datetime
 from uuid import UUID
 
 from fastapi import FastAPI, Depends, HTTPException, Request
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from telegram import Update
 from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler
 from telegram.ext import filters
 
-from tomato_ai import handlers
-from tomato_ai.adapters import orm, event_bus
-from tomato_ai.adapters.database import get_session
+from tomato_ai import agents, handlers
+from tomato_ai.adapters import concurrency, deadlines, notifications, orm, outbox, event_bus
+from tomato_ai.adapters.agent_sessions import agent_sessions
+from tomato_ai.adapters.database import dispose_engines, get_async_session, get_session, unit_of_work
 from tomato_ai.app_state import scheduler
 from tomato_ai.config import settings
 from tomato_ai.domain import models
-from tomato_ai.domain.services import SessionManager, SessionNotifier, ReminderNotifier
+from tomato_ai.domain.services import SessionManager, SessionNotifier, ReminderNotifier, ReminderService
 from tomato_ai.entrypoints.schemas import PomodoroSessionCreate, PomodoroSessionRead, PomodoroSessionUpdateState
 
 
 async def run_scheduler():
-    db_session = next(get_session())
-    notifier = SessionNotifier(db_session)
-    await notifier.check_and_notify_expired_sessions()
+    async with unit_of_work() as db_session:
+        notifier = SessionNotifier(db_session)
+        await notifier.check_and_notify_expired_sessions()
 
 
 async def run_reminder_scheduler():
-    db_session = next(get_session())
-    notifier = ReminderNotifier(db_session)
-    await notifier.check_and_send_reminders()
+    async with unit_of_work() as db_session:
+        notifier = ReminderNotifier(db_session)
+        await notifier.check_and_send_reminders()
 
 
 async def run_daily_reset():
-    db_session = next(get_session())
-    service = ReminderService(db_session)
-    service.reset_escalation_counts()
+    async with unit_of_work() as db_session:
+        service = ReminderService(db_session)
+        await service.reset_escalation_counts()
+
+
+async def load_deadlines():
+    """
+    Rehydrates the deadline timers from the database with streaming cursors.
+    """
+    async with unit_of_work() as db_session:
+        expiries = await db_session.stream_scalars(
+            select(orm.PomodoroSession.expires_at)
+            .where(orm.PomodoroSession.state == "active", orm.PomodoroSession.expires_at.is_not(None))
+            .execution_options(yield_per=1000)
+        )
+        async for expires_at in expiries:
+            deadlines.schedule(deadlines.SESSION_EXPIRY, expires_at)
+
+        send_ats = await db_session.stream_scalars(
+            select(orm.Reminder.send_at)
+            .where(orm.Reminder.state == "pending", orm.Reminder.send_at.is_not(None))
+            .execution_options(yield_per=1000)
+        )
+        async for send_at in send_ats:
+            deadlines.schedule(deadlines.REMINDER, send_at)
+
+
+def on_reminder_notification(payload: str):
+    """
+    Adds a reminder scheduled by another replica to the local deadline timers.
+    """
+    deadlines.schedule(deadlines.REMINDER, datetime.fromisoformat(payload))
 
 
 async def lifespan(app: FastAPI):
+    event_bus.start_workers()
+    app.state.agent_session_flusher = asyncio.create_task(agent_sessions.run())
     if not os.environ.get("TESTING"):
-        scheduler.add_job(run_scheduler, "interval", seconds=10)
-        scheduler.add_job(run_reminder_scheduler, "interval", seconds=10)
+        deadlines.register(deadlines.SESSION_EXPIRY, run_scheduler)
+        deadlines.register(deadlines.REMINDER, run_reminder_scheduler)
+        await deadlines.start()
+        app.state.reminder_listener = notifications.Listener(
+            notifications.REMINDERS_CHANNEL, on_reminder_notification
+        )
+        await app.state.reminder_listener.start()
+        await load_deadlines()
+
+        # The interval jobs are a reconciliation sweep; the deadline timers fire on time.
+        scheduler.add_job(run_scheduler, "interval", seconds=settings.RECONCILIATION_INTERVAL_SECONDS)
+        scheduler.add_job(run_reminder_scheduler, "interval", seconds=settings.RECONCILIATION_INTERVAL_SECONDS)
         scheduler.add_job(run_daily_reset, "cron", hour=0)
+        scheduler.add_job(
+            handlers.message_pool.refresh,
+            "interval",
+            seconds=settings.MESSAGE_POOL_REFRESH_SECONDS,
+            next_run_time=datetime.now(),
+        )
         scheduler.start()
 
     if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_BOT_TOKEN != "dummy-token":
@@ -58,10 +110,39 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    await event_bus.drain()
     if settings.TELEGRAM_BOT_TOKEN and settings.TELEGRAM_BOT_TOKEN != "dummy-token":
         await app.state.ptb_app.shutdown()
     if not os.environ.get("TESTING"):
         scheduler.shutdown()
+        await app.state.reminder_listener.stop()
+        await deadlines.stop()
+    event_bus.shutdown()
+    handlers.notification_agents.clear()
+    handlers.scheduler_agents.clear()
+    app.state.agent_session_flusher.cancel()
+    await agent_sessions.flush()
+    await agents.turbo_20_ollama_model.aclose()
+    await agents.turbo_120_ollama_model.aclose()
+    await dispose_engines()
+
+
+def ensure_event_capacity(pending_events):
+    """
+    Rejects a request before its write is committed when the event queue cannot take its events.
+    """
+    if settings.EVENT_QUEUE_OVERFLOW == "reject" and not event_bus.has_room(len(pending_events)):
+        raise HTTPException(status_code=503, detail="Too many pending events, please retry later")
+
+
+async def enqueue_event(event):
+    """
+    Queues a committed write's event for background handling so responses don't wait on its handlers.
+
+    The write has already happened, so an event that loses the race for the
+    last queue slot is published inline rather than failing the request.
+    """
+    await event_bus.enqueue(event, overflow="spill")
 
 
 def create_app() -> FastAPI:
@@ -80,10 +161,26 @@ def create_app() -> FastAPI:
     def health():
         return {"status": "healthy"}
 
+    @app.get("/metrics")
+    def metrics():
+        return {
+            "agent_cache": {
+                "notification": handlers.notification_agents.stats(),
+                "scheduler": handlers.scheduler_agents.stats(),
+            },
+            "agent_sessions": agent_sessions.stats(),
+            "message_pool": handlers.message_pool.stats(),
+            "nudge_decisions": handlers.nudge_engine.stats(),
+            "llm": {
+                model.config["model_id"]: model.stats()
+                for model in (agents.turbo_20_ollama_model, agents.turbo_120_ollama_model)
+            },
+        }
+
     @app.post("/sessions/", response_model=PomodoroSessionRead)
     async def create_session(
             session_data: PomodoroSessionCreate,
-            db_session: Session = Depends(get_session),
+            db_session: AsyncSession = Depends(get_async_session),
     ):
         session_manager = SessionManager()
         new_session = session_manager.start_new_session(
@@ -108,11 +205,14 @@ def create_app() -> FastAPI:
         )
 
         db_session.add(orm_session)
-        db_session.commit()
-        db_session.refresh(orm_session)
+        pending_events = await outbox.stage(db_session, new_session.events)
+        ensure_event_capacity(pending_events)
+        await db_session.commit()
+        await db_session.refresh(orm_session)
+        deadlines.schedule(deadlines.SESSION_EXPIRY, new_session.expires_at)
 
-        for event in new_session.events:
-            await event_bus.publish(event)
+        for event in pending_events:
+            await enqueue_event(event)
 
         return orm_session
 
@@ -130,9 +230,9 @@ def create_app() -> FastAPI:
     async def update_session_state(
             session_id: UUID,
             state_data: PomodoroSessionUpdateState,
-            db_session: Session = Depends(get_session),
+            db_session: AsyncSession = Depends(get_async_session),
     ):
-        orm_session = db_session.get(orm.PomodoroSession, session_id)
+        orm_session = await db_session.get(orm.PomodoroSession, session_id)
         if orm_session is None:
             raise HTTPException(status_code=404, detail="Session not found")
 
@@ -166,11 +266,15 @@ def create_app() -> FastAPI:
         orm_session.pause_start_time = domain_session.pause_start_time
         orm_session.total_paused_duration = domain_session.total_paused_duration
 
-        db_session.commit()
-        db_session.refresh(orm_session)
+        pending_events = await outbox.stage(db_session, domain_session.events)
+        ensure_event_capacity(pending_events)
+        await db_session.commit()
+        await db_session.refresh(orm_session)
+        if domain_session.state == "active" and domain_session.expires_at:
+            deadlines.schedule(deadlines.SESSION_EXPIRY, domain_session.expires_at)
 
-        for event in domain_session.events:
-            await event_bus.publish(event)
+        for event in pending_events:
+            await enqueue_event(event)
         return orm_session
 
     if settings.TELEGRAM_BOT_TOKEN:
@@ -179,6 +283,8 @@ def create_app() -> FastAPI:
             ptb_app = request.app.state.ptb_app
             update_data = await request.json()
             update = Update.de_json(update_data, ptb_app.bot)
+            # Replies to the user go ahead of background nudges for the LLM and the bot.
+            concurrency.current_lane.set(concurrency.INTERACTIVE)
             await ptb_app.process_update(update)
             return {"status": "ok"}
 
@@ -1,56 +1,76 @@
+import asyncio
 import logging
 import zoneinfo
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel
+from sqlalchemy import func, select
 from time import strftime
+from typing import List
 
 from strands import Agent
-from strands.session.file_session_manager import FileSessionManager
+from strands.session.session_manager import SessionManager as AgentSessionManager
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram import WebAppInfo
 from telegram.ext import CallbackContext
 
-from tomato_ai.adapters import telegram, orm
-from tomato_ai.adapters.database import get_session
-from tomato_ai.agents import negotiation_agent, turbo_20_ollama_model, turbo_120_ollama_model
+from tomato_ai.adapters import deadlines, telegram, orm
+from tomato_ai.adapters.concurrency import chat_locks, llm_lanes, ordered_per_chat
+from tomato_ai.adapters.database import unit_of_work
+from tomato_ai.adapters.resilience import CircuitBreaker, CircuitOpenError
+from tomato_ai.agents import AgentCache, bounded_conversation, get_negotiation_agent, turbo_20_ollama_model, \
+    turbo_120_ollama_model
 from tomato_ai.config import settings
 from tomato_ai.domain import events
 from tomato_ai.domain.agent_actions import AgentAction, PomodoroScheduleNextAction, PomodoroStartAction, \
     TelegramMessageAction
+from tomato_ai.domain.nudge_rules import NudgeContext, NudgeDecisionEngine
 from tomato_ai.domain.services import SessionManager, ReminderService
+from tomato_ai.message_pool import COMPLETED, EXPIRED, STARTED, MessagePool, prompt_for
 
 logger = logging.getLogger(__name__)
 
 
-def parse_time(time_str: str) -> timedelta:
-    if time_str.endswith("m"):
-        return timedelta(minutes=int(time_str[:-1]))
-    elif time_str.endswith("h"):
-        return timedelta(hours=int(time_str[:-1]))
-    elif time_str == "tomorrow":
+def parse_time(time_str: str | None) -> timedelta | None:
+    """
+    Parses "15m", "1h" or "tomorrow" into a delay, or returns None when the value is not one of those.
+    """
+    time_str = (time_str or "").strip().lower()
+    try:
+        if time_str.endswith("m"):
+            return timedelta(minutes=int(time_str[:-1]))
+        elif time_str.endswith("h"):
+            return timedelta(hours=int(time_str[:-1]))
+    except ValueError:
+        return None
+    if time_str == "tomorrow":
         return timedelta(days=1)
-    else:
-        return timedelta(minutes=15)  # default
+    return None
 
 
-def get_agent(session_id: str):
-    return Agent(
-        model=turbo_20_ollama_model,
-        session_manager=FileSessionManager(session_id),
-        system_prompt="""
+NOTIFIER_SYSTEM_PROMPT = """
     You are a small cog in a large pomodoro timer machine.
     
     You are responsible for notifying the user about the events of the pomodor session.
     
     Your responses should be only the message you want to send to the user.
     """
+
+
+def get_agent(session_id: str, session_manager: AgentSessionManager):
+    return Agent(
+        model=turbo_20_ollama_model,
+        session_manager=session_manager,
+        conversation_manager=bounded_conversation(),
+        system_prompt=NOTIFIER_SYSTEM_PROMPT,
     )
 
 
-def get_scheduler_agent(session_id: str):
+def get_scheduler_agent(session_id: str, session_manager: AgentSessionManager):
     return Agent(
         model=turbo_120_ollama_model,
-        session_manager=FileSessionManager(session_id),
+        agent_id="scheduler",
+        session_manager=session_manager,
+        conversation_manager=bounded_conversation(),
         system_prompt="""
         You are responsible for scheduling reminders for the user. You want the user to be diligent in their adherence to pomodoro sessions.
         You should be stubborn, but not annoying in reminding the user to stay in their pomodoro workflow.
@@ -62,6 +82,54 @@ def get_scheduler_agent(session_id: str):
     )
 
 
+llm_circuit = CircuitBreaker("ollama", settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_SECONDS)
+
+
+async def run_agent(call, *args):
+    """
+    Awaits an async agent call once the caller's LLM lane has room.
+
+    The generation runs on the event loop without blocking it, and is cancelled
+    with a TimeoutError after LLM_CALL_TIMEOUT_SECONDS. Only the model call
+    counts toward the ollama circuit breaker; while it is open calls fail fast
+    with CircuitOpenError.
+    """
+    async def generate():
+        return await asyncio.wait_for(call(*args), settings.LLM_CALL_TIMEOUT_SECONDS)
+
+    async with llm_lanes.slot():
+        return await llm_circuit.call(generate)
+
+
+notification_agents = AgentCache(
+    "notification", get_agent, settings.AGENT_CACHE_SIZE, settings.AGENT_CACHE_TTL_SECONDS, run=run_agent
+)
+scheduler_agents = AgentCache(
+    "scheduler", get_scheduler_agent, settings.AGENT_CACHE_SIZE, settings.AGENT_CACHE_TTL_SECONDS, run=run_agent
+)
+
+
+class MessageVariants(BaseModel):
+    messages: List[str]
+
+
+async def generate_message_variants(prompt: str, count: int) -> List[str]:
+    """
+    Asks a chat-independent notifier agent for `count` phrasings of a notification.
+    """
+    agent = Agent(model=turbo_20_ollama_model, system_prompt=NOTIFIER_SYSTEM_PROMPT)
+    variants = await run_agent(
+        agent.structured_output_async,
+        MessageVariants,
+        f"Write {count} different messages, each one on its own, for this event: {prompt}",
+    )
+    return variants.messages
+
+
+message_pool = MessagePool(generate_message_variants, settings.MESSAGE_POOL_SIZE)
+nudge_engine = NudgeDecisionEngine()
+
+
 def log_event(event: events.Event):
     """
     A simple event handler that logs the event.
@@ -69,12 +137,31 @@ def log_event(event: events.Event):
     logger.info(f"Handled event: {event}")
 
 
-async def send_telegram_notification(event: events.SessionCompleted):
+async def send_session_end_notification(event: events.SessionEnded):
+    """
+    Sends one telegram notification for a session that ended, whether it was
+    completed, expired or both.
+    """
+    async with unit_of_work() as db_session:
+        user = await db_session.get(orm.User, event.user_id)
+    if not user:
+        logger.error(f"User with id {event.user_id} not found.")
+        return
+
+    kind = EXPIRED if event.expired else COMPLETED
+    if notifier := telegram.get_telegram_notifier():
+        message = message_pool.get(kind, event.session_type) or await notification_agents.invoke(
+            str(user.telegram_chat_id), prompt_for(kind, event.session_type)
+        )
+        await notifier.send_message(chat_id=user.telegram_chat_id, message=message)
+
+
+async def send_session_end_fallback(event: events.SessionEnded):
     """
-    Sends a telegram notification when a session is completed.
+    Sends a static session end notification when the agent is unavailable.
     """
-    db_session = next(get_session())
-    user = db_session.query(orm.User).filter_by(id=event.user_id).first()
+    async with unit_of_work() as db_session:
+        user = await db_session.get(orm.User, event.user_id)
     if not user:
         logger.error(f"User with id {event.user_id} not found.")
         return
@@ -82,8 +169,7 @@ async def send_telegram_notification(event: events.SessionCompleted):
     if notifier := telegram.get_telegram_notifier():
         await notifier.send_message(
             chat_id=user.telegram_chat_id,
-            message=str(get_agent(str(user.telegram_chat_id))(
-                f"The user completed the pomodoro session of type {event.session_type}!")),
+            message=f"Your {event.session_type.replace('_', ' ')} session is complete!",
         )
 
 
@@ -91,26 +177,25 @@ async def send_telegram_notification_on_start(event: events.SessionStarted):
     """
     Sends a telegram notification when a session starts.
     """
-    db_session = next(get_session())
-    user = db_session.query(orm.User).filter_by(id=event.user_id).first()
+    async with unit_of_work() as db_session:
+        user = await db_session.get(orm.User, event.user_id)
     if not user:
         logger.error(f"User with id {event.user_id} not found.")
         return
 
     if notifier := telegram.get_telegram_notifier():
-        await notifier.send_message(
-            chat_id=user.telegram_chat_id,
-            message=str(
-                get_agent(str(user.telegram_chat_id))(f"The user started a pomodoro session of type {event.session_type}!")),
+        message = message_pool.get(STARTED, event.session_type) or await notification_agents.invoke(
+            str(user.telegram_chat_id), prompt_for(STARTED, event.session_type)
         )
+        await notifier.send_message(chat_id=user.telegram_chat_id, message=message)
 
 
-async def send_telegram_notification_on_expiration(event: events.SessionExpired):
+async def send_session_start_fallback(event: events.SessionStarted):
     """
-    Sends a telegram notification when a session expires.
+    Sends a static session start notification when the agent is unavailable.
     """
-    db_session = next(get_session())
-    user = db_session.query(orm.User).filter_by(id=event.user_id).first()
+    async with unit_of_work() as db_session:
+        user = await db_session.get(orm.User, event.user_id)
     if not user:
         logger.error(f"User with id {event.user_id} not found.")
         return
@@ -118,30 +203,42 @@ async def send_telegram_notification_on_expiration(event: events.SessionExpired)
     if notifier := telegram.get_telegram_notifier():
         await notifier.send_message(
             chat_id=user.telegram_chat_id,
-            message=f"Pomodoro session {event.session_id} has expired!",
+            message=f"Your {event.session_type.replace('_', ' ')} session has started!",
         )
 
 
-def schedule_nudge_on_session_completed(event: events.SessionCompleted):
+async def schedule_nudge_on_session_completed(event: events.SessionCompleted):
     """
     Schedules a nudge when a session is completed.
     """
-    db_session = next(get_session())
-    session = db_session.query(orm.PomodoroSession).filter_by(session_id=event.session_id).first()
-    if session:
-        delay_minutes = 3
-        reminder_service = ReminderService(db_session)
-        send_at = datetime.now(timezone.utc) + timedelta(minutes=delay_minutes)
-        reminder_service.schedule_reminder(event.user_id, session.chat_id, send_at, escalation_count=1)
+    async with unit_of_work() as db_session:
+        session = await db_session.get(orm.PomodoroSession, event.session_id)
+        if session:
+            delay_minutes = 3
+            reminder_service = ReminderService(db_session)
+            send_at = datetime.now(timezone.utc) + timedelta(minutes=delay_minutes)
+            await reminder_service.schedule_reminder(event.user_id, session.chat_id, send_at, escalation_count=1)
 
 
-def cancel_reminder_on_session_started(event: events.SessionStarted):
+async def cancel_reminder_on_session_started(event: events.SessionStarted):
     """
     Cancels any pending reminders when a session starts.
     """
-    db_session = next(get_session())
-    reminder_service = ReminderService(db_session)
-    reminder_service.cancel_reminder(event.user_id)
+    async with unit_of_work() as db_session:
+        reminder_service = ReminderService(db_session)
+        await reminder_service.cancel_reminder(event.user_id)
+
+
+async def _schedule_next_nudge(event: events.NudgeUser, send_at: datetime, escalation_count: int | None = None):
+    """
+    Schedules the chat's next nudge in its own unit of work, escalated by one unless a count is given.
+    """
+    if escalation_count is None:
+        escalation_count = event.escalation_count + 1
+    async with unit_of_work() as db_session:
+        await ReminderService(db_session).schedule_reminder(
+            event.user_id, event.chat_id, send_at, escalation_count=escalation_count
+        )
 
 
 async def handle_nudge(event: events.NudgeUser):
@@ -149,129 +246,154 @@ async def handle_nudge(event: events.NudgeUser):
     Handles a nudge event.
     """
     logger.info(f"Handling nudge for user {event.user_id}")
-    db_session = next(get_session())
-    user = db_session.query(orm.User).filter_by(id=event.user_id).first()
+    async with chat_locks.hold(event.chat_id):
+        # 1. Gather context in a short unit of work so no connection is held across agent calls
+        async with unit_of_work() as db_session:
+            user = await db_session.get(orm.User, event.user_id)
+            if event.escalation_count < settings.MAX_ESCALATIONS:
+                try:
+                    user_zone_info: zoneinfo.ZoneInfo = zoneinfo.ZoneInfo(user.timezone)
+                except zoneinfo.ZoneInfoNotFoundError:
+                    user_zone_info: zoneinfo.ZoneInfo = zoneinfo.ZoneInfo("UTC")
+                today = datetime.now(user_zone_info).date()
+                sessions_today = await db_session.scalar(
+                    select(func.count())
+                    .select_from(orm.PomodoroSession)
+                    .filter(
+                        orm.PomodoroSession.user_id == event.user_id,
+                        orm.PomodoroSession.state == "completed",
+                        orm.PomodoroSession.start_time
+                        >= datetime.combine(today, datetime.min.time(), tzinfo=user_zone_info),
+                    )
+                )
+                last_session = await db_session.scalar(
+                    select(orm.PomodoroSession)
+                    .filter(orm.PomodoroSession.user_id == event.user_id, orm.PomodoroSession.state == "completed")
+                    .order_by(orm.PomodoroSession.end_time.desc())
+                    .limit(1)
+                )
+
+        if event.escalation_count >= settings.MAX_ESCALATIONS:
+            logger.info(f"Max escalations reached for user {event.user_id}")
+            if notifier := telegram.get_telegram_notifier():
+                await notifier.send_message(
+                    chat_id=str(user.telegram_chat_id),
+                    message="Looks like today’s a tough one — let’s pick this back up tomorrow morning.",
+                )
+            await _schedule_next_nudge(event, datetime.now(timezone.utc) + timedelta(days=1), escalation_count=0)
+            return
+
+        last_activity = last_session.end_time.astimezone(user_zone_info).strftime("%A, %B %d, %Y %I:%M %p") if last_session else ""
+
+        context = {
+            "sessions_today": sessions_today,
+            "time": datetime.now(user_zone_info).strftime("%A, %B %d, %Y %I:%M %p"),
+            "state": "idle",
+            "last_activity": last_activity,
+            "escalations_today": event.escalation_count,
+            "desired_sessions": user.desired_sessions_per_day
+        }
 
-    if event.escalation_count >= settings.MAX_ESCALATIONS:
-        logger.info(f"Max escalations reached for user {event.user_id}")
-        if notifier := telegram.get_telegram_notifier():
-            await notifier.send_message(
-                chat_id=str(user.telegram_chat_id),
-                message="Looks like today’s a tough one — let’s pick this back up tomorrow morning.",
+        # 2. Decide the obvious cases by rule and ask the negotiation agent otherwise
+        decided_by_rule = nudge_engine.decide(NudgeContext(
+            now=datetime.now(user_zone_info),
+            work_start=user.work_start,
+            work_end=user.work_end,
+            sessions_today=sessions_today,
+            desired_sessions=user.desired_sessions_per_day,
+            escalation_count=event.escalation_count,
+        ))
+        if decided_by_rule is not None:
+            wrapper_action = decided_by_rule
+        else:
+            agent = get_negotiation_agent()
+            wrapper_action = await run_agent(agent.structured_output_async, AgentAction, str(context))
+
+        # Construct the correct action object based on action_type
+        if wrapper_action.action == "telegram_message":
+            action = TelegramMessageAction(
+                text=wrapper_action.text,
+                buttons=wrapper_action.buttons
             )
-        reminder_service = ReminderService(db_session)
-        send_at = datetime.now(timezone.utc) + timedelta(days=1)
-        reminder_service.schedule_reminder(event.user_id, event.chat_id, send_at)
-        return
-
-    try:
-        user_zone_info: zoneinfo.ZoneInfo = zoneinfo.ZoneInfo(user.timezone)
-    except zoneinfo.ZoneInfoNotFoundError:
-        user_zone_info: zoneinfo.ZoneInfo = zoneinfo.ZoneInfo("UTC")
-
-    # 1. Gather context
-    today = datetime.now(user_zone_info).date()
-    sessions_today = (
-        db_session.query(orm.PomodoroSession)
-        .filter(
-            orm.PomodoroSession.user_id == event.user_id,
-            orm.PomodoroSession.state == "completed",
-            orm.PomodoroSession.start_time >= datetime.combine(today, datetime.min.time(), tzinfo=user_zone_info),
-        )
-        .count()
-    )
-    last_session = (
-        db_session.query(orm.PomodoroSession)
-        .filter(orm.PomodoroSession.user_id == event.user_id, orm.PomodoroSession.state == "completed")
-        .order_by(orm.PomodoroSession.end_time.desc())
-        .first()
-    )
-    last_activity = last_session.end_time.astimezone(user_zone_info).strftime("%A, %B %d, %Y %I:%M %p") if last_session else ""
-
-    context = {
-        "sessions_today": sessions_today,
-        "time": datetime.now(user_zone_info).strftime("%A, %B %d, %Y %I:%M %p"),
-        "state": "idle",
-        "last_activity": last_activity,
-        "escalations_today": event.escalation_count,
-        "desired_sessions": user.desired_sessions_per_day
-    }
-
-    # 2. Call the negotiation agent
-    agent = negotiation_agent
-    wrapper_action = agent.structured_output(AgentAction, str(context))
-
-    # Construct the correct action object based on action_type
-    if wrapper_action.action == "telegram_message":
-        action = TelegramMessageAction(
-            text=wrapper_action.text,
-            buttons=wrapper_action.buttons
-        )
-    elif wrapper_action.action == "pomodoro_schedule_next":
-        action = PomodoroScheduleNextAction(
-            time=wrapper_action.time
-        )
-    elif wrapper_action.action == "pomodoro_start":
-        action = PomodoroStartAction(
-            duration=wrapper_action.duration
-        )
-    else:
-        logger.warning(f"Unknown action type from agent: {wrapper_action.action}")
-        return  # Exit if action type is unknown
-
-    # 3. Execute the action
-    if isinstance(action, TelegramMessageAction):
-        if notifier := telegram.get_telegram_notifier():
-            keyboard = []
-            if action.buttons:
-                keyboard = [
-                    [InlineKeyboardButton(text=button, callback_data=button.lower()) for button in action.buttons]
-                ]
-
-            await notifier.send_message(
-                chat_id=str(event.chat_id),
-                message=action.text,
-                reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None,
+        elif wrapper_action.action == "pomodoro_schedule_next":
+            action = PomodoroScheduleNextAction(
+                time=wrapper_action.time
             )
-        # Schedule the next nudge if the user doesn't respond
-        reminder_service = ReminderService(db_session)
-        send_at = datetime.now(timezone.utc) + timedelta(minutes=10)
-        reminder_service.schedule_reminder(
-            event.user_id, event.chat_id, send_at, escalation_count=event.escalation_count + 1
-        )
-
-    elif isinstance(action, PomodoroScheduleNextAction):
-        scheduler_agent = get_scheduler_agent(str(event.chat_id))
-        scheduler_context = {
-            "negotiation_agent_output": action.model_dump(),
-            "user_history": context,
-        }
-        try:
-            class DelayContainer(BaseModel):
-                delay_in_minutes: int
-                
-            delay_container = scheduler_agent.structured_output(DelayContainer, str(scheduler_context))
-            delay_in_minutes = int(delay_container.delay_in_minutes)
-        except ValueError:
-            logger.warning("Could not parse delay from scheduler agent, defaulting to 15 minutes.")
-            delay_in_minutes = 15
-
-        reminder_service = ReminderService(db_session)
-        delay = timedelta(minutes=delay_in_minutes)
-        send_at = datetime.now(timezone.utc) + delay
-        reminder_service.schedule_reminder(
-            event.user_id, event.chat_id, send_at, escalation_count=event.escalation_count + 1
-        )
-    elif isinstance(action, PomodoroStartAction):
+        elif wrapper_action.action == "pomodoro_start":
+            action = PomodoroStartAction(
+                duration=wrapper_action.duration
+            )
+        else:
+            logger.warning(f"Unknown action type from agent: {wrapper_action.action}")
+            return  # Exit if action type is unknown
+
+        # 3. Execute the action
+        if isinstance(action, TelegramMessageAction):
+            if notifier := telegram.get_telegram_notifier():
+                keyboard = []
+                if action.buttons:
+                    keyboard = [
+                        [InlineKeyboardButton(text=button, callback_data=button.lower()) for button in action.buttons]
+                    ]
+
+                await notifier.send_message(
+                    chat_id=str(event.chat_id),
+                    message=action.text,
+                    reply_markup=InlineKeyboardMarkup(keyboard) if keyboard else None,
+                )
+            # Schedule the next nudge if the user doesn't respond
+            await _schedule_next_nudge(event, datetime.now(timezone.utc) + timedelta(minutes=10))
+
+        elif isinstance(action, PomodoroScheduleNextAction):
+            # Only ask the scheduler agent when the requested time isn't one we can read ourselves
+            delay = parse_time(action.time)
+            if delay is None:
+                scheduler_context = {
+                    "negotiation_agent_output": action.model_dump(),
+                    "user_history": context,
+                }
+                try:
+                    class DelayContainer(BaseModel):
+                        delay_in_minutes: int
+
+                    delay_container = await scheduler_agents.structured_output(
+                        str(event.chat_id), DelayContainer, str(scheduler_context)
+                    )
+                    delay_in_minutes = int(delay_container.delay_in_minutes)
+                except (ValueError, TimeoutError, CircuitOpenError):
+                    logger.warning("Could not get a delay from scheduler agent, defaulting to 15 minutes.")
+                    delay_in_minutes = 15
+                delay = timedelta(minutes=delay_in_minutes)
+
+            await _schedule_next_nudge(event, datetime.now(timezone.utc) + delay)
+        elif isinstance(action, PomodoroStartAction):
+            if notifier := telegram.get_telegram_notifier():
+                keyboard = [[InlineKeyboardButton(text="Start", callback_data="start")]]
+                await notifier.send_message(
+                    chat_id=str(event.chat_id),
+                    message="Ready to start a new session?",
+                    reply_markup=InlineKeyboardMarkup(keyboard),
+                )
+        else:
+            logger.warning(f"Unhandled action type: {action.action}")
+
+
+async def handle_nudge_fallback(event: events.NudgeUser):
+    """
+    Sends a static nudge and schedules the next one when the agent is unavailable.
+    """
+    async with chat_locks.hold(event.chat_id):
         if notifier := telegram.get_telegram_notifier():
-            keyboard = [[InlineKeyboardButton(text="Start", callback_data="start")]]
+            keyboard = [[
+                InlineKeyboardButton(text="Start", callback_data="start"),
+                InlineKeyboardButton(text="Not now", callback_data="not now"),
+            ]]
             await notifier.send_message(
                 chat_id=str(event.chat_id),
-                message="Ready to start a new session?",
+                message="Ready for another pomodoro?",
                 reply_markup=InlineKeyboardMarkup(keyboard),
             )
-    else:
-        logger.warning(f"Unhandled action type: {action.action}")
+        await _schedule_next_nudge(event, datetime.now(timezone.utc) + timedelta(minutes=10))
 
 
 async def start_session_command(update: Update, context: CallbackContext, session_type: str) -> None:
@@ -280,37 +402,34 @@ async def start_session_command(update: Update, context: CallbackContext, sessio
     """
     if update.message and update.message.from_user:
         telegram_chat_id = str(update.message.chat_id)
-        db_session = next(get_session())
-
-        user = db_session.query(orm.User).filter_by(telegram_chat_id=telegram_chat_id).first()
-        if not user:
-            user = orm.User(telegram_chat_id=telegram_chat_id)
-            db_session.add(user)
-            db_session.commit()
-            db_session.refresh(user)
-
-        session_manager = SessionManager()
-
-        new_session = session_manager.start_new_session(user_id=user.id, session_type=session_type)
-
-        orm_session = orm.PomodoroSession(
-            session_id=new_session.session_id,
-            chat_id=int(telegram_chat_id),
-            start_time=new_session.start_time,
-            end_time=new_session.end_time,
-            state=new_session.state,
-            duration=new_session.duration,
-            user_id=new_session.user_id,
-            task_id=new_session.task_id,
-            expires_at=new_session.expires_at,
-            pause_start_time=new_session.pause_start_time,
-            total_paused_duration=new_session.total_paused_duration,
-            session_type=new_session.session_type,
-        )
+        async with unit_of_work() as db_session:
+            user = await db_session.scalar(select(orm.User).filter_by(telegram_chat_id=telegram_chat_id))
+            if not user:
+                user = orm.User(telegram_chat_id=telegram_chat_id)
+                db_session.add(user)
+                await db_session.flush()
+
+            session_manager = SessionManager()
+
+            new_session = session_manager.start_new_session(user_id=user.id, session_type=session_type)
+
+            orm_session = orm.PomodoroSession(
+                session_id=new_session.session_id,
+                chat_id=int(telegram_chat_id),
+                start_time=new_session.start_time,
+                end_time=new_session.end_time,
+                state=new_session.state,
+                duration=new_session.duration,
+                user_id=new_session.user_id,
+                task_id=new_session.task_id,
+                expires_at=new_session.expires_at,
+                pause_start_time=new_session.pause_start_time,
+                total_paused_duration=new_session.total_paused_duration,
+                session_type=new_session.session_type,
+            )
 
-        db_session.add(orm_session)
-        db_session.commit()
-        db_session.refresh(orm_session)
+            db_session.add(orm_session)
+        deadlines.schedule(deadlines.SESSION_EXPIRY, new_session.expires_at)
 
         # We don't publish the SessionStarted event to avoid a duplicate notification
         # because we are sending a direct message to the user.
@@ -343,6 +462,7 @@ async def start_session_command(update: Update, context: CallbackContext, sessio
             )
 
 
+@ordered_per_chat
 async def start_command(update: Update, context: CallbackContext) -> None:
     """
     Handles the /start command, starting a new pomodoro session.
@@ -350,6 +470,7 @@ async def start_command(update: Update, context: CallbackContext) -> None:
     await start_session_command(update, context, "work")
 
 
+@ordered_per_chat
 async def start_short_break_command(update: Update, context: CallbackContext) -> None:
     """
     Handles the /short_break command, starting a new short break session.
@@ -357,6 +478,7 @@ async def start_short_break_command(update: Update, context: CallbackContext) ->
     await start_session_command(update, context, "short_break")
 
 
+@ordered_per_chat
 async def start_long_break_command(update: Update, context: CallbackContext) -> None:
     """
     Handles the /long_break command, starting a new long break session.
@@ -364,17 +486,18 @@ async def start_long_break_command(update: Update, context: CallbackContext) ->
     await start_session_command(update, context, "long_break")
 
 
+@ordered_per_chat
 async def handle_message(update: Update, context: CallbackContext) -> None:
     """
     Handles incoming messages and responds with a simple echo.
     """
     if update.message and update.message.text:
         user_message = update.message.text
-        agent_response = get_agent(str(update.effective_chat.id))(user_message)
-        response = str(agent_response)
+        response = await notification_agents.invoke(str(update.effective_chat.id), user_message)
         await context.bot.send_message(chat_id=update.effective_chat.id, text=response)
 
 
+@ordered_per_chat
 async def start_button(update: Update, context: CallbackContext) -> None:
     """
     Handles the 'Start' button press.
@@ -382,6 +505,7 @@ async def start_button(update: Update, context: CallbackContext) -> None:
     await start_session_command(update, context, "work")
 
 
+@ordered_per_chat
 async def not_now_button(update: Update, context: CallbackContext) -> None:
     """
     Handles the 'Not now' button press.
@@ -389,18 +513,17 @@ async def not_now_button(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
     await query.answer()
 
-    db_session = next(get_session())
-    reminder_service = ReminderService(db_session)
     send_at = datetime.now(timezone.utc) + timedelta(minutes=15)
 
     if query.message:
         telegram_chat_id = str(query.message.chat_id)
-        user = db_session.query(orm.User).filter_by(telegram_chat_id=telegram_chat_id).first()
-        if not user:
-            user = orm.User(telegram_chat_id=telegram_chat_id)
-            db_session.add(user)
-            db_session.commit()
-            db_session.refresh(user)
-
-        reminder_service.schedule_reminder(user.id, int(telegram_chat_id), send_at, escalation_count=1)
+        async with unit_of_work() as db_session:
+            user = await db_session.scalar(select(orm.User).filter_by(telegram_chat_id=telegram_chat_id))
+            if not user:
+                user = orm.User(telegram_chat_id=telegram_chat_id)
+                db_session.add(user)
+                await db_session.flush()
+
+            reminder_service = ReminderService(db_session)
+            await reminder_service.schedule_reminder(user.id, int(telegram_chat_id), send_at, escalation_count=1)
         await query.edit_message_text(text="OK, I'll remind you in 15 minutes.")
@@ -0,0 +1,70 @@
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+
+from strands.session.file_session_manager import AGENT_PREFIX, SESSION_PREFIX, FileSessionManager
+
+from tomato_ai.adapters.agent_sessions import AgentSessionStore
+from tomato_ai.adapters.database import dispose_engines
+from tomato_ai.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORAGE_DIR = os.path.join(tempfile.gettempdir(), "strands/sessions")
+
+
+async def import_sessions(storage_dir: str, store: AgentSessionStore) -> int:
+    """
+    Copies every session directory written by strands' FileSessionManager
+    into the store and returns how many were imported.
+
+    Sessions already in the database are skipped, so the import can be re-run.
+    """
+    imported = 0
+    for entry in sorted(os.listdir(storage_dir)):
+        if not entry.startswith(SESSION_PREFIX):
+            continue
+        session_id = entry[len(SESSION_PREFIX):]
+        await store.load(session_id)
+        if store.read_session(session_id) is not None:
+            logger.info(f"Skipping session {session_id}, it is already in the database")
+            continue
+
+        files = FileSessionManager(session_id, storage_dir=storage_dir)
+        store.create_session(files.read_session(session_id))
+        agents_dir = os.path.join(storage_dir, entry, "agents")
+        for agent_entry in sorted(os.listdir(agents_dir)) if os.path.isdir(agents_dir) else []:
+            if not agent_entry.startswith(AGENT_PREFIX):
+                continue
+            agent_id = agent_entry[len(AGENT_PREFIX):]
+            store.create_agent(session_id, files.read_agent(session_id, agent_id))
+            for message in files.list_messages(session_id, agent_id):
+                store.create_message(session_id, agent_id, message)
+        await store.flush()
+        imported += 1
+        logger.info(f"Imported session {session_id}")
+    return imported
+
+
+async def run_import(storage_dir: str):
+    store = AgentSessionStore(settings.AGENT_SESSION_FLUSH_BATCH_SIZE, settings.AGENT_SESSION_FLUSH_SECONDS)
+    try:
+        imported = await import_sessions(storage_dir, store)
+    finally:
+        await dispose_engines()
+    logger.info(f"Imported {imported} agent session(s) from {storage_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Imports strands session directories into the database.")
+    parser.add_argument("--storage-dir", default=DEFAULT_STORAGE_DIR, help="directory holding the session_* folders")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_import(args.storage_dir))
+
+
+if __name__ == "__main__":
+    main()
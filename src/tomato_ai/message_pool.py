@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from tomato_ai.domain.models import LONG_BREAK, SHORT_BREAK, WORK
+
+logger = logging.getLogger(__name__)
+
+STARTED = "started"
+COMPLETED = "completed"
+EXPIRED = "expired"
+
+PROMPTS = {
+    STARTED: "The user started a pomodoro session of type {session_type}!",
+    COMPLETED: "The user completed the pomodoro session of type {session_type}!",
+    EXPIRED: "The timer of the user's pomodoro session of type {session_type} ran out, so the session is complete!",
+}
+
+SESSION_TYPES = (WORK.type, SHORT_BREAK.type, LONG_BREAK.type)
+
+
+def prompt_for(kind: str, session_type: str) -> str:
+    return PROMPTS[kind].format(session_type=session_type)
+
+
+class MessagePool:
+    """
+    Pre-generated phrasings of the session notifications, keyed by event kind
+    and session type.
+
+    The pool is filled and refreshed in the background with one generation per
+    key, so a notification is a dictionary lookup; callers generate live only
+    while a key has no variants yet.
+    """
+
+    def __init__(self, generate: Callable[[str, int], Awaitable[List[str]]], size: int):
+        self.generate = generate
+        self.size = size
+        self.served = 0
+        self.misses = 0
+        self._variants: Dict[Tuple[str, str], List[str]] = {}
+
+    def get(self, kind: str, session_type: str) -> str | None:
+        variants = self._variants.get((kind, session_type))
+        if not variants:
+            self.misses += 1
+            return None
+        self.served += 1
+        return random.choice(variants)
+
+    def stats(self) -> Dict[str, int]:
+        return {"keys": len(self._variants), "served": self.served, "misses": self.misses}
+
+    async def refresh(self):
+        """
+        Regenerates the variants of every key, keeping the old ones for keys whose generation fails.
+        """
+        for kind in PROMPTS:
+            for session_type in SESSION_TYPES:
+                try:
+                    variants = [v.strip() for v in await self.generate(prompt_for(kind, session_type), self.size)]
+                except Exception:
+                    logger.exception(f"Failed to generate {kind} messages for {session_type} sessions")
+                    continue
+                if variants := [v for v in variants if v][: self.size]:
+                    self._variants[(kind, session_type)] = variants
+
+    async def run(self, interval: float):
+        """
+        Refreshes the pool every `interval` seconds until cancelled.
+        """
+        while True:
+            await self.refresh()
+            await asyncio.sleep(interval)
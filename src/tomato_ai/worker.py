@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+
+from tomato_ai import agents, bootstrap, handlers
+from tomato_ai.adapters import event_bus, notifications, outbox
+from tomato_ai.adapters.agent_sessions import agent_sessions
+from tomato_ai.adapters.database import dispose_engines
+from tomato_ai.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(batch_size: int, concurrency: int, poll_interval: float):
+    """
+    Drains the event outbox until the process receives SIGINT or SIGTERM.
+
+    The worker sleeps between batches until an outbox NOTIFY arrives or the
+    poll interval passes, whichever is first.
+    """
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = asyncio.Event()
+    wakeup = asyncio.Event()
+
+    def request_stop():
+        stop.set()
+        wakeup.set()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, request_stop)
+
+    listener = notifications.Listener(outbox.OUTBOX_CHANNEL, lambda payload: wakeup.set())
+    await listener.start()
+    message_refresher = asyncio.create_task(handlers.message_pool.run(settings.MESSAGE_POOL_REFRESH_SECONDS))
+    session_flusher = asyncio.create_task(agent_sessions.run())
+    logger.info(f"Outbox worker {worker_id} started")
+    try:
+        while not stop.is_set():
+            wakeup.clear()
+            claimed = await outbox.drain_once(worker_id, batch_size=batch_size, concurrency=concurrency)
+            if claimed < batch_size:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), poll_interval)
+                except TimeoutError:
+                    pass
+    finally:
+        message_refresher.cancel()
+        await listener.stop()
+        await event_bus.drain()
+        event_bus.shutdown()
+        handlers.notification_agents.clear()
+        handlers.scheduler_agents.clear()
+        session_flusher.cancel()
+        await agent_sessions.flush()
+        await agents.turbo_20_ollama_model.aclose()
+        await agents.turbo_120_ollama_model.aclose()
+        await dispose_engines()
+        logger.info(f"Outbox worker {worker_id} stopped")
+
+
+def run_process(batch_size: int, concurrency: int, poll_interval: float):
+    logging.basicConfig(level=logging.INFO)
+    bootstrap.bootstrap()
+    asyncio.run(run_worker(batch_size, concurrency, poll_interval))
+
+
+async def replay_dead_letters():
+    try:
+        await outbox.replay_dead_letters()
+    finally:
+        await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delivers events from the tomato-ai event outbox.")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes to run")
+    parser.add_argument("--batch-size", type=int, default=settings.OUTBOX_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=settings.OUTBOX_CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+    parser.add_argument(
+        "--replay-dead-letters", action="store_true",
+        help="hand every dead-lettered event back to the workers and exit",
+    )
+    args = parser.parse_args()
+
+    if args.replay_dead_letters:
+        logging.basicConfig(level=logging.INFO)
+        asyncio.run(replay_dead_letters())
+        return
+
+    worker_args = (args.batch_size, args.concurrency, args.poll_interval)
+    if args.processes == 1:
+        run_process(*worker_args)
+        return
+
+    # Each process claims its own leased batches, so they never deliver the same event.
+    processes = [multiprocessing.Process(target=run_process, args=worker_args) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+
+    def forward_signal(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    signal.signal(signal.SIGINT, forward_signal)
+    signal.signal(signal.SIGTERM, forward_signal)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
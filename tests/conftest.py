@@ -1,14 +1,22 @@
+from contextlib import asynccontextmanager
+
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
 from unittest.mock import patch
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
 
 from tomato_ai.entrypoints.fastapi_app import create_app
-from tomato_ai.adapters.database import get_session
+from tomato_ai.adapters.agent_sessions import AgentSessionStore
+from tomato_ai.adapters.database import get_async_session, get_session
 from tomato_ai.adapters.orm import Base
 from tomato_ai.config import settings
 
+TEST_DATABASE = "file:memdb1?mode=memory&cache=shared&uri=true"
+
 
 @pytest.fixture()
 def client():
@@ -16,12 +24,14 @@ def client():
          patch.dict('os.environ', {'TESTING': 'True'}):
 
         test_engine = create_engine(
-            "sqlite:///file:memdb1?mode=memory&cache=shared&uri=true",
+            f"sqlite:///{TEST_DATABASE}",
             connect_args={"check_same_thread": False},
         )
         Base.metadata.create_all(bind=test_engine)
+        test_async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DATABASE}", poolclass=NullPool)
 
         TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        TestingAsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=test_async_engine)
 
         def override_get_session():
             try:
@@ -30,11 +40,50 @@ def client():
             finally:
                 db.close()
 
+        async def override_get_async_session():
+            async with TestingAsyncSessionLocal() as db:
+                yield db
+
         app = create_app()
         app.dependency_overrides[get_session] = override_get_session
+        app.dependency_overrides[get_async_session] = override_get_async_session
 
         with TestClient(app) as c:
             yield c
 
         Base.metadata.drop_all(bind=test_engine)
         app.dependency_overrides.clear()
+
+
+@pytest_asyncio.fixture
+async def db_session():
+    """
+    Provides an AsyncSession on a fresh in-memory database.
+    """
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(expire_on_commit=False, bind=engine)() as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def agent_session_store():
+    """
+    Provides an AgentSessionStore whose units of work run on a fresh in-memory database.
+    """
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(expire_on_commit=False, bind=engine)
+
+    @asynccontextmanager
+    async def unit_of_work():
+        async with session_factory() as session:
+            yield session
+            await session.commit()
+
+    with patch("tomato_ai.adapters.agent_sessions.unit_of_work", unit_of_work):
+        yield AgentSessionStore(batch_size=100, interval=60)
+    await engine.dispose()
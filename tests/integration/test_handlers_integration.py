@@ -1,10 +1,13 @@
 import uuid
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime, timezone, timedelta
 from unittest.mock import patch, AsyncMock
 
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 
 from tomato_ai.adapters import orm
 from tomato_ai.adapters.orm import Base
@@ -12,7 +15,7 @@ from tomato_ai.config import settings
 from tomato_ai.domain import events
 from tomato_ai.handlers import (
     send_telegram_notification_on_start, handle_nudge, start_session_command, not_now_button,
-    send_telegram_notification, send_telegram_notification_on_expiration, schedule_nudge_on_session_completed,
+    send_session_end_notification, schedule_nudge_on_session_completed,
     cancel_reminder_on_session_started, handle_message
 )
 
@@ -23,31 +26,50 @@ from tomato_ai.handlers import (
 # OLLAMA_API_KEY: Your Ollama API key (if you are not running it locally)
 
 
-# Create a new test engine, and create the tables
-test_engine = create_engine(
-    "sqlite:///:memory:",
-    connect_args={"check_same_thread": False},
-)
-Base.metadata.create_all(bind=test_engine)
+# Create a new test engine, the tables are created per test
+test_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
 
 # Create a new session for the tests
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+TestingSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=test_engine)
 
 
-@pytest.fixture
-def dbsession() -> Session:
+@pytest_asyncio.fixture
+async def dbsession() -> AsyncSession:
     """
     Creates a new database session for a test.
     """
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     db = TestingSessionLocal()
     try:
         yield db
     finally:
-        # Clean up all data from all tables
-        for table in reversed(Base.metadata.sorted_tables):
-            db.execute(table.delete())
-        db.commit()
-        db.close()
+        await db.close()
+        async with test_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+
+def unit_of_work_for(dbsession: AsyncSession):
+    """
+    Builds a unit_of_work replacement that hands out the test session.
+    """
+    @asynccontextmanager
+    async def unit_of_work():
+        yield dbsession
+        await dbsession.commit()
+
+    return unit_of_work
+
+
+@contextmanager
+def units_of_work_for(dbsession: AsyncSession):
+    """
+    Hands out the test session to the handlers and to the agent session store.
+    """
+    unit_of_work = unit_of_work_for(dbsession)
+    with patch("tomato_ai.handlers.unit_of_work", unit_of_work), \
+            patch("tomato_ai.adapters.agent_sessions.unit_of_work", unit_of_work):
+        yield
 
 
 @pytest.fixture
@@ -66,51 +88,52 @@ def mock_update_and_context():
 )
 class TestHandlerIntegration:
     @pytest.mark.asyncio
-    async def test_send_telegram_notification_on_start(self, dbsession: Session):
+    async def test_send_telegram_notification_on_start(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         user = orm.User(id=user_id, telegram_chat_id=telegram_chat_id)
         dbsession.add(user)
-        dbsession.commit()
+        await dbsession.commit()
 
         event = events.SessionStarted(user_id=user_id, session_id=uuid.uuid4(), session_type="work")
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with units_of_work_for(dbsession):
             # Act & Assert: This should run without errors
             await send_telegram_notification_on_start(event)
 
     @pytest.mark.asyncio
-    async def test_send_telegram_notification_on_session_completed(self, dbsession: Session):
+    async def test_send_telegram_notification_on_session_completed(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         user = orm.User(id=user_id, telegram_chat_id=telegram_chat_id)
         dbsession.add(user)
-        dbsession.commit()
+        await dbsession.commit()
 
-        event = events.SessionCompleted(user_id=user_id, session_id=uuid.uuid4(), session_type="work")
+        event = events.SessionEnded(user_id=user_id, session_id=uuid.uuid4(), session_type="work", expired=False)
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with units_of_work_for(dbsession):
             # Act & Assert: This should run without errors
-            await send_telegram_notification(event)
+            await send_session_end_notification(event)
 
     @pytest.mark.asyncio
-    async def test_send_telegram_notification_on_expiration(self, dbsession: Session):
+    async def test_send_telegram_notification_on_expiration(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         user = orm.User(id=user_id, telegram_chat_id=telegram_chat_id)
         dbsession.add(user)
-        dbsession.commit()
+        await dbsession.commit()
 
-        event = events.SessionExpired(user_id=user_id, session_id=uuid.uuid4())
+        event = events.SessionEnded(user_id=user_id, session_id=uuid.uuid4(), session_type="work", expired=True)
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with units_of_work_for(dbsession):
             # Act & Assert: This should run without errors
-            await send_telegram_notification_on_expiration(event)
+            await send_session_end_notification(event)
 
-    def test_schedule_nudge_on_session_completed(self, dbsession: Session):
+    @pytest.mark.asyncio
+    async def test_schedule_nudge_on_session_completed(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         session_id = uuid.uuid4()
@@ -121,102 +144,103 @@ class TestHandlerIntegration:
             duration=timedelta(minutes=25)
         )
         dbsession.add(session)
-        dbsession.commit()
+        await dbsession.commit()
 
         event = events.SessionCompleted(user_id=user_id, session_id=session_id, session_type="work")
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with patch("tomato_ai.handlers.unit_of_work", unit_of_work_for(dbsession)):
             # Act
-            schedule_nudge_on_session_completed(event)
+            await schedule_nudge_on_session_completed(event)
 
             # Assert
-            reminder = dbsession.query(orm.Reminder).one()
+            reminder = (await dbsession.scalars(select(orm.Reminder))).one()
             assert reminder.user_id == user_id
             assert reminder.escalation_count == 1
 
-    def test_cancel_reminder_on_session_started(self, dbsession: Session):
+    @pytest.mark.asyncio
+    async def test_cancel_reminder_on_session_started(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         chat_id = int(settings.TELEGRAM_CHAT_ID)
         reminder = orm.Reminder(user_id=user_id, chat_id=chat_id, send_at=datetime.now(timezone.utc))
         dbsession.add(reminder)
-        dbsession.commit()
+        await dbsession.commit()
 
         event = events.SessionStarted(user_id=user_id, session_id=uuid.uuid4(), session_type="work")
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with patch("tomato_ai.handlers.unit_of_work", unit_of_work_for(dbsession)):
             # Act
-            cancel_reminder_on_session_started(event)
+            await cancel_reminder_on_session_started(event)
 
             # Assert
-            reminder = dbsession.query(orm.Reminder).filter_by(user_id=user_id).first()
+            reminder = await dbsession.scalar(select(orm.Reminder).filter_by(user_id=user_id))
             assert reminder.state == "cancelled"
 
     @pytest.mark.asyncio
-    async def test_handle_message(self, dbsession: Session, mock_update_and_context):
+    async def test_handle_message(self, dbsession: AsyncSession, mock_update_and_context):
         update, context = mock_update_and_context
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         update.effective_chat.id = int(telegram_chat_id)
         update.message.text = "Hello, agent!"
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with units_of_work_for(dbsession):
             # Act & Assert
             await handle_message(update, context)
             context.bot.send_message.assert_awaited_once()
 
     @pytest.mark.asyncio
-    async def test_handle_nudge_sends_message(self, dbsession: Session):
+    async def test_handle_nudge_sends_message(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         user = orm.User(id=user_id, telegram_chat_id=telegram_chat_id, timezone="UTC")
         dbsession.add(user)
-        dbsession.commit()
+        await dbsession.commit()
 
         event = events.NudgeUser(user_id=user_id, chat_id=int(settings.TELEGRAM_CHAT_ID), escalation_count=1,
                                  session_type="work")
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with units_of_work_for(dbsession):
             # Act & Assert
             await handle_nudge(event)
 
     @pytest.mark.asyncio
-    async def test_handle_nudge_escalates(self, dbsession: Session):
+    async def test_handle_nudge_escalates(self, dbsession: AsyncSession):
         # Arrange
         user_id = uuid.uuid4()
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         user = orm.User(id=user_id, telegram_chat_id=telegram_chat_id, timezone="UTC")
         dbsession.add(user)
-        dbsession.commit()
+        await dbsession.commit()
 
         event = events.NudgeUser(user_id=user_id, chat_id=int(settings.TELEGRAM_CHAT_ID), escalation_count=1,
                                  session_type="work")
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with units_of_work_for(dbsession):
             # Act & Assert
             await handle_nudge(event)
 
     @pytest.mark.asyncio
-    async def test_start_session_command(self, dbsession: Session, mock_update_and_context):
+    async def test_start_session_command(self, dbsession: AsyncSession, mock_update_and_context):
         update, context = mock_update_and_context
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         update.message.chat_id = int(telegram_chat_id)
         update.message.from_user.id = int(telegram_chat_id)
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with patch("tomato_ai.handlers.unit_of_work", unit_of_work_for(dbsession)):
             await start_session_command(update, context, "work")
 
     @pytest.mark.asyncio
-    async def test_not_now_button(self, dbsession: Session, mock_update_and_context):
+    async def test_not_now_button(self, dbsession: AsyncSession, mock_update_and_context):
         update, context = mock_update_and_context
         telegram_chat_id = settings.TELEGRAM_CHAT_ID
         update.callback_query.message.chat_id = int(telegram_chat_id)
         update.callback_query.from_user.id = int(telegram_chat_id)
 
-        with patch("tomato_ai.handlers.get_session", return_value=iter([dbsession])):
+        with patch("tomato_ai.handlers.unit_of_work", unit_of_work_for(dbsession)):
             await not_now_button(update, context)
 
             # Verify a reminder was created
-            reminder = dbsession.query(orm.Reminder).one_or_none()
+            reminder = (await dbsession.scalars(select(orm.Reminder))).one_or_none()
             assert reminder is not None
             assert reminder.chat_id == int(telegram_chat_id)
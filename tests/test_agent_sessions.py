@@ -0,0 +1,194 @@
+from unittest.mock import patch
+
+import pytest
+from strands.session.file_session_manager import FileSessionManager
+from strands.types.exceptions import SessionException
+from strands.types.session import Session, SessionAgent, SessionMessage, SessionType
+
+from tomato_ai.adapters.agent_sessions import AgentSessionStore
+from tomato_ai.import_agent_sessions import import_sessions
+
+
+def _session(session_id="chat"):
+    return Session(session_id=session_id, session_type=SessionType.AGENT)
+
+
+def _agent(agent_id="default"):
+    return SessionAgent(agent_id=agent_id, state={}, conversation_manager_state={})
+
+
+def _message(message_id, text="hello"):
+    return SessionMessage(message={"role": "user", "content": [{"text": text}]}, message_id=message_id)
+
+
+async def _create_chat(store, messages=3):
+    await store.load("chat")
+    store.create_session(_session())
+    store.create_agent("chat", _agent())
+    for message_id in range(messages):
+        store.create_message("chat", "default", _message(message_id, f"message {message_id}"))
+
+
+@pytest.mark.asyncio
+class TestAgentSessionStore:
+    async def test_flushed_sessions_load_back_from_the_database(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store)
+
+        # Act
+        await agent_session_store.flush()
+        await agent_session_store.load("chat")
+
+        # Assert
+        assert agent_session_store.read_session("chat").session_id == "chat"
+        assert agent_session_store.read_agent("chat", "default").agent_id == "default"
+        messages = agent_session_store.list_messages("chat", "default", offset=1)
+        assert [m.message["content"][0]["text"] for m in messages] == ["message 1", "message 2"]
+        assert agent_session_store.stats()["flushed_rows"] == 5
+
+    async def test_writes_stay_in_memory_until_flushed(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store, messages=1)
+
+        # Act
+        pending = agent_session_store.pending()
+        await agent_session_store.flush()
+
+        # Assert
+        assert pending == 3
+        assert agent_session_store.pending() == 0
+        assert agent_session_store.stats()["flushes"] == 1
+
+    async def test_updates_overwrite_flushed_rows(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store, messages=1)
+        agent_session_store.retain("chat")
+        await agent_session_store.flush()
+
+        # Act
+        agent_session_store.update_agent(
+            "chat", SessionAgent(agent_id="default", state={"turns": 1}, conversation_manager_state={})
+        )
+        agent_session_store.update_message("chat", "default", _message(0, "redacted"))
+        await agent_session_store.flush()
+        agent_session_store.release("chat")
+        await agent_session_store.flush()
+        await agent_session_store.load("chat")
+
+        # Assert
+        assert agent_session_store.read_agent("chat", "default").state == {"turns": 1}
+        assert agent_session_store.read_message("chat", "default", 0).message["content"][0]["text"] == "redacted"
+
+    async def test_deletes_the_oldest_messages(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store, messages=4)
+        await agent_session_store.flush()
+        await agent_session_store.load("chat")
+
+        # Act
+        agent_session_store.delete_oldest_messages("chat", "default", 3)
+        await agent_session_store.flush()
+        await agent_session_store.load("chat")
+
+        # Assert
+        assert [m.message_id for m in agent_session_store.list_messages("chat", "default")] == [3]
+
+    async def test_keeps_retained_sessions_in_memory(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store)
+        agent_session_store.retain("chat")
+
+        # Act
+        await agent_session_store.flush()
+        retained = agent_session_store.stats()["loaded"]
+        agent_session_store.release("chat")
+        await agent_session_store.flush()
+
+        # Assert
+        assert retained == 1
+        assert agent_session_store.stats()["loaded"] == 0
+
+    async def test_a_failed_flush_keeps_the_rows_dirty(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store, messages=1)
+
+        # Act
+        with patch("tomato_ai.adapters.agent_sessions._upsert", side_effect=RuntimeError("database down")):
+            with pytest.raises(RuntimeError):
+                await agent_session_store.flush()
+
+        # Assert
+        assert agent_session_store.pending() == 3
+        assert agent_session_store.stats()["loaded"] == 1
+
+    async def test_reloads_instead_of_overwriting_a_session_written_elsewhere(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store, messages=1)
+        await agent_session_store.flush()
+        other = AgentSessionStore(batch_size=100, interval=60)
+        for store in (agent_session_store, other):
+            await store.load("chat")
+            store.retain("chat")
+        view = agent_session_store.view("chat")
+        other.create_message("chat", "default", _message(1, "from the worker"))
+        await other.flush()
+
+        # Act
+        view.create_message("chat", "default", _message(1, "from the web app"))
+        await agent_session_store.flush()
+        view.create_message("chat", "default", _message(2, "stale"))
+
+        # Assert
+        assert agent_session_store.generation("chat") == 1
+        assert view.stale
+        assert agent_session_store.pending() == 0
+        messages = agent_session_store.list_messages("chat", "default")
+        assert [m.message["content"][0]["text"] for m in messages] == ["message 0", "from the worker"]
+
+    async def test_later_flushes_of_a_reloaded_session_succeed(self, agent_session_store):
+        # Arrange
+        await _create_chat(agent_session_store, messages=1)
+        await agent_session_store.flush()
+        other = AgentSessionStore(batch_size=100, interval=60)
+        for store in (agent_session_store, other):
+            await store.load("chat")
+            store.retain("chat")
+        other.create_message("chat", "default", _message(1))
+        await other.flush()
+        agent_session_store.create_message("chat", "default", _message(1))
+        await agent_session_store.flush()
+
+        # Act
+        agent_session_store.view("chat").create_message("chat", "default", _message(2, "after the reload"))
+        await agent_session_store.flush()
+        agent_session_store.release("chat")
+        await agent_session_store.flush()
+        await agent_session_store.load("chat")
+
+        # Assert
+        message = agent_session_store.read_message("chat", "default", 2)
+        assert message.message["content"][0]["text"] == "after the reload"
+
+    async def test_rejects_sessions_that_were_not_loaded(self, agent_session_store):
+        # Act & Assert
+        with pytest.raises(SessionException):
+            agent_session_store.read_session("chat")
+
+
+@pytest.mark.asyncio
+class TestImportSessions:
+    async def test_imports_session_directories_once(self, agent_session_store, tmp_path):
+        # Arrange
+        files = FileSessionManager("chat", storage_dir=str(tmp_path))
+        files.create_agent("chat", _agent())
+        files.create_message("chat", "default", _message(0))
+        files.create_message("chat", "default", _message(1))
+
+        # Act
+        first = await import_sessions(str(tmp_path), agent_session_store)
+        second = await import_sessions(str(tmp_path), agent_session_store)
+
+        # Assert
+        assert (first, second) == (1, 0)
+        await agent_session_store.load("chat")
+        assert [m.message_id for m in agent_session_store.list_messages("chat", "default")] == [0, 1]
@@ -0,0 +1,334 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import pytest
+
+from strands import Agent
+
+from tomato_ai.agents import SUMMARY_HEADER, AgentCache, BoundedConversationManager, CompactingSessionManager, \
+    estimate_tokens
+
+
+@pytest.fixture
+def factory():
+    return MagicMock(side_effect=lambda key, session_manager: MagicMock(name=f"agent {key}"))
+
+
+@pytest.fixture
+def session_store():
+    return MagicMock(load=AsyncMock())
+
+
+@pytest.fixture(autouse=True)
+def session_managers():
+    with patch("tomato_ai.agents.CompactingSessionManager") as session_manager:
+        yield session_manager
+
+
+@pytest.mark.asyncio
+class TestAgentCache:
+    async def test_reuses_the_agent_of_a_chat(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=2, ttl=60)
+
+        # Act
+        async with cache.lease("1") as first:
+            pass
+        async with cache.lease("1") as second:
+            pass
+
+        # Assert
+        assert first is second
+        factory.assert_called_once()
+        assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "evictions": 0}
+
+    async def test_model_calls_go_through_run_while_the_agent_is_held(self, factory, session_store):
+        # Arrange
+        async def run(call, *args):
+            assert next(iter(cache._entries.values())).lock.locked()
+            return "Well done!"
+
+        cache = AgentCache("test", factory, session_store=session_store, max_size=2, ttl=60, run=run)
+
+        # Act
+        response = await cache.invoke("1", "Hello")
+
+        # Assert
+        assert response == "Well done!"
+
+    async def test_evicts_the_least_recently_used_agent_and_flushes_it(self, factory, session_store, session_managers):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=2, ttl=60)
+        async with cache.lease("1"):
+            pass
+        async with cache.lease("2") as evicted:
+            pass
+        async with cache.lease("1"):
+            pass
+
+        # Act
+        async with cache.lease("3"):
+            pass
+
+        # Assert
+        assert cache.stats()["evictions"] == 1
+        session_managers.return_value.sync_agent.assert_called_once_with(evicted)
+        evicted.cleanup.assert_called_once()
+        async with cache.lease("1"):
+            pass
+        assert cache.hits == 2
+
+    async def test_expires_idle_agents(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=2, ttl=60)
+        with patch("tomato_ai.agents.time.monotonic", return_value=0):
+            async with cache.lease("1"):
+                pass
+
+        # Act
+        with patch("tomato_ai.agents.time.monotonic", return_value=61):
+            async with cache.lease("1"):
+                pass
+
+        # Assert
+        assert factory.call_count == 2
+        assert cache.stats() == {"size": 1, "hits": 0, "misses": 2, "evictions": 1}
+
+    async def test_flushes_an_agent_evicted_mid_call_once_the_call_returns(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=1, ttl=60)
+
+        # Act
+        async with cache.lease("1") as busy:
+            async with cache.lease("2"):
+                pass
+            flushed_during_call = busy.cleanup.called
+
+        # Assert
+        assert not flushed_during_call
+        busy.cleanup.assert_called_once()
+
+    async def test_callers_waiting_on_an_evicted_agent_check_out_a_fresh_one(
+        self, factory, session_store, session_managers
+    ):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=1, ttl=60)
+        release = asyncio.Event()
+        agents = []
+
+        async def chat():
+            async with cache.lease("1") as agent:
+                agents.append(agent)
+                await release.wait()
+
+        first = asyncio.create_task(chat())
+        second = asyncio.create_task(chat())
+        await asyncio.sleep(0)
+
+        # Act
+        async with cache.lease("2"):
+            pass
+        release.set()
+        await asyncio.gather(first, second)
+
+        # Assert
+        evicted, fresh = agents
+        assert evicted is not fresh
+        session_managers.return_value.sync_agent.assert_any_call(evicted)
+        evicted.cleanup.assert_called_once()
+        fresh.cleanup.assert_not_called()
+        assert session_store.release.call_args_list == [call("1"), call("2")]
+
+    async def test_replaces_agents_whose_session_was_reloaded(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=1, ttl=60)
+        session_store.generation.return_value = 0
+        async with cache.lease("1") as stale:
+            pass
+
+        # Act
+        session_store.generation.return_value = 1
+        async with cache.lease("1") as fresh:
+            pass
+
+        # Assert
+        assert fresh is not stale
+        stale.cleanup.assert_called_once()
+        session_store.release.assert_called_once_with("1")
+
+    async def test_tears_down_real_agents_on_eviction(self, session_store, caplog):
+        # Arrange
+        cache = AgentCache(
+            "test", lambda key, session_manager: Agent(model=MagicMock(stateful=False)),
+            session_store=session_store, max_size=1, ttl=60,
+        )
+        async with cache.lease("1"):
+            pass
+
+        # Act
+        async with cache.lease("2"):
+            pass
+
+        # Assert
+        assert "Failed to flush" not in caplog.text
+        session_store.release.assert_called_once_with("1")
+
+    async def test_serializes_calls_on_the_same_agent(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=1, ttl=60)
+        order = []
+
+        async def call(name):
+            async with cache.lease("1"):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        # Act
+        await asyncio.gather(call("first"), call("second"))
+
+        # Assert
+        assert order == ["first start", "first end", "second start", "second end"]
+
+    async def test_invoke_returns_the_agent_reply_as_text(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=1, ttl=60)
+        async with cache.lease("1") as agent:
+            agent.invoke_async = AsyncMock(return_value="Hello")
+
+        # Act
+        reply = await cache.invoke("1", "Hi")
+
+        # Assert
+        assert reply == "Hello"
+        agent.invoke_async.assert_awaited_once_with("Hi")
+
+    async def test_loads_and_retains_the_session_of_a_new_chat_until_eviction(self, factory, session_store):
+        # Arrange
+        cache = AgentCache("test", factory, session_store=session_store, max_size=1, ttl=60)
+
+        # Act
+        async with cache.lease("1"):
+            pass
+        async with cache.lease("1"):
+            pass
+        async with cache.lease("2"):
+            pass
+
+        # Assert
+        assert session_store.load.await_args_list == [call("1"), call("2")]
+        assert session_store.retain.call_args_list == [call("1"), call("2")]
+        session_store.release.assert_called_once_with("1")
+
+
+def _message(role, text):
+    return {"role": role, "content": [{"text": text}]}
+
+
+def _conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages += [_message("user", f"question {i}"), _message("assistant", f"answer {i}")]
+    return messages
+
+
+class TestBoundedConversationManager:
+    def test_keeps_the_last_turns_and_summarizes_the_rest(self):
+        # Arrange
+        manager = BoundedConversationManager(keep_turns=2, max_tokens=1000, summary_chars=500)
+        agent = MagicMock(messages=_conversation(5))
+
+        # Act
+        manager.apply_management(agent)
+
+        # Assert
+        assert agent.messages[1:] == _conversation(5)[6:]
+        assert manager.summary == "\n".join(
+            f"User: question {i}\nAssistant: answer {i}" for i in range(3)
+        )
+        assert manager.removed_message_count == 6
+
+    def test_rolls_a_previous_summary_into_the_next_one(self):
+        # Arrange
+        manager = BoundedConversationManager(keep_turns=1, max_tokens=1000, summary_chars=500)
+        agent = MagicMock(messages=_conversation(2))
+        manager.apply_management(agent)
+
+        # Act
+        agent.messages += _conversation(3)[4:]
+        manager.apply_management(agent)
+
+        # Assert
+        assert manager.summary == "User: question 0\nAssistant: answer 0\nUser: question 1\nAssistant: answer 1"
+        assert agent.messages[1:] == _conversation(3)[4:]
+        assert manager.removed_message_count == 4
+
+    def test_caps_the_summary_length(self):
+        # Arrange
+        manager = BoundedConversationManager(keep_turns=1, max_tokens=1000, summary_chars=40)
+        agent = MagicMock(messages=_conversation(10))
+
+        # Act
+        manager.apply_management(agent)
+
+        # Assert
+        assert len(manager.summary) <= 40
+        assert manager.summary.endswith("Assistant: answer 8")
+
+    def test_drops_the_oldest_kept_messages_over_the_token_cap(self):
+        # Arrange
+        manager = BoundedConversationManager(keep_turns=5, max_tokens=20, summary_chars=500)
+        agent = MagicMock(messages=[_message("user", "x" * 100), _message("assistant", "y" * 100), _message("user", "z")])
+
+        # Act
+        manager.apply_management(agent)
+
+        # Assert
+        assert agent.messages == [_message("user", "z")]
+        assert estimate_tokens(agent.messages) <= 20
+        assert manager.removed_message_count == 2
+
+    def test_restores_the_offset_of_a_sliding_window_session(self):
+        # Arrange
+        manager = BoundedConversationManager(keep_turns=1, max_tokens=1000, summary_chars=500)
+
+        # Act
+        prepended = manager.restore_from_session(
+            {"__name__": "SlidingWindowConversationManager", "removed_message_count": 7}
+        )
+
+        # Assert
+        assert prepended is None
+        assert manager.removed_message_count == 7
+
+
+@pytest.mark.asyncio
+class TestCompactingSessionManager:
+    def _agent(self, store):
+        return Agent(
+            model=MagicMock(stateful=False),
+            session_manager=CompactingSessionManager("chat", store, compact_after=2),
+            conversation_manager=BoundedConversationManager(keep_turns=1, max_tokens=1000, summary_chars=500),
+        )
+
+    async def test_deletes_dropped_messages_and_restores_the_summary(self, agent_session_store):
+        # Arrange
+        await agent_session_store.load("chat")
+        agent = self._agent(agent_session_store)
+        for message in _conversation(3):
+            agent.messages.append(message)
+            agent._session_manager.append_message(message, agent)
+
+        # Act
+        agent.conversation_manager.apply_management(agent)
+        agent._session_manager.sync_agent(agent)
+        await agent_session_store.flush()
+        await agent_session_store.load("chat")
+        restored = self._agent(agent_session_store)
+
+        # Assert
+        stored = agent_session_store.list_messages("chat", "default")
+        assert [message.message_id for message in stored] == [4, 5]
+        assert restored.messages[0]["content"][0]["text"].startswith(SUMMARY_HEADER)
+        assert [m["content"] for m in restored.messages[1:]] == [m["content"] for m in _conversation(3)[4:]]
+        assert restored.conversation_manager.removed_message_count == 0
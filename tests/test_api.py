@@ -5,6 +5,7 @@ from unittest.mock import patch, AsyncMock, MagicMock, ANY
 from tomato_ai.domain import events
 from tomato_ai.adapters import event_bus, orm
 from tomato_ai import handlers
+from tomato_ai.config import settings
 
 
 def test_health_check(client: TestClient):
@@ -13,6 +14,13 @@ def test_health_check(client: TestClient):
     assert response.json() == {"status": "healthy"}
 
 
+def test_metrics_report_agent_cache_stats(client: TestClient):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert set(response.json()["agent_cache"]["notification"]) == {"size", "hits", "misses", "evictions"}
+    assert set(response.json()["agent_sessions"]) == {"loaded", "pending", "flushes", "flushed_rows"}
+
+
 @pytest.mark.asyncio
 async def test_create_and_get_session(client: TestClient):
     user_id = uuid4()
@@ -56,7 +64,7 @@ async def test_create_session_with_type(client: TestClient, session_type: str, e
 
 @pytest.mark.asyncio
 async def test_events_are_published(client: TestClient):
-    with patch("tomato_ai.adapters.event_bus.publish", new_callable=AsyncMock) as mock_publish:
+    with patch("tomato_ai.adapters.event_bus.enqueue", new_callable=AsyncMock) as mock_publish:
         user_id = uuid4()
         chat_id = 12345
         response = client.post("/sessions/", json={"user_id": str(user_id), "chat_id": chat_id})
@@ -76,6 +84,18 @@ async def test_events_are_published(client: TestClient):
         mock_publish.assert_awaited_once()
         assert isinstance(mock_publish.call_args[0][0], events.SessionPaused)
 
+
+def test_full_event_queue_rejects_before_the_write_is_committed(client: TestClient):
+    with patch.object(settings, "EVENT_QUEUE_OVERFLOW", "reject"), \
+            patch("tomato_ai.adapters.event_bus.has_room", return_value=False), \
+            patch("tomato_ai.adapters.event_bus.enqueue", new_callable=AsyncMock) as mock_enqueue, \
+            patch("tomato_ai.entrypoints.fastapi_app.deadlines.schedule") as mock_schedule:
+        response = client.post("/sessions/", json={"user_id": str(uuid4()), "chat_id": 12345})
+
+    assert response.status_code == 503
+    mock_schedule.assert_not_called()
+    mock_enqueue.assert_not_awaited()
+
 from datetime import timezone
 from telegram.ext import Application
 @pytest.mark.asyncio
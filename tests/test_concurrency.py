@@ -0,0 +1,198 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+
+from tomato_ai.adapters.concurrency import (
+    BACKGROUND, INTERACTIVE, KeyedLock, PriorityLanes, chat_locks, current_lane, ordered_per_chat
+)
+
+
+@pytest.mark.asyncio
+class TestKeyedLock:
+    async def test_runs_work_for_the_same_key_in_order(self):
+        # Arrange
+        locks = KeyedLock()
+        order = []
+
+        async def work(name, delay):
+            async with locks.hold("chat"):
+                order.append(f"{name} start")
+                await asyncio.sleep(delay)
+                order.append(f"{name} end")
+
+        # Act
+        await asyncio.gather(work("first", 0.02), work("second", 0))
+
+        # Assert
+        assert order == ["first start", "first end", "second start", "second end"]
+
+    async def test_runs_different_keys_in_parallel(self):
+        # Arrange
+        locks = KeyedLock()
+        both_inside = asyncio.Barrier(2)
+
+        async def work(key):
+            async with locks.hold(key):
+                await asyncio.wait_for(both_inside.wait(), timeout=1)
+
+        # Act & Assert: serializing the keys would time out at the barrier
+        await asyncio.gather(work(1), work(2))
+
+    async def test_evicts_idle_keys(self):
+        # Arrange
+        locks = KeyedLock()
+
+        # Act
+        async with locks.hold("chat"):
+            held = len(locks)
+
+        # Assert
+        assert held == 1
+        assert len(locks) == 0
+
+    async def test_evicts_keys_after_a_failure(self):
+        # Arrange
+        locks = KeyedLock()
+
+        # Act
+        with pytest.raises(RuntimeError):
+            async with locks.hold("chat"):
+                raise RuntimeError("boom")
+
+        # Assert
+        assert len(locks) == 0
+
+
+@pytest.mark.asyncio
+class TestOrderedPerChat:
+    async def test_serializes_updates_of_the_same_chat(self):
+        # Arrange
+        order = []
+
+        @ordered_per_chat
+        async def handler(update, context):
+            order.append(f"{update.name} start")
+            await asyncio.sleep(update.delay)
+            order.append(f"{update.name} end")
+
+        first = MagicMock(effective_chat=MagicMock(id=42), delay=0.02)
+        first.name = "first"
+        second = MagicMock(effective_chat=MagicMock(id=42), delay=0)
+        second.name = "second"
+
+        # Act
+        await asyncio.gather(handler(first, None), handler(second, None))
+
+        # Assert
+        assert order == ["first start", "first end", "second start", "second end"]
+        assert len(chat_locks) == 0
+
+    async def test_runs_updates_without_a_chat_unlocked(self):
+        # Arrange
+        handler_called = []
+
+        @ordered_per_chat
+        async def handler(update, context):
+            handler_called.append(update)
+
+        update = MagicMock(effective_chat=None)
+
+        # Act
+        await handler(update, None)
+
+        # Assert
+        assert handler_called == [update]
+
+
+@pytest.mark.asyncio
+class TestPriorityLanes:
+    async def test_limits_each_lane(self):
+        # Arrange
+        lanes = PriorityLanes({INTERACTIVE: 2, BACKGROUND: 1}, total=3)
+        release = asyncio.Event()
+        peak = []
+
+        async def work():
+            async with lanes.slot(BACKGROUND):
+                peak.append(lanes.running(BACKGROUND))
+                await release.wait()
+
+        # Act
+        tasks = [asyncio.create_task(work()) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiting = lanes.waiting(BACKGROUND)
+        release.set()
+        await asyncio.gather(*tasks)
+
+        # Assert
+        assert waiting == 2
+        assert max(peak) == 1
+
+    async def test_serves_waiting_interactive_work_first(self):
+        # Arrange
+        lanes = PriorityLanes({INTERACTIVE: 1, BACKGROUND: 1}, total=1)
+        release = asyncio.Event()
+        order = []
+
+        async def work(lane, name):
+            async with lanes.slot(lane):
+                order.append(name)
+                if name == "running":
+                    await release.wait()
+
+        running = asyncio.create_task(work(BACKGROUND, "running"))
+        await asyncio.sleep(0)
+        background = asyncio.create_task(work(BACKGROUND, "background"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(work(INTERACTIVE, "interactive"))
+        await asyncio.sleep(0)
+
+        # Act
+        release.set()
+        await asyncio.gather(running, background, interactive)
+
+        # Assert
+        assert order == ["running", "interactive", "background"]
+
+    async def test_uses_the_current_lane_by_default(self):
+        # Arrange
+        lanes = PriorityLanes({INTERACTIVE: 1, BACKGROUND: 1}, total=2)
+        token = current_lane.set(INTERACTIVE)
+
+        # Act
+        try:
+            async with lanes.slot():
+                running = lanes.running(INTERACTIVE)
+        finally:
+            current_lane.reset(token)
+
+        # Assert
+        assert running == 1
+
+    async def test_cancelled_waiters_give_up_their_place(self):
+        # Arrange
+        lanes = PriorityLanes({INTERACTIVE: 1, BACKGROUND: 1}, total=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with lanes.slot(BACKGROUND):
+                await release.wait()
+
+        async def wait():
+            async with lanes.slot(BACKGROUND):
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+
+        # Act
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await holder
+
+        # Assert
+        assert lanes.waiting(BACKGROUND) == 0
+        assert lanes.running(BACKGROUND) == 0
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from tomato_ai.adapters.deadlines import DeadlineScheduler
+
+
+@pytest.mark.asyncio
+class TestDeadlineScheduler:
+    async def test_fires_callback_when_deadline_is_due(self):
+        # Arrange
+        scheduler = DeadlineScheduler()
+        fired = asyncio.Event()
+
+        async def callback():
+            fired.set()
+
+        scheduler.register("reminder", callback)
+        await scheduler.start()
+        try:
+            # Act
+            scheduler.schedule("reminder", datetime.now(timezone.utc) + timedelta(milliseconds=50))
+
+            # Assert
+            await asyncio.wait_for(fired.wait(), timeout=1)
+            assert scheduler.next_deadline() is None
+        finally:
+            await scheduler.stop()
+
+    async def test_earlier_deadline_wakes_the_timer_loop(self):
+        # Arrange
+        scheduler = DeadlineScheduler()
+        fired = asyncio.Event()
+
+        async def callback():
+            fired.set()
+
+        scheduler.register("reminder", callback)
+        await scheduler.start()
+        try:
+            scheduler.schedule("reminder", datetime.now(timezone.utc) + timedelta(hours=1))
+            await asyncio.sleep(0.01)
+
+            # Act
+            scheduler.schedule("reminder", datetime.now(timezone.utc) + timedelta(milliseconds=20))
+
+            # Assert
+            await asyncio.wait_for(fired.wait(), timeout=1)
+            assert scheduler.next_deadline() > datetime.now(timezone.utc)
+        finally:
+            await scheduler.stop()
+
+    async def test_coalesces_deadlines_that_are_due_together(self):
+        # Arrange
+        scheduler = DeadlineScheduler()
+        calls = []
+
+        async def callback():
+            calls.append(datetime.now(timezone.utc))
+
+        scheduler.register("session_expiry", callback)
+        await scheduler.start()
+        past = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        # Act
+        for _ in range(3):
+            scheduler.schedule("session_expiry", past)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+        # Assert
+        assert len(calls) == 1
+
+    async def test_ignores_deadlines_while_the_timer_loop_is_stopped(self):
+        # Arrange
+        scheduler = DeadlineScheduler()
+
+        # Act
+        scheduler.schedule("reminder", datetime.now(timezone.utc) + timedelta(hours=1))
+
+        # Assert
+        assert scheduler.next_deadline() is None
@@ -0,0 +1,392 @@
+import asyncio
+import threading
+import pytest
+from collections import defaultdict
+from unittest.mock import patch
+from uuid import uuid4
+
+from tomato_ai.adapters import event_bus
+from tomato_ai.adapters.resilience import CircuitBreaker
+from tomato_ai.domain import events
+
+
+@pytest.fixture(autouse=True)
+def handlers():
+    with patch.object(event_bus, "HANDLERS", defaultdict(list)) as handlers:
+        yield handlers
+
+
+def make_event() -> events.SessionStarted:
+    return events.SessionStarted(session_id=uuid4(), user_id=uuid4(), session_type="work")
+
+
+@pytest.mark.asyncio
+class TestPublish:
+    async def test_runs_async_handlers_concurrently(self):
+        # Arrange
+        both_started = asyncio.Barrier(2)
+
+        async def first(event):
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+
+        async def second(event):
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+
+        event_bus.register(events.SessionStarted, first)
+        event_bus.register(events.SessionStarted, second)
+
+        # Act & Assert: a serial bus would time out waiting at the barrier
+        await event_bus.publish(make_event())
+
+    async def test_runs_sync_handlers_off_the_event_loop(self):
+        # Arrange
+        threads = []
+        event_bus.register(events.SessionStarted, lambda event: threads.append(threading.current_thread()))
+
+        # Act
+        await event_bus.publish(make_event())
+
+        # Assert
+        assert threads and threads[0] is not threading.main_thread()
+
+    async def test_honours_ordering_constraints(self):
+        # Arrange
+        order = []
+
+        async def slow(event):
+            await asyncio.sleep(0.02)
+            order.append("slow")
+
+        async def dependent(event):
+            order.append("dependent")
+
+        event_bus.register(events.SessionStarted, dependent, after=[slow])
+        event_bus.register(events.SessionStarted, slow)
+
+        # Act
+        await event_bus.publish(make_event())
+
+        # Assert
+        assert order == ["slow", "dependent"]
+
+    async def test_aggregates_errors_without_dropping_other_handlers(self):
+        # Arrange
+        handled = []
+
+        async def failing(event):
+            raise RuntimeError("LLM down")
+
+        def also_failing(event):
+            raise ValueError("bad data")
+
+        async def healthy(event):
+            handled.append(event)
+
+        event_bus.register(events.SessionStarted, failing)
+        event_bus.register(events.SessionStarted, also_failing)
+        event_bus.register(events.SessionStarted, healthy)
+        event = make_event()
+
+        # Act
+        with pytest.raises(ExceptionGroup) as exc_info:
+            await event_bus.publish(event)
+
+        # Assert
+        assert handled == [event]
+        assert {type(e) for e in exc_info.value.exceptions} == {RuntimeError, ValueError}
+
+
+@pytest.mark.asyncio
+class TestEventQueue:
+    async def test_enqueue_returns_before_handlers_run(self):
+        # Arrange
+        release = asyncio.Event()
+        handled = []
+
+        async def slow(event):
+            await release.wait()
+            handled.append(event)
+
+        event_bus.register(events.SessionStarted, slow)
+        event_bus.start_workers(count=1)
+        event = make_event()
+
+        # Act
+        await event_bus.enqueue(event)
+
+        # Assert
+        assert handled == []
+        release.set()
+        await event_bus.drain()
+        assert handled == [event]
+
+    async def test_full_queue_rejects_events(self):
+        # Arrange
+        release = asyncio.Event()
+
+        async def blocked(event):
+            await release.wait()
+
+        event_bus.register(events.SessionStarted, blocked)
+        event_bus.start_workers(count=1, maxsize=1)
+        await event_bus.enqueue(make_event())
+        await asyncio.sleep(0)  # the worker takes the first event
+        await event_bus.enqueue(make_event())
+
+        # Act & Assert
+        with patch.object(event_bus.settings, "EVENT_QUEUE_OVERFLOW", "reject"):
+            with pytest.raises(event_bus.EventQueueFull):
+                await event_bus.enqueue(make_event())
+
+        release.set()
+        await event_bus.drain()
+
+    async def test_has_room_reports_free_queue_slots(self):
+        # Arrange
+        release = asyncio.Event()
+
+        async def blocked(event):
+            await release.wait()
+
+        event_bus.register(events.SessionStarted, blocked)
+        event_bus.start_workers(count=1, maxsize=2)
+        await event_bus.enqueue(make_event())
+        await asyncio.sleep(0)  # the worker takes the first event
+
+        # Act
+        await event_bus.enqueue(make_event())
+
+        # Assert
+        assert event_bus.has_room(1)
+        assert not event_bus.has_room(2)
+        release.set()
+        await event_bus.drain()
+
+    async def test_full_queue_spills_events_inline(self):
+        # Arrange
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(event):
+            if not release.is_set():
+                await release.wait()
+            handled.append(event)
+
+        event_bus.register(events.SessionStarted, handler)
+        event_bus.start_workers(count=1, maxsize=1)
+        await event_bus.enqueue(make_event())
+        await asyncio.sleep(0)
+        await event_bus.enqueue(make_event())
+        release.set()
+        spilled = make_event()
+
+        # Act
+        with patch.object(event_bus.settings, "EVENT_QUEUE_OVERFLOW", "spill"):
+            await event_bus.enqueue(spilled)
+
+        # Assert
+        assert spilled in handled
+        await event_bus.drain()
+        assert len(handled) == 3
+
+
+@pytest.mark.asyncio
+class TestCoalescing:
+    async def test_merges_events_of_the_same_key_into_one_call(self):
+        # Arrange
+        handled = []
+
+        async def handler(ended):
+            handled.append(ended)
+
+        event_bus.register_coalesced(
+            (events.SessionCompleted, events.SessionExpired),
+            handler,
+            key=lambda event: event.session_id,
+            merge=events.SessionEnded.merge,
+            window=0.01,
+        )
+        session_id, user_id = uuid4(), uuid4()
+
+        # Act
+        await asyncio.gather(
+            event_bus.publish(events.SessionCompleted(session_id=session_id, user_id=user_id, session_type="break")),
+            event_bus.publish(events.SessionExpired(session_id=session_id, user_id=user_id)),
+        )
+
+        # Assert
+        assert handled == [
+            events.SessionEnded(session_id=session_id, user_id=user_id, session_type="break", expired=True)
+        ]
+
+    async def test_keeps_different_keys_apart(self):
+        # Arrange
+        handled = []
+
+        async def handler(ended):
+            handled.append(ended)
+
+        event_bus.register_coalesced(
+            (events.SessionCompleted, events.SessionExpired),
+            handler,
+            key=lambda event: event.session_id,
+            merge=events.SessionEnded.merge,
+            window=0.01,
+        )
+
+        # Act
+        await asyncio.gather(
+            event_bus.publish(events.SessionCompleted(session_id=uuid4(), user_id=uuid4(), session_type="work")),
+            event_bus.publish(events.SessionExpired(session_id=uuid4(), user_id=uuid4())),
+        )
+
+        # Assert
+        assert sorted(ended.expired for ended in handled) == [False, True]
+
+    async def test_every_publish_of_the_window_raises_the_handlers_failure(self):
+        # Arrange
+        async def handler(ended):
+            raise RuntimeError("Telegram down")
+
+        event_bus.register_coalesced(
+            (events.SessionCompleted, events.SessionExpired),
+            handler,
+            key=lambda event: event.session_id,
+            merge=events.SessionEnded.merge,
+            window=0.01,
+        )
+        session_id, user_id = uuid4(), uuid4()
+
+        # Act
+        results = await asyncio.gather(
+            event_bus.publish(events.SessionCompleted(session_id=session_id, user_id=user_id, session_type="work")),
+            event_bus.publish(events.SessionExpired(session_id=session_id, user_id=user_id)),
+            return_exceptions=True,
+        )
+
+        # Assert
+        assert [type(result) for result in results] == [ExceptionGroup, ExceptionGroup]
+        assert all(isinstance(result.exceptions[0], RuntimeError) for result in results)
+
+    async def test_publishers_of_a_cancelled_window_fail(self):
+        # Arrange
+        async def handler(ended):
+            pass
+
+        event_bus.register_coalesced(
+            (events.SessionCompleted,), handler, key=lambda event: event.session_id,
+            merge=events.SessionEnded.merge, window=10,
+        )
+        publishing = asyncio.create_task(
+            event_bus.publish(events.SessionCompleted(session_id=uuid4(), user_id=uuid4(), session_type="work"))
+        )
+        await asyncio.sleep(0.01)
+
+        # Act
+        for task in list(event_bus._coalescing_tasks):
+            task.cancel()
+
+        # Assert
+        with pytest.raises(ExceptionGroup):
+            await publishing
+
+
+@pytest.mark.asyncio
+class TestHandlerPolicy:
+    async def test_times_out_hung_handlers_and_falls_back(self):
+        # Arrange
+        fallen_back = []
+
+        async def hung(event):
+            await asyncio.Event().wait()
+
+        async def fallback(event):
+            fallen_back.append(event)
+
+        event_bus.register(
+            events.SessionStarted, hung, policy=event_bus.HandlerPolicy(timeout=0.01, fallback=fallback)
+        )
+        event = make_event()
+
+        # Act
+        await asyncio.wait_for(event_bus.publish(event), timeout=1)
+
+        # Assert
+        assert fallen_back == [event]
+
+    async def test_retries_failed_attempts(self):
+        # Arrange
+        attempts = []
+
+        async def flaky(event):
+            attempts.append(event)
+            if len(attempts) < 3:
+                raise RuntimeError("boom")
+
+        event_bus.register(
+            events.SessionStarted, flaky, policy=event_bus.HandlerPolicy(retries=2, backoff=0.001)
+        )
+
+        # Act
+        await event_bus.publish(make_event())
+
+        # Assert
+        assert len(attempts) == 3
+
+    async def test_raises_once_retries_are_exhausted_without_a_fallback(self):
+        # Arrange
+        async def failing(event):
+            raise RuntimeError("boom")
+
+        event_bus.register(
+            events.SessionStarted, failing, policy=event_bus.HandlerPolicy(retries=1, backoff=0.001)
+        )
+
+        # Act & Assert
+        with pytest.raises(ExceptionGroup):
+            await event_bus.publish(make_event())
+
+    async def test_open_circuit_short_circuits_to_the_fallback(self):
+        # Arrange
+        calls, fallen_back = [], []
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+
+        async def failing(event):
+            calls.append(event)
+            raise RuntimeError("boom")
+
+        async def fallback(event):
+            fallen_back.append(event)
+
+        event_bus.register(
+            events.SessionStarted,
+            failing,
+            policy=event_bus.HandlerPolicy(circuit_breaker=breaker, fallback=fallback),
+        )
+
+        # Act
+        await event_bus.publish(make_event())
+        await event_bus.publish(make_event())
+
+        # Assert
+        assert len(calls) == 1
+        assert len(fallen_back) == 2
+
+    async def test_cancelled_trial_call_releases_the_circuit(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        async def hung(event):
+            await asyncio.Event().wait()
+
+        event_bus.register(events.SessionStarted, hung, policy=event_bus.HandlerPolicy(circuit_breaker=breaker))
+        publishing = asyncio.create_task(event_bus.publish(make_event()))
+        await asyncio.sleep(0.01)
+
+        # Act
+        publishing.cancel()
+        await asyncio.gather(publishing, return_exceptions=True)
+
+        # Assert
+        assert breaker.allow()
@@ -1,33 +1,44 @@
+import asyncio
+from contextlib import asynccontextmanager
 import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from uuid import uuid4
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from tomato_ai.domain import events
-from tomato_ai.handlers import schedule_nudge_on_session_completed, handle_nudge, start_button, not_now_button
+from tomato_ai.handlers import (
+    schedule_nudge_on_session_completed, handle_nudge, start_button, not_now_button, send_session_end_notification,
+    handle_nudge_fallback, parse_time, run_agent
+)
 from tomato_ai.adapters import orm
+from tomato_ai.adapters.resilience import CircuitOpenError
 from tomato_ai.domain.agent_actions import TelegramMessageAction, PomodoroScheduleNextAction
 from tomato_ai.config import settings
 
 @pytest.fixture
 def mock_db_session():
-    return MagicMock()
+    # A mocked session never commits, so the reminder deadlines it would arm are not armed either.
+    with patch('tomato_ai.domain.services.after_commit'):
+        yield MagicMock(spec=AsyncSession)
 
 class TestNudgeHandlers:
-    def test_schedule_nudge_on_session_completed(self, mock_db_session):
+    @pytest.mark.asyncio
+    async def test_schedule_nudge_on_session_completed(self, mock_db_session):
         # Arrange
         user_id = uuid4()
         session_id = uuid4()
         chat_id = 12345
         session = orm.PomodoroSession(session_id=session_id, user_id=user_id, chat_id=chat_id)
-        mock_db_session.query.return_value.filter_by.return_value.first.return_value = session
+        mock_db_session.get.return_value = session
 
-        with patch('tomato_ai.handlers.get_session') as mock_get_session:
-            mock_get_session.return_value = iter([mock_db_session])
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work:
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
 
             # Act
             event = events.SessionCompleted(user_id=user_id, session_id=session_id, session_type="work")
-            schedule_nudge_on_session_completed(event)
+            await schedule_nudge_on_session_completed(event)
 
             # Assert
             mock_db_session.add.assert_called_once()
@@ -43,17 +54,16 @@ class TestNudgeHandlers:
         chat_id = 12345
         event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=1, session_type="work")
         mock_user = orm.User(id=user_id, telegram_chat_id=str(chat_id), timezone="UTC")
-        mock_db_session.query.return_value.filter_by.return_value.first.return_value = mock_user
+        mock_db_session.get.return_value = mock_user
+        mock_db_session.scalar.side_effect = [1, orm.PomodoroSession(end_time=datetime.now(timezone.utc))]
 
-        mock_db_session.query.return_value.filter.return_value.count.return_value = 1
-        mock_db_session.query.return_value.filter.return_value.order_by.return_value.first.return_value = orm.PomodoroSession(end_time=datetime.now(timezone.utc))
-
-        with patch('tomato_ai.handlers.get_session') as mock_get_session, \
-             patch('tomato_ai.handlers.negotiation_agent') as mock_agent, \
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+             patch('tomato_ai.handlers.get_negotiation_agent') as mock_get_negotiation_agent, \
              patch('tomato_ai.adapters.telegram.get_telegram_notifier') as mock_get_notifier:
 
-            mock_get_session.return_value = iter([mock_db_session])
-            mock_agent.structured_output.return_value = TelegramMessageAction(text="Test message")
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_agent = mock_get_negotiation_agent.return_value
+            mock_agent.structured_output_async = AsyncMock(return_value=TelegramMessageAction(text="Test message"))
             mock_notifier = AsyncMock()
             mock_get_notifier.return_value = mock_notifier
 
@@ -61,7 +71,7 @@ class TestNudgeHandlers:
             await handle_nudge(event)
 
             # Assert
-            mock_agent.structured_output.assert_called_once()
+            mock_agent.structured_output_async.assert_awaited_once()
             mock_notifier.send_message.assert_awaited_once_with(
                 chat_id=str(chat_id), message="Test message", reply_markup=None
             )
@@ -74,32 +84,29 @@ class TestNudgeHandlers:
         event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=1, session_type="work")
 
         mock_user = orm.User(id=user_id, telegram_chat_id=str(chat_id), timezone="UTC")
-        mock_db_session.query.return_value.filter_by.return_value.first.return_value = mock_user
-
-        mock_db_session.query.return_value.filter.return_value.count.return_value = 1
-        mock_db_session.query.return_value.filter.return_value.order_by.return_value.first.return_value = orm.PomodoroSession(
-            end_time=datetime.now(timezone.utc))
-
-        with patch('tomato_ai.handlers.get_session') as mock_get_session, \
-                patch('tomato_ai.handlers.negotiation_agent') as mock_negotiation_agent, \
-                patch('tomato_ai.handlers.get_scheduler_agent') as mock_get_scheduler_agent, \
-                patch('tomato_ai.handlers.ReminderService') as mock_reminder_service:
-            mock_get_session.return_value = iter([mock_db_session])
-            mock_negotiation_agent.structured_output.return_value = PomodoroScheduleNextAction(time="later")
+        mock_db_session.get.return_value = mock_user
+        mock_db_session.scalar.side_effect = [1, orm.PomodoroSession(end_time=datetime.now(timezone.utc))]
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+                patch('tomato_ai.handlers.get_negotiation_agent') as mock_get_negotiation_agent, \
+                patch('tomato_ai.handlers.scheduler_agents') as mock_scheduler_agents, \
+                patch('tomato_ai.handlers.ReminderService', spec=True) as mock_reminder_service:
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_get_negotiation_agent.return_value.structured_output_async = AsyncMock(
+                return_value=PomodoroScheduleNextAction(time="later")
+            )
 
-            mock_scheduler_agent = MagicMock()
             delay_container = MagicMock()
             delay_container.delay_in_minutes = 30
-            mock_scheduler_agent.structured_output.return_value = delay_container
-            mock_get_scheduler_agent.return_value = mock_scheduler_agent
+            mock_scheduler_agents.structured_output = AsyncMock(return_value=delay_container)
 
             mock_reminder_service_instance = mock_reminder_service.return_value
             # Act
             await handle_nudge(event)
 
             # Assert
-            mock_get_scheduler_agent.assert_called_once_with(str(chat_id))
-            mock_scheduler_agent.structured_output.assert_called_once()
+            mock_scheduler_agents.structured_output.assert_awaited_once()
+            assert mock_scheduler_agents.structured_output.call_args[0][0] == str(chat_id)
             mock_reminder_service_instance.schedule_reminder.assert_called_once()
 
             # Check the scheduled time
@@ -109,37 +116,98 @@ class TestNudgeHandlers:
             assert (expected_send_at - send_at).total_seconds() < 5  # Allow for small delay
 
     @pytest.mark.asyncio
-    async def test_handle_nudge_schedules_next_nudge_with_scheduler_agent_failure(self, mock_db_session):
+    async def test_handle_nudge_releases_the_database_session_before_calling_the_agent(self, mock_db_session):
+        # Arrange
+        user_id = uuid4()
+        chat_id = 12345
+        event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=1, session_type="work")
+
+        mock_db_session.get.return_value = orm.User(id=user_id, telegram_chat_id=str(chat_id), timezone="UTC")
+        mock_db_session.scalar.side_effect = [1, None]
+        open_units = []
+
+        @asynccontextmanager
+        async def unit_of_work():
+            open_units.append(True)
+            try:
+                yield mock_db_session
+            finally:
+                open_units.pop()
+
+        async def negotiate(*args):
+            assert not open_units
+            return PomodoroScheduleNextAction(time="15m")
+
+        with patch('tomato_ai.handlers.unit_of_work', unit_of_work), \
+                patch('tomato_ai.handlers.get_negotiation_agent') as mock_get_negotiation_agent, \
+                patch('tomato_ai.handlers.ReminderService', spec=True) as mock_reminder_service:
+            mock_get_negotiation_agent.return_value.structured_output_async = negotiate
+            mock_reminder_service.return_value.schedule_reminder = AsyncMock()
+
+            # Act
+            await handle_nudge(event)
+
+            # Assert
+            mock_reminder_service.return_value.schedule_reminder.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_handle_nudge_schedules_parseable_times_without_the_scheduler_agent(self, mock_db_session):
         # Arrange
         user_id = uuid4()
         chat_id = 12345
         event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=1, session_type="work")
 
         mock_user = orm.User(id=user_id, telegram_chat_id=str(chat_id), timezone="UTC")
-        mock_db_session.query.return_value.filter_by.return_value.first.return_value = mock_user
+        mock_db_session.get.return_value = mock_user
+        mock_db_session.scalar.side_effect = [1, orm.PomodoroSession(end_time=datetime.now(timezone.utc))]
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+                patch('tomato_ai.handlers.get_negotiation_agent') as mock_get_negotiation_agent, \
+                patch('tomato_ai.handlers.scheduler_agents') as mock_scheduler_agents, \
+                patch('tomato_ai.handlers.ReminderService', spec=True) as mock_reminder_service:
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_get_negotiation_agent.return_value.structured_output_async = AsyncMock(
+                return_value=PomodoroScheduleNextAction(time="1h")
+            )
+
+            # Act
+            await handle_nudge(event)
 
-        mock_db_session.query.return_value.filter.return_value.count.return_value = 1
-        mock_db_session.query.return_value.filter.return_value.order_by.return_value.first.return_value = orm.PomodoroSession(
-            end_time=datetime.now(timezone.utc))
+            # Assert
+            mock_scheduler_agents.structured_output.assert_not_called()
+            args, _ = mock_reminder_service.return_value.schedule_reminder.call_args
+            expected_send_at = datetime.now(timezone.utc) + timedelta(hours=1)
+            assert (expected_send_at - args[2]).total_seconds() < 5
 
-        with patch('tomato_ai.handlers.get_session') as mock_get_session, \
-                patch('tomato_ai.handlers.negotiation_agent') as mock_negotiation_agent, \
-                patch('tomato_ai.handlers.get_scheduler_agent') as mock_get_scheduler_agent, \
-                patch('tomato_ai.handlers.ReminderService') as mock_reminder_service:
-            mock_get_session.return_value = iter([mock_db_session])
-            mock_negotiation_agent.structured_output.return_value = PomodoroScheduleNextAction(time="later")
+    @pytest.mark.asyncio
+    async def test_handle_nudge_schedules_next_nudge_with_scheduler_agent_failure(self, mock_db_session):
+        # Arrange
+        user_id = uuid4()
+        chat_id = 12345
+        event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=1, session_type="work")
+
+        mock_user = orm.User(id=user_id, telegram_chat_id=str(chat_id), timezone="UTC")
+        mock_db_session.get.return_value = mock_user
+        mock_db_session.scalar.side_effect = [1, orm.PomodoroSession(end_time=datetime.now(timezone.utc))]
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+                patch('tomato_ai.handlers.get_negotiation_agent') as mock_get_negotiation_agent, \
+                patch('tomato_ai.handlers.scheduler_agents') as mock_scheduler_agents, \
+                patch('tomato_ai.handlers.ReminderService', spec=True) as mock_reminder_service:
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_get_negotiation_agent.return_value.structured_output_async = AsyncMock(
+                return_value=PomodoroScheduleNextAction(time="later")
+            )
 
-            mock_scheduler_agent = MagicMock()
-            mock_scheduler_agent.structured_output.side_effect = ValueError("Could not parse delay")
-            mock_get_scheduler_agent.return_value = mock_scheduler_agent
+            mock_scheduler_agents.structured_output = AsyncMock(side_effect=ValueError("Could not parse delay"))
 
             mock_reminder_service_instance = mock_reminder_service.return_value
             # Act
             await handle_nudge(event)
 
             # Assert
-            mock_get_scheduler_agent.assert_called_once_with(str(chat_id))
-            mock_scheduler_agent.structured_output.assert_called_once()
+            mock_scheduler_agents.structured_output.assert_awaited_once()
+            assert mock_scheduler_agents.structured_output.call_args[0][0] == str(chat_id)
             mock_reminder_service_instance.schedule_reminder.assert_called_once()
 
             # Check the scheduled time (should be default 15 minutes)
@@ -148,6 +216,58 @@ class TestNudgeHandlers:
             expected_send_at = datetime.now(timezone.utc) + timedelta(minutes=15)
             assert (expected_send_at - send_at).total_seconds() < 5  # Allow for small delay
 
+    @pytest.mark.asyncio
+    async def test_handle_nudge_decides_obvious_cases_without_the_agent(self, mock_db_session):
+        # Arrange
+        user_id = uuid4()
+        chat_id = 12345
+        event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=1, session_type="work")
+        mock_user = orm.User(
+            id=user_id, telegram_chat_id=str(chat_id), timezone="UTC",
+            work_start=time(0, 0), work_end=time(0, 0), desired_sessions_per_day=1,
+        )
+        mock_db_session.get.return_value = mock_user
+        mock_db_session.scalar.side_effect = [1, orm.PomodoroSession(end_time=datetime.now(timezone.utc))]
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+                patch('tomato_ai.handlers.get_negotiation_agent') as mock_get_negotiation_agent, \
+                patch('tomato_ai.handlers.scheduler_agents') as mock_scheduler_agents, \
+                patch('tomato_ai.handlers.ReminderService', spec=True) as mock_reminder_service:
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+
+            # Act
+            await handle_nudge(event)
+
+            # Assert: the goal is met and the working day is over, so the next nudge waits for tomorrow
+            mock_get_negotiation_agent.assert_not_called()
+            mock_scheduler_agents.structured_output.assert_not_called()
+            args, _ = mock_reminder_service.return_value.schedule_reminder.call_args
+            tomorrow = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            assert abs((args[2] - tomorrow).total_seconds()) <= 60
+
+    @pytest.mark.asyncio
+    async def test_handle_nudge_fallback_sends_a_static_nudge(self, mock_db_session):
+        # Arrange
+        user_id = uuid4()
+        event = events.NudgeUser(user_id=user_id, chat_id=12345, escalation_count=1, session_type="work")
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+             patch('tomato_ai.handlers.ReminderService', spec=True) as mock_reminder_service, \
+             patch('tomato_ai.adapters.telegram.get_telegram_notifier') as mock_get_notifier:
+
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_notifier = AsyncMock()
+            mock_get_notifier.return_value = mock_notifier
+
+            # Act
+            await handle_nudge_fallback(event)
+
+            # Assert
+            mock_notifier.send_message.assert_awaited_once()
+            assert mock_notifier.send_message.call_args.kwargs["chat_id"] == "12345"
+            mock_reminder_service.return_value.schedule_reminder.assert_awaited_once()
+            assert mock_reminder_service.return_value.schedule_reminder.call_args.kwargs["escalation_count"] == 2
+
     @pytest.mark.asyncio
     async def test_handle_nudge_max_escalations(self, mock_db_session):
         # Arrange
@@ -155,10 +275,10 @@ class TestNudgeHandlers:
         chat_id = 12345
         event = events.NudgeUser(user_id=user_id, chat_id=chat_id, escalation_count=settings.MAX_ESCALATIONS, session_type="work")
 
-        with patch('tomato_ai.handlers.get_session') as mock_get_session, \
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
              patch('tomato_ai.adapters.telegram.get_telegram_notifier') as mock_get_notifier:
 
-            mock_get_session.return_value = iter([mock_db_session])
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
             mock_notifier = AsyncMock()
             mock_get_notifier.return_value = mock_notifier
 
@@ -181,8 +301,8 @@ class TestNudgeHandlers:
 
     @pytest.mark.asyncio
     async def test_not_now_button(self, mock_db_session):
-        with patch('tomato_ai.handlers.get_session') as mock_get_session:
-            mock_get_session.return_value = iter([mock_db_session])
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work:
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
             update = AsyncMock()
             update.callback_query.from_user.id = 12345
             update.callback_query.message.chat_id = 12345
@@ -192,3 +312,101 @@ class TestNudgeHandlers:
             added_reminder = mock_db_session.add.call_args[0][0]
             assert isinstance(added_reminder, orm.Reminder)
             assert added_reminder.escalation_count == 1
+
+
+class TestSessionEndNotification:
+    @pytest.mark.asyncio
+    async def test_sends_one_message_for_a_completed_and_expired_session(self, mock_db_session):
+        # Arrange
+        user_id = uuid4()
+        mock_db_session.get.return_value = orm.User(id=user_id, telegram_chat_id="12345")
+        event = events.SessionEnded(session_id=uuid4(), user_id=user_id, session_type="work", expired=True)
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+             patch('tomato_ai.handlers.notification_agents') as mock_notification_agents, \
+             patch('tomato_ai.adapters.telegram.get_telegram_notifier') as mock_get_notifier:
+
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_notification_agents.invoke = AsyncMock(return_value="Well done!")
+            mock_notifier = AsyncMock()
+            mock_get_notifier.return_value = mock_notifier
+
+            # Act
+            await send_session_end_notification(event)
+
+            # Assert
+            mock_db_session.get.assert_awaited_once_with(orm.User, user_id)
+            mock_notification_agents.invoke.assert_awaited_once()
+            chat_id, prompt = mock_notification_agents.invoke.call_args[0]
+            assert chat_id == "12345"
+            assert "ran out" in prompt
+            mock_notifier.send_message.assert_awaited_once_with(chat_id="12345", message="Well done!")
+
+    @pytest.mark.asyncio
+    async def test_serves_pooled_messages_without_calling_the_agent(self, mock_db_session):
+        # Arrange
+        user_id = uuid4()
+        mock_db_session.get.return_value = orm.User(id=user_id, telegram_chat_id="12345")
+        event = events.SessionEnded(session_id=uuid4(), user_id=user_id, session_type="work", expired=False)
+
+        with patch('tomato_ai.handlers.unit_of_work') as mock_unit_of_work, \
+             patch('tomato_ai.handlers.notification_agents') as mock_notification_agents, \
+             patch('tomato_ai.handlers.message_pool') as mock_message_pool, \
+             patch('tomato_ai.adapters.telegram.get_telegram_notifier') as mock_get_notifier:
+
+            mock_unit_of_work.return_value.__aenter__.return_value = mock_db_session
+            mock_notification_agents.invoke = AsyncMock()
+            mock_message_pool.get.return_value = "Pooled!"
+            mock_notifier = AsyncMock()
+            mock_get_notifier.return_value = mock_notifier
+
+            # Act
+            await send_session_end_notification(event)
+
+            # Assert
+            mock_message_pool.get.assert_called_once_with("completed", "work")
+            mock_notification_agents.invoke.assert_not_awaited()
+            mock_notifier.send_message.assert_awaited_once_with(chat_id="12345", message="Pooled!")
+
+
+class TestParseTime:
+    @pytest.mark.parametrize("time_str, expected", [
+        ("15m", timedelta(minutes=15)),
+        (" 2H ", timedelta(hours=2)),
+        ("tomorrow", timedelta(days=1)),
+    ])
+    def test_parses_supported_formats(self, time_str, expected):
+        assert parse_time(time_str) == expected
+
+    @pytest.mark.parametrize("time_str", ["later", "1.5h", "soonm", "", None])
+    def test_returns_none_for_anything_else(self, time_str):
+        assert parse_time(time_str) is None
+
+
+class TestRunAgent:
+    @pytest.mark.asyncio
+    async def test_cancels_generations_that_run_past_the_timeout(self):
+        # Arrange
+        cancelled = asyncio.Event()
+
+        async def generate(prompt):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        # Act & Assert
+        with patch.object(settings, "LLM_CALL_TIMEOUT_SECONDS", 0.01), pytest.raises(TimeoutError):
+            await run_agent(generate, "Hi")
+        assert cancelled.is_set()
+
+    @pytest.mark.asyncio
+    async def test_fails_fast_while_the_circuit_is_open(self):
+        # Arrange
+        generate = AsyncMock()
+
+        # Act & Assert
+        with patch("tomato_ai.handlers.llm_circuit.allow", return_value=False), pytest.raises(CircuitOpenError):
+            await run_agent(generate, "Hi")
+        generate.assert_not_called()
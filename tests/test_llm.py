@@ -0,0 +1,75 @@
+import asyncio
+from unittest.mock import patch
+
+import ollama
+import pytest
+from strands.models.ollama import OllamaModel
+
+from tomato_ai.adapters.llm import PooledOllamaModel
+
+
+@pytest.fixture
+def model():
+    return PooledOllamaModel(host="http://localhost:11434", model_id="test-model", max_in_flight=1)
+
+
+class TestPooledOllamaModel:
+    def test_clients_share_the_pooled_transport(self, model):
+        # Arrange
+        first = ollama.AsyncClient(model.host, **model.client_args)
+        second = ollama.AsyncClient(model.host, **model.client_args)
+
+        # Act & Assert
+        assert first._client._transport is model.transport
+        assert second._client._transport is model.transport
+
+    @pytest.mark.asyncio
+    async def test_caps_requests_in_flight_and_records_queueing(self, model):
+        # Arrange
+        release = asyncio.Event()
+        peak = []
+
+        async def stream(self, *args, **kwargs):
+            peak.append(model.in_flight)
+            await release.wait()
+            yield {"chunk": "done"}
+
+        async def consume():
+            return [event async for event in model.stream([])]
+
+        with patch.object(OllamaModel, "stream", stream):
+            first = asyncio.create_task(consume())
+            second = asyncio.create_task(consume())
+            await asyncio.sleep(0.01)
+            queued = model.stats()["queued"]
+
+            # Act
+            release.set()
+            await asyncio.gather(first, second)
+
+        # Assert
+        assert queued == 1
+        assert max(peak) == 1
+        stats = model.stats()
+        assert stats["requests"] == 2
+        assert stats["in_flight"] == 0
+        assert stats["max_wait_seconds"] > 0
+
+    @pytest.mark.asyncio
+    async def test_releases_the_slot_when_a_request_is_cancelled(self, model):
+        # Arrange
+        async def stream(self, *args, **kwargs):
+            await asyncio.Event().wait()
+            yield {}
+
+        async def consume():
+            return [event async for event in model.stream([])]
+
+        with patch.object(OllamaModel, "stream", stream):
+            # Act
+            with pytest.raises(TimeoutError):
+                await asyncio.wait_for(consume(), timeout=0.01)
+
+        # Assert
+        assert model.stats()["in_flight"] == 0
+        assert not model._slots.locked()
@@ -0,0 +1,46 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from tomato_ai.message_pool import COMPLETED, EXPIRED, PROMPTS, SESSION_TYPES, STARTED, MessagePool, prompt_for
+
+
+@pytest.mark.asyncio
+class TestMessagePool:
+    async def test_is_empty_until_refreshed(self):
+        # Arrange
+        pool = MessagePool(AsyncMock(return_value=["Nice!"]), size=3)
+
+        # Act
+        message = pool.get(STARTED, "work")
+
+        # Assert
+        assert message is None
+        assert pool.stats() == {"keys": 0, "served": 0, "misses": 1}
+
+    async def test_refresh_generates_every_kind_and_session_type(self):
+        # Arrange
+        generate = AsyncMock(return_value=[" Nice! ", "", "Well done!", "Great!", "Extra"])
+        pool = MessagePool(generate, size=3)
+
+        # Act
+        await pool.refresh()
+
+        # Assert
+        assert generate.await_count == len(PROMPTS) * len(SESSION_TYPES)
+        generate.assert_any_await(prompt_for(EXPIRED, "long_break"), 3)
+        assert pool.get(COMPLETED, "short_break") in {"Nice!", "Well done!", "Great!"}
+        assert pool.stats()["served"] == 1
+
+    async def test_keeps_old_variants_when_a_refresh_fails(self):
+        # Arrange
+        generate = AsyncMock(return_value=["Nice!"])
+        pool = MessagePool(generate, size=3)
+        await pool.refresh()
+        generate.side_effect = RuntimeError("LLM is down")
+
+        # Act
+        await pool.refresh()
+
+        # Assert
+        assert pool.get(STARTED, "work") == "Nice!"
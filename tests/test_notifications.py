@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from tomato_ai.adapters import notifications
+from tomato_ai.adapters.notifications import Listener
+
+
+def make_db_session(dialect: str):
+    db_session = MagicMock(spec=AsyncSession)
+    db_session.bind.dialect.name = dialect
+    return db_session
+
+
+@pytest.mark.asyncio
+class TestNotify:
+    async def test_emits_pg_notify_on_postgres(self):
+        db_session = make_db_session("postgresql")
+
+        await notifications.notify(db_session, notifications.REMINDERS_CHANNEL, "payload")
+
+        db_session.execute.assert_awaited_once()
+        assert "pg_notify" in str(db_session.execute.await_args.args[0])
+
+    async def test_is_a_noop_on_sqlite(self):
+        db_session = make_db_session("sqlite")
+
+        await notifications.notify(db_session, notifications.REMINDERS_CHANNEL, "payload")
+
+        db_session.execute.assert_not_awaited()
+
+
+class TestListener:
+    def test_hands_payloads_to_the_callback(self):
+        received = []
+        listener = Listener(notifications.REMINDERS_CHANNEL, received.append)
+        send_at = datetime.now(timezone.utc) + timedelta(minutes=3)
+
+        listener._on_notification(None, 1, notifications.REMINDERS_CHANNEL, send_at.isoformat())
+
+        assert received == [send_at.isoformat()]
+
+    def test_callback_errors_do_not_escape(self):
+        listener = Listener(notifications.REMINDERS_CHANNEL, MagicMock(side_effect=ValueError("bad payload")))
+
+        listener._on_notification(None, 1, notifications.REMINDERS_CHANNEL, "not a date")
+
+
+def make_engine(*connections):
+    engine = MagicMock()
+    engine.dialect.name = "postgresql"
+    engine.connect = AsyncMock(side_effect=connections)
+    return engine
+
+
+def make_connection():
+    connection = AsyncMock()
+    driver_connection = MagicMock()
+    driver_connection.add_listener = AsyncMock()
+    driver_connection.remove_listener = AsyncMock()
+    connection.get_raw_connection.return_value.driver_connection = driver_connection
+    return connection, driver_connection
+
+
+@pytest.mark.asyncio
+class TestListenerReconnect:
+    async def test_listens_again_when_the_connection_is_lost(self, caplog):
+        first, first_driver = make_connection()
+        second, second_driver = make_connection()
+        listener = Listener(notifications.REMINDERS_CHANNEL, MagicMock())
+
+        with patch("tomato_ai.adapters.notifications.get_async_engine", return_value=make_engine(first, second)):
+            await listener.start()
+            on_terminated = first_driver.add_termination_listener.call_args.args[0]
+            on_terminated(first_driver)
+            await listener._reconnecting
+
+            second_driver.add_listener.assert_awaited_once_with(notifications.REMINDERS_CHANNEL, listener._on_notification)
+            second_driver.add_termination_listener.assert_called_once_with(listener._on_terminated)
+            first.invalidate.assert_awaited_once()
+            assert listener._connection is second
+            assert "Lost the connection" in caplog.text
+
+            await listener.stop()
+        second_driver.remove_listener.assert_awaited_once()
+        second.close.assert_awaited_once()
+
+    async def test_retries_until_the_database_is_back(self):
+        first, first_driver = make_connection()
+        second, second_driver = make_connection()
+        engine = make_engine(first, OSError("connection refused"), second)
+        listener = Listener(notifications.REMINDERS_CHANNEL, MagicMock())
+
+        with patch("tomato_ai.adapters.notifications.get_async_engine", return_value=engine), \
+                patch("tomato_ai.adapters.notifications.asyncio.sleep", AsyncMock()) as mock_sleep:
+            await listener.start()
+            listener._on_terminated(first_driver)
+            await listener._reconnecting
+
+        mock_sleep.assert_awaited_once_with(1.0)
+        second_driver.add_listener.assert_awaited_once()
+        assert listener._connection is second
+
+    async def test_does_not_reconnect_once_stopped(self):
+        first, first_driver = make_connection()
+        engine = make_engine(first)
+        listener = Listener(notifications.REMINDERS_CHANNEL, MagicMock())
+
+        with patch("tomato_ai.adapters.notifications.get_async_engine", return_value=engine):
+            await listener.start()
+            await listener.stop()
+            listener._on_terminated(first_driver)
+
+        assert listener._reconnecting is None
+        assert engine.connect.await_count == 1
+
+    async def test_stop_cancels_a_pending_reconnect(self):
+        first, first_driver = make_connection()
+        engine = make_engine(first)
+        engine.connect.side_effect = [first] + [OSError("connection refused")] * 10
+        listener = Listener(notifications.REMINDERS_CHANNEL, MagicMock())
+
+        with patch("tomato_ai.adapters.notifications.get_async_engine", return_value=engine):
+            await listener.start()
+            listener._on_terminated(first_driver)
+            await asyncio.sleep(0)
+            await listener.stop()
+
+        assert listener._reconnecting is None
+        assert listener._connection is None
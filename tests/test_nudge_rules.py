@@ -0,0 +1,79 @@
+from datetime import datetime, time, timezone
+
+from tomato_ai.domain.agent_actions import AgentAction
+from tomato_ai.domain.nudge_rules import (
+    LLM, NudgeContext, NudgeDecisionEngine, before_work, done_for_the_day, first_nudge_of_the_morning
+)
+
+
+def make_context(hour: int, minute: int = 0, sessions_today: int = 0, escalation_count: int = 1) -> NudgeContext:
+    return NudgeContext(
+        now=datetime(2025, 8, 20, hour, minute, tzinfo=timezone.utc),
+        work_start=time(9, 0),
+        work_end=time(17, 0),
+        sessions_today=sessions_today,
+        desired_sessions=8,
+        escalation_count=escalation_count,
+    )
+
+
+class TestNudgeRules:
+    def test_before_work_waits_for_the_work_start(self):
+        action = before_work(make_context(7, 30))
+        assert action.action == "pomodoro_schedule_next"
+        assert action.time == "90m"
+
+    def test_before_work_ignores_working_hours(self):
+        assert before_work(make_context(10)) is None
+
+    def test_done_for_the_day_waits_for_tomorrows_work_start(self):
+        action = done_for_the_day(make_context(18, sessions_today=8))
+        assert action.action == "pomodoro_schedule_next"
+        assert action.time == f"{15 * 60}m"
+
+    def test_done_for_the_day_leaves_an_unmet_goal_to_the_agent(self):
+        assert done_for_the_day(make_context(18, sessions_today=3)) is None
+
+    def test_first_nudge_of_the_morning_invites_the_user_to_start(self):
+        action = first_nudge_of_the_morning(make_context(9, 30))
+        assert action.action == "telegram_message"
+        assert action.buttons == ["Start", "Not now"]
+
+    def test_first_nudge_of_the_morning_leaves_escalations_to_the_agent(self):
+        assert first_nudge_of_the_morning(make_context(9, 30, escalation_count=2)) is None
+        assert first_nudge_of_the_morning(make_context(13)) is None
+
+    def test_rules_skip_users_without_working_hours(self):
+        context = NudgeContext(
+            now=datetime(2025, 8, 20, 7, tzinfo=timezone.utc), work_start=None, work_end=None,
+            sessions_today=0, desired_sessions=None, escalation_count=1,
+        )
+        assert NudgeDecisionEngine().decide(context) is None
+
+
+class TestNudgeDecisionEngine:
+    def test_counts_the_path_each_decision_takes(self):
+        # Arrange
+        engine = NudgeDecisionEngine()
+
+        # Act
+        engine.decide(make_context(7))
+        engine.decide(make_context(9, 15))
+        engine.decide(make_context(14, sessions_today=3, escalation_count=2))
+
+        # Assert
+        assert engine.stats() == {"before_work": 1, "first_nudge_of_the_morning": 1, LLM: 1}
+
+    def test_accepts_custom_rules(self):
+        # Arrange
+        def always_start(context):
+            return AgentAction(action="pomodoro_start", duration=25)
+
+        engine = NudgeDecisionEngine(rules=[always_start])
+
+        # Act
+        action = engine.decide(make_context(14))
+
+        # Assert
+        assert action.action == "pomodoro_start"
+        assert engine.stats() == {"always_start": 1}
@@ -0,0 +1,212 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from tomato_ai.adapters import orm, outbox
+from tomato_ai.config import settings
+from tomato_ai.domain import events
+
+
+@pytest.fixture
+def outbox_enabled():
+    with patch.object(settings, "EVENT_OUTBOX_ENABLED", True):
+        yield
+
+
+@pytest.fixture
+def outbox_unit_of_work(db_session):
+    @asynccontextmanager
+    async def unit_of_work():
+        yield db_session
+        await db_session.commit()
+
+    with patch("tomato_ai.adapters.outbox.unit_of_work", unit_of_work):
+        yield
+
+
+def make_event() -> events.SessionCompleted:
+    return events.SessionCompleted(session_id=uuid4(), user_id=uuid4(), session_type="work")
+
+
+class TestSerialization:
+    def test_round_trips_events(self):
+        event = events.NudgeUser(user_id=uuid4(), chat_id=12345, escalation_count=2, session_type="long_break")
+
+        assert outbox.deserialize("NudgeUser", outbox.serialize(event)) == event
+
+
+@pytest.mark.asyncio
+class TestOutbox:
+    async def test_stage_returns_events_for_inline_publishing_when_disabled(self, db_session):
+        event = make_event()
+
+        pending = await outbox.stage(db_session, [event])
+
+        assert pending == [event]
+        assert not db_session.new
+
+    async def test_stage_writes_events_in_the_transaction_when_enabled(self, db_session, outbox_enabled):
+        event = make_event()
+
+        pending = await outbox.stage(db_session, [event])
+        await db_session.commit()
+
+        assert pending == []
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        assert row.event_type == "SessionCompleted"
+        assert outbox.deserialize(row.event_type, row.payload) == event
+
+    @patch("tomato_ai.adapters.outbox.event_bus.publish")
+    async def test_drain_once_publishes_and_marks_processed(
+        self, mock_publish, db_session, outbox_enabled, outbox_unit_of_work
+    ):
+        # Arrange
+        event = make_event()
+        await outbox.stage(db_session, [event])
+        await db_session.commit()
+
+        # Act
+        claimed = await outbox.drain_once("worker-1")
+
+        # Assert
+        assert claimed == 1
+        mock_publish.assert_awaited_once_with(event)
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        await db_session.refresh(row)
+        assert row.processed_at is not None
+        assert row.claimed_by == "worker-1"
+        assert await outbox.drain_once("worker-1") == 0
+
+    @patch("tomato_ai.adapters.outbox.event_bus.publish")
+    async def test_failed_events_stay_leased_until_retry(
+        self, mock_publish, db_session, outbox_enabled, outbox_unit_of_work
+    ):
+        # Arrange
+        await outbox.stage(db_session, [make_event()])
+        await db_session.commit()
+        mock_publish.side_effect = RuntimeError("Telegram down")
+
+        # Act
+        claimed = await outbox.drain_once("worker-1")
+
+        # Assert
+        assert claimed == 1
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        await db_session.refresh(row)
+        assert row.processed_at is None
+        assert row.attempts == 1
+        # Another worker can't take the event until the lease expires
+        assert await outbox.drain_once("worker-2") == 0
+
+    async def test_renew_lease_extends_only_the_workers_own_claims(
+        self, db_session, outbox_enabled, outbox_unit_of_work
+    ):
+        # Arrange
+        await outbox.stage(db_session, [make_event(), make_event()])
+        await db_session.commit()
+        mine, theirs = await outbox.claim_batch(db_session, "worker-1", 2)
+        for row in (mine, theirs):
+            await db_session.refresh(row)
+        theirs.claimed_by = "worker-2"
+        await db_session.commit()
+        leased_until = {row.id: row.claimed_until for row in (mine, theirs)}
+
+        # Act
+        with patch.object(settings, "OUTBOX_LEASE_SECONDS", settings.OUTBOX_LEASE_SECONDS * 2):
+            await outbox.renew_lease("worker-1", [mine.id, theirs.id])
+
+        # Assert
+        await db_session.refresh(mine)
+        await db_session.refresh(theirs)
+        assert mine.claimed_until > leased_until[mine.id]
+        assert theirs.claimed_until == leased_until[theirs.id]
+
+    @patch("tomato_ai.adapters.outbox.renew_lease", new_callable=AsyncMock)
+    @patch("tomato_ai.adapters.outbox.event_bus.publish")
+    async def test_drain_once_renews_the_lease_while_events_are_delivered(
+        self, mock_publish, mock_renew_lease, db_session, outbox_enabled, outbox_unit_of_work
+    ):
+        # Arrange
+        await outbox.stage(db_session, [make_event()])
+        await db_session.commit()
+
+        async def slow_publish(event):
+            await asyncio.sleep(0.05)
+
+        mock_publish.side_effect = slow_publish
+
+        # Act
+        with patch.object(settings, "OUTBOX_LEASE_SECONDS", 0.03):
+            await outbox.drain_once("worker-1")
+
+        # Assert
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        mock_renew_lease.assert_awaited_with("worker-1", {row.id})
+
+    @patch("tomato_ai.adapters.outbox.event_bus.publish")
+    async def test_dead_letters_events_that_fail_their_last_attempt(
+        self, mock_publish, db_session, outbox_enabled, outbox_unit_of_work, caplog
+    ):
+        # Arrange
+        await outbox.stage(db_session, [make_event()])
+        await db_session.commit()
+        mock_publish.side_effect = RuntimeError("Telegram down")
+
+        # Act
+        with patch.object(settings, "OUTBOX_MAX_ATTEMPTS", 1):
+            await outbox.drain_once("worker-1")
+
+        # Assert
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        await db_session.refresh(row)
+        assert row.dead_lettered_at is not None
+        assert row.processed_at is None
+        assert any(r.levelname == "ERROR" and "dead-lettering" in r.message for r in caplog.records)
+
+    async def test_dead_letters_events_whose_last_lease_expired(
+        self, db_session, outbox_enabled, outbox_unit_of_work, caplog
+    ):
+        # Arrange: the worker crashed during the last attempt
+        await outbox.stage(db_session, [make_event()])
+        await db_session.commit()
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        row.attempts = settings.OUTBOX_MAX_ATTEMPTS
+        await db_session.commit()
+
+        # Act
+        claimed = await outbox.claim_batch(db_session, "worker-1", 10)
+
+        # Assert
+        assert claimed == []
+        await db_session.refresh(row)
+        assert row.dead_lettered_at is not None
+        assert "Dead-lettering 1 outbox events" in caplog.text
+
+    @patch("tomato_ai.adapters.outbox.event_bus.publish")
+    async def test_replays_dead_lettered_events(
+        self, mock_publish, db_session, outbox_enabled, outbox_unit_of_work
+    ):
+        # Arrange
+        event = make_event()
+        await outbox.stage(db_session, [event])
+        await db_session.commit()
+        mock_publish.side_effect = RuntimeError("Telegram down")
+        with patch.object(settings, "OUTBOX_MAX_ATTEMPTS", 1):
+            await outbox.drain_once("worker-1")
+        mock_publish.side_effect = None
+
+        # Act
+        replayed = await outbox.replay_dead_letters()
+
+        # Assert
+        assert replayed == 1
+        row = await db_session.scalar(select(orm.OutboxEvent))
+        await db_session.refresh(row)
+        assert row.dead_lettered_at is None
+        assert row.attempts == 0
+        assert await outbox.drain_once("worker-1") == 1
+        mock_publish.assert_awaited_with(event)
@@ -1,100 +1,242 @@
+import asyncio
 import pytest
 from unittest.mock import MagicMock, AsyncMock, patch
 from uuid import uuid4
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from tomato_ai.domain.services import ReminderService, ReminderNotifier
 from tomato_ai.adapters import orm
 
 @pytest.fixture
 def mock_db_session():
-    return MagicMock(spec=Session)
+    return MagicMock(spec=AsyncSession)
 
+@pytest.mark.asyncio
 class TestReminderService:
-    def test_schedule_reminder(self, mock_db_session):
+    @patch('tomato_ai.domain.services.deadlines.schedule')
+    async def test_schedule_reminder(self, mock_schedule, db_session):
         # Arrange
-        service = ReminderService(db_session=mock_db_session)
+        service = ReminderService(db_session=db_session)
         user_id = uuid4()
         chat_id = 12345
         send_at = datetime.now(timezone.utc) + timedelta(minutes=5)
 
         # Act
-        service.schedule_reminder(user_id, chat_id, send_at)
+        await service.schedule_reminder(user_id, chat_id, send_at)
 
         # Assert
-        mock_db_session.add.assert_called_once()
-        added_reminder = mock_db_session.add.call_args[0][0]
+        [added_reminder] = db_session.new
         assert isinstance(added_reminder, orm.Reminder)
         assert added_reminder.user_id == user_id
         assert added_reminder.chat_id == chat_id
         assert added_reminder.send_at == send_at
-        mock_db_session.commit.assert_called_once()
+        mock_schedule.assert_not_called()
 
-    def test_cancel_reminder(self, mock_db_session):
+    @patch('tomato_ai.domain.services.deadlines.schedule')
+    async def test_schedule_reminder_arms_the_deadline_once_committed(self, mock_schedule, db_session):
+        # Arrange
+        send_at = datetime.now(timezone.utc)
+        await ReminderService(db_session=db_session).schedule_reminder(uuid4(), 12345, send_at)
+
+        # Act
+        await db_session.commit()
+
+        # Assert
+        mock_schedule.assert_called_once_with("reminder", send_at)
+
+    async def test_cancel_reminder(self, mock_db_session):
         # Arrange
         service = ReminderService(db_session=mock_db_session)
         user_id = uuid4()
         reminder = orm.Reminder(id=uuid4(), user_id=user_id, state='pending')
-        mock_db_session.query.return_value.filter_by.return_value.all.return_value = [reminder]
+        mock_db_session.scalars.return_value = [reminder]
 
         # Act
-        service.cancel_reminder(user_id)
+        await service.cancel_reminder(user_id)
 
         # Assert
         assert reminder.state == 'cancelled'
         mock_db_session.add.assert_called_once_with(reminder)
-        mock_db_session.commit.assert_called_once()
+        mock_db_session.commit.assert_not_called()
+
+def make_reminder(user_id, send_at: datetime) -> orm.Reminder:
+    return orm.Reminder(id=uuid4(), user_id=user_id, chat_id=12345, state='pending', send_at=send_at)
+
+
+def make_session(user_id, state: str, session_type: str = "work", end_time: datetime | None = None) -> orm.PomodoroSession:
+    return orm.PomodoroSession(
+        session_id=uuid4(),
+        user_id=user_id,
+        chat_id=12345,
+        state=state,
+        session_type=session_type,
+        end_time=end_time,
+        duration=timedelta(minutes=25),
+    )
+
 
 @pytest.mark.asyncio
 class TestReminderNotifier:
     @patch('tomato_ai.domain.services.event_bus.publish')
-    async def test_check_and_send_reminders_publishes_nudge_event(self, mock_publish, mock_db_session):
+    async def test_check_and_send_reminders_publishes_nudge_event(self, mock_publish, db_session):
         # Arrange
-        notifier = ReminderNotifier(db_session=mock_db_session)
+        notifier = ReminderNotifier(db_session=db_session)
         user_id = uuid4()
-        reminder = orm.Reminder(
-            id=uuid4(),
-            user_id=user_id,
-            chat_id=12345,
-            state='pending',
-            send_at=datetime.now(timezone.utc) - timedelta(minutes=5)
-        )
-        mock_db_session.query.return_value.filter.return_value.all.return_value = [reminder]
-        mock_db_session.query.return_value.filter_by.return_value.first.return_value = None  # No active session
+        reminder = make_reminder(user_id, datetime.now(timezone.utc) - timedelta(minutes=5))
+        db_session.add(reminder)
+        await db_session.commit()
 
         # Act
         await notifier.check_and_send_reminders()
 
         # Assert
         mock_publish.assert_awaited_once()
+        nudge = mock_publish.await_args.args[0]
+        assert nudge.user_id == user_id
+        assert nudge.session_type == "work"
+        await db_session.refresh(reminder)
         assert reminder.state == 'triggered'
-        mock_db_session.add.assert_called_once_with(reminder)
-        mock_db_session.commit.assert_called_once()
+        assert reminder.triggered_at is not None
 
     @patch('tomato_ai.domain.services.event_bus.publish')
     async def test_check_and_send_reminders_does_not_publish_if_active_session(
-        self, mock_publish, mock_db_session
+        self, mock_publish, db_session
     ):
         # Arrange
-        notifier = ReminderNotifier(db_session=mock_db_session)
+        notifier = ReminderNotifier(db_session=db_session)
         user_id = uuid4()
-        reminder = orm.Reminder(
-            id=uuid4(),
-            user_id=user_id,
-            chat_id=12345,
-            state='pending',
-            send_at=datetime.now(timezone.utc) - timedelta(minutes=5)
-        )
-        mock_db_session.query.return_value.filter.return_value.all.return_value = [reminder]
-        mock_db_session.query.return_value.filter_by.return_value.first.return_value = orm.PomodoroSession() # Active session
+        reminder = make_reminder(user_id, datetime.now(timezone.utc) - timedelta(minutes=5))
+        db_session.add_all([reminder, make_session(user_id, "active")])
+        await db_session.commit()
 
         # Act
         await notifier.check_and_send_reminders()
 
         # Assert
         mock_publish.assert_not_awaited()
+        await db_session.refresh(reminder)
         assert reminder.state == 'triggered'
-        mock_db_session.add.assert_called_once_with(reminder)
-        mock_db_session.commit.assert_called_once()
+
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_check_and_send_reminders_uses_last_completed_session_type(self, mock_publish, db_session):
+        # Arrange
+        notifier = ReminderNotifier(db_session=db_session)
+        user_id = uuid4()
+        now = datetime.now(timezone.utc)
+        not_due = make_reminder(user_id, now + timedelta(minutes=5))
+        db_session.add_all([
+            make_reminder(user_id, now - timedelta(minutes=5)),
+            not_due,
+            make_session(user_id, "completed", "work", end_time=now - timedelta(hours=1)),
+            make_session(user_id, "completed", "long_break", end_time=now - timedelta(minutes=10)),
+        ])
+        await db_session.commit()
+
+        # Act
+        await notifier.check_and_send_reminders()
+
+        # Assert
+        mock_publish.assert_awaited_once()
+        assert mock_publish.await_args.args[0].session_type == "long_break"
+        await db_session.refresh(not_due)
+        assert not_due.state == 'pending'
+
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_check_and_send_reminders_claims_in_batches(self, mock_publish, db_session):
+        # Arrange
+        notifier = ReminderNotifier(db_session=db_session, batch_size=2)
+        send_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db_session.add_all([make_reminder(uuid4(), send_at) for _ in range(5)])
+        await db_session.commit()
+
+        # Act
+        await notifier.check_and_send_reminders()
+
+        # Assert
+        assert mock_publish.await_count == 5
+        pending = (await db_session.scalars(select(orm.Reminder).filter_by(state='pending'))).all()
+        assert pending == []
+
+    async def test_check_and_send_reminders_bounds_concurrency(self, db_session):
+        # Arrange
+        notifier = ReminderNotifier(db_session=db_session, concurrency=2)
+        send_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db_session.add_all([make_reminder(uuid4(), send_at) for _ in range(6)])
+        await db_session.commit()
+        in_flight, max_in_flight = 0, 0
+
+        async def publish(event):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        # Act
+        with patch('tomato_ai.domain.services.event_bus.publish', side_effect=publish) as mock_publish:
+            await notifier.check_and_send_reminders()
+
+        # Assert
+        assert mock_publish.await_count == 6
+        assert max_in_flight == 2
+
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_check_and_send_reminders_isolates_failures(self, mock_publish, db_session):
+        # Arrange
+        notifier = ReminderNotifier(db_session=db_session)
+        send_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db_session.add_all([make_reminder(uuid4(), send_at) for _ in range(3)])
+        await db_session.commit()
+        mock_publish.side_effect = [RuntimeError("LLM down"), None, None]
+
+        # Act
+        await notifier.check_and_send_reminders()
+
+        # Assert
+        assert mock_publish.await_count == 3
+        pending = (await db_session.scalars(select(orm.Reminder).filter_by(state='pending'))).all()
+        assert pending == []
+
+    @patch('tomato_ai.domain.services.deadlines.schedule')
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_check_and_send_reminders_rolls_over_when_budget_is_spent(
+        self, mock_publish, mock_schedule, db_session
+    ):
+        # Arrange
+        notifier = ReminderNotifier(db_session=db_session, batch_size=2, tick_budget=0)
+        send_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db_session.add_all([make_reminder(uuid4(), send_at) for _ in range(5)])
+        await db_session.commit()
+
+        # Act
+        await notifier.check_and_send_reminders()
+
+        # Assert
+        assert mock_publish.await_count == 2
+        pending = (await db_session.scalars(select(orm.Reminder).filter_by(state='pending'))).all()
+        assert len(pending) == 3
+        mock_schedule.assert_called_once()
+
+    @patch('tomato_ai.domain.services.deadlines.schedule')
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_check_and_send_reminders_releases_unstarted_nudges_when_budget_is_spent(
+        self, mock_publish, mock_schedule, db_session
+    ):
+        # Arrange
+        notifier = ReminderNotifier(db_session=db_session, batch_size=5, concurrency=2, tick_budget=0)
+        send_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db_session.add_all([make_reminder(uuid4(), send_at) for _ in range(5)])
+        await db_session.commit()
+
+        # Act
+        await notifier.check_and_send_reminders()
+
+        # Assert
+        assert mock_publish.await_count == 2
+        pending = (await db_session.scalars(select(orm.Reminder).filter_by(state='pending'))).all()
+        assert len(pending) == 3
+        assert all(reminder.triggered_at is None for reminder in pending)
+        mock_schedule.assert_called_once()
@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from tomato_ai.adapters.resilience import CircuitBreaker, CircuitOpenError
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+
+        # Act
+        breaker.record_failure()
+        still_closed = breaker.allow()
+        breaker.record_failure()
+
+        # Assert
+        assert still_closed
+        assert breaker.state == "open"
+        assert not breaker.allow()
+
+    def test_success_resets_the_failure_count(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+
+        # Act
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        # Assert
+        assert breaker.state == "closed"
+
+    def test_lets_one_trial_call_through_after_the_reset_timeout(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+        with patch("tomato_ai.adapters.resilience.time.monotonic", return_value=0):
+            breaker.record_failure()
+
+        with patch("tomato_ai.adapters.resilience.time.monotonic", return_value=61):
+            # Act
+            first, second = breaker.allow(), breaker.allow()
+            breaker.record_success()
+
+        # Assert
+        assert (first, second) == (True, False)
+        assert breaker.state == "closed"
+
+    def test_failed_trial_reopens_the_circuit(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+        with patch("tomato_ai.adapters.resilience.time.monotonic", return_value=0):
+            breaker.record_failure()
+
+        with patch("tomato_ai.adapters.resilience.time.monotonic", return_value=61):
+            # Act
+            breaker.allow()
+            breaker.record_failure()
+
+            # Assert
+            assert breaker.state == "open"
+
+    @pytest.mark.asyncio
+    async def test_call_records_failures_and_short_circuits_once_open(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            raise RuntimeError("boom")
+
+        # Act
+        with pytest.raises(RuntimeError):
+            await breaker.call(failing)
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(failing)
+
+        # Assert
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_lets_the_next_trial_through(self):
+        # Arrange
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        trial = asyncio.create_task(breaker.call(asyncio.Event().wait))
+        await asyncio.sleep(0)
+
+        # Act
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+
+        # Assert
+        assert breaker.allow()
@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+from collections import defaultdict
+from unittest.mock import patch
+from uuid import uuid4
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from tomato_ai.adapters import event_bus, orm
+from tomato_ai.domain import events
+from tomato_ai.domain.services import SessionNotifier
+
+
+def make_session(expires_at: datetime, state: str = "active", session_type: str = "work") -> orm.PomodoroSession:
+    return orm.PomodoroSession(
+        session_id=uuid4(),
+        user_id=uuid4(),
+        chat_id=12345,
+        session_type=session_type,
+        state=state,
+        start_time=expires_at - timedelta(minutes=25),
+        expires_at=expires_at,
+        duration=timedelta(minutes=25),
+    )
+
+
+@pytest.mark.asyncio
+class TestSessionNotifier:
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_expires_only_overdue_active_sessions(self, mock_publish, db_session):
+        # Arrange
+        now = datetime.now(timezone.utc)
+        expired = make_session(now - timedelta(minutes=1), session_type="short_break")
+        running = make_session(now + timedelta(minutes=10))
+        paused = make_session(now - timedelta(minutes=1), state="paused")
+        db_session.add_all([expired, running, paused])
+        await db_session.commit()
+
+        # Act
+        await SessionNotifier(db_session).check_and_notify_expired_sessions()
+
+        # Assert
+        states = dict((await db_session.execute(select(orm.PomodoroSession.session_id, orm.PomodoroSession.state))).all())
+        assert states == {expired.session_id: "completed", running.session_id: "active", paused.session_id: "paused"}
+        published = [call.args[0] for call in mock_publish.await_args_list]
+        assert published == [
+            events.SessionCompleted(session_id=expired.session_id, user_id=expired.user_id, session_type="short_break"),
+            events.SessionExpired(session_id=expired.session_id, user_id=expired.user_id),
+        ]
+
+    @patch('tomato_ai.domain.services.event_bus.publish')
+    async def test_expires_in_batches(self, mock_publish, db_session):
+        # Arrange
+        now = datetime.now(timezone.utc)
+        db_session.add_all([make_session(now - timedelta(minutes=1)) for _ in range(5)])
+        await db_session.commit()
+
+        # Act
+        await SessionNotifier(db_session, batch_size=2).check_and_notify_expired_sessions()
+
+        # Assert
+        remaining = (await db_session.scalars(select(orm.PomodoroSession).filter_by(state="active"))).all()
+        assert remaining == []
+        assert mock_publish.await_count == 10
+
+    async def test_sends_one_notification_for_an_expired_session(self, db_session):
+        # Arrange
+        handled = []
+
+        async def handler(ended):
+            handled.append(ended)
+
+        expired = make_session(datetime.now(timezone.utc) - timedelta(minutes=1))
+        db_session.add(expired)
+        await db_session.commit()
+
+        with patch.object(event_bus, "HANDLERS", defaultdict(list)):
+            event_bus.register_coalesced(
+                (events.SessionCompleted, events.SessionExpired),
+                handler,
+                key=lambda event: event.session_id,
+                merge=events.SessionEnded.merge,
+                window=0.01,
+            )
+
+            # Act
+            await SessionNotifier(db_session).check_and_notify_expired_sessions()
+
+        # Assert
+        assert handled == [
+            events.SessionEnded(session_id=expired.session_id, user_id=expired.user_id, session_type="work", expired=True)
+        ]
+
+    async def test_returns_before_the_queued_notifications_are_handled(self, db_session):
+        # Arrange
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(ended):
+            await release.wait()
+            handled.append(ended)
+
+        db_session.add(make_session(datetime.now(timezone.utc) - timedelta(minutes=1)))
+        await db_session.commit()
+
+        with patch.object(event_bus, "HANDLERS", defaultdict(list)):
+            event_bus.register_coalesced(
+                (events.SessionCompleted, events.SessionExpired),
+                handler,
+                key=lambda event: event.session_id,
+                merge=events.SessionEnded.merge,
+                window=0.01,
+            )
+            event_bus.start_workers(count=2)
+            try:
+                # Act
+                await asyncio.wait_for(SessionNotifier(db_session).check_and_notify_expired_sessions(), timeout=1)
+                handled_before_release = list(handled)
+                release.set()
+            finally:
+                await event_bus.drain()
+
+        # Assert
+        assert handled_before_release == []
+        assert len(handled) == 1